@@ -0,0 +1,120 @@
+"""
+Filename analysis throughput, before and after memoization and batching.
+
+    python -m backend.benchmarks.filename_parsing --names 5000 --repeat 3
+
+"before" is the per-call regex loop and one guessit() call per file that
+ingest used to make; "after" is the precompiled NameBeautifier and
+FilenameParser.parse_batch, cold (empty cache) and warm (re-scan).
+"""
+import re
+import time
+import random
+import argparse
+import unicodedata
+from pathlib import Path
+from guessit import guessit
+from backend.utils.filename_parser import FilenameParser
+from backend.utils.name_beautifier import NameBeautifier
+
+SHOWS = ["The Expanse", "Dark", "Severance", "Chernobyl", "The Office US", "Mr Robot"]
+MOVIES = ["Blade Runner", "Arrival", "Heat", "Alien", "Paprika", "The Thing"]
+# Names whose output depends on the order of the cleanup passes
+EDGE_CASES = [
+    "WEB[x]RIP.mkv", "Movie (2019 [x264) rest].mkv", "Ｆｉｌｍ 1080ｐ.mkv",
+    "[GRP].Show.S01E01.WEB-DL.x264.mkv", "Film.(2001).HDR.REPACK..mp4", "Ünïcödé.Tïtlé.2160p.mkv"
+]
+TAGS = ["1080p.WEB.x264", "2160p.UHD.HDR.HEVC", "720p.BD.AAC.5.1", "DVD.RIP.AC3", "1080p.REPACK.DTS"]
+
+def legacy_beautify(filename: str) -> str:
+    name = Path(filename).stem
+    patterns = [
+        r'\[.*?\]', r'\(.*?\)', r'\b(?:WEB|BD|DVD|RIP|HD|HQ|UHD|HDR|SDR)\b',
+        r'\b(?:x264|x265|HEVC|AVC|AAC|AC3|DTS)\b',
+        r'\b(?:5\.1|7\.1|2\.0|CH|Dual)\b',
+        r'\b(?:REPACK|PROPER|READNFO|NFO)\b',
+        r'[-_.]{2,}', r'^[-_.]+', r'[-_.]+$'
+    ]
+    for pattern in patterns:
+        name = re.sub(pattern, '', name, flags=re.IGNORECASE)
+    name = re.sub(r'\b\d{3,4}p\b', '', name)
+    name = unicodedata.normalize('NFKD', name)
+    name = name.encode('ascii', 'ignore').decode()
+    name = re.sub(r'[^\w\s-]', '', name)
+    name = re.sub(r'(?<!\d)(\d{4})(?!\d)', r'(\1)', name)
+    return re.sub(r'\s+', ' ', name).strip()
+
+def make_names(count: int, seed: int = 7):
+    rng = random.Random(seed)
+    names = []
+    for i in range(count):
+        tag = rng.choice(TAGS)
+        if i % 2:
+            show = rng.choice(SHOWS)
+            season, episode = rng.randint(1, 6), rng.randint(1, 12)
+            names.append(
+                f"/media/tv/{show}/Season {season:02}/"
+                f"{show.replace(' ', '.')}.S{season:02}E{episode:02}.{tag}-[GRP{i % 13}].mkv"
+            )
+        else:
+            movie = rng.choice(MOVIES)
+            year = rng.randint(1975, 2023)
+            names.append(f"/media/movies/{movie} ({year})/{movie.replace(' ', '.')}.{year}.{tag}.{i}.mp4")
+    return names
+
+def measure(label: str, fn, names, repeat: int, setup=None) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        if setup:
+            setup()
+        started = time.perf_counter()
+        fn(names)
+        best = min(best, time.perf_counter() - started)
+    rate = len(names) / best
+    print(f"{label:<44} {rate:>12,.0f} names/sec")
+    return rate
+
+def clear_parser_cache():
+    FilenameParser._cache.clear()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--names", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=None, help="processes for parse_batch")
+    args = parser.parse_args()
+
+    names = make_names(args.names)
+    basenames = [Path(name).name for name in names]
+
+    checked = basenames + EDGE_CASES
+    mismatches = [name for name in checked if legacy_beautify(name) != NameBeautifier.beautify(name)]
+    for name in mismatches[:10]:
+        print(f"  {name!r}: {legacy_beautify(name)!r} -> {NameBeautifier.beautify(name)!r}")
+    print(f"beautify output differences vs legacy: {len(mismatches)}/{len(checked)}")
+    if mismatches:
+        raise SystemExit("beautify output changed; stored titles would differ")
+
+    print("\nNameBeautifier.beautify")
+    before = measure("before: re.sub per pattern per call", lambda ns: [legacy_beautify(n) for n in ns], basenames, args.repeat)
+    cold = measure(
+        "after: precompiled, cold cache",
+        lambda ns: [NameBeautifier.beautify(n) for n in ns], basenames, args.repeat,
+        setup=NameBeautifier.beautify.cache_clear
+    )
+    warm = measure("after: precompiled, warm cache", lambda ns: [NameBeautifier.beautify(n) for n in ns], basenames, args.repeat)
+    print(f"speedup: {cold / before:.1f}x cold, {warm / before:.1f}x warm")
+
+    print("\nguessit")
+    before = measure("before: guessit() per file", lambda ns: [guessit(n) for n in ns], names, 1)
+    cold = measure(
+        "after: parse_batch, cold cache",
+        lambda ns: FilenameParser.parse_batch(ns, workers=args.workers), names, args.repeat,
+        setup=clear_parser_cache
+    )
+    warm = measure("after: parse_batch, warm cache (re-scan)", FilenameParser.parse_batch, names, args.repeat)
+    print(f"speedup: {cold / before:.1f}x cold, {warm / before:.1f}x warm")
+    FilenameParser.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+"""
+Pooled database connections held by open streams, before and after short-lived sessions.
+
+    python -m backend.benchmarks.stream_pool --streams 300 --pool-size 4 --threads 8
+
+Serves the real /stream route from uvicorn against a scratch SQLite
+database whose QueuePool has --pool-size connections and no overflow,
+on an event loop whose default executor (the threadpool sync handlers
+and dependencies run in) has --threads workers. Each of --streams
+clients reads the first chunk of a large scratch file and then stops
+reading, so every response stays open mid-body. While they are open,
+--probes concurrent requests to a route that checks out a pooled
+connection are timed.
+
+"before" is the route behind the get_db dependency it used to take,
+which keeps the connection checked out until the body has been sent:
+streams beyond the pool size and every probe wait --pool-timeout and
+fail. "after" is the route as shipped. The exit status is non-zero
+when an "after" stream or probe fails, or a connection stays checked
+out while the streams are open. Raise `ulimit -n` above twice --streams.
+"""
+import os
+import time
+import socket
+import asyncio
+import argparse
+import tempfile
+import threading
+from statistics import median
+from concurrent.futures import ThreadPoolExecutor
+import requests
+import uvicorn
+from fastapi import Depends, FastAPI, Request
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import QueuePool
+from backend.config import settings
+from backend.controllers import player
+from backend.database.models import Media, MediaLibrary, MediaType, ProbeResult, User
+from backend.database.session import Base, SessionLocal, get_db, session_scope
+from backend.services.auth import create_access_token, get_password_hash
+from backend.services.player import get_media_stream, stream_throttle
+from backend.services.user import UserService, oauth2_scheme
+from backend.utils.file_scanner import FileScanner
+from backend.utils.media_probe import MediaProbe
+
+MB = 1024 * 1024
+
+def make_file(directory: str, size: int) -> str:
+    # Sparse: contents do not matter, only that the body outlasts socket buffers
+    fd, path = tempfile.mkstemp(dir=directory, suffix=".mkv")
+    os.ftruncate(fd, size)
+    os.close(fd)
+    return path
+
+def connect(path: str, pool_size: int, pool_timeout: float):
+    """Bind the app's sessions to a fresh small pool on the scratch database"""
+    engine = create_engine(
+        f"sqlite:///{path}",
+        poolclass=QueuePool,
+        pool_size=pool_size,
+        max_overflow=0,
+        pool_timeout=pool_timeout,
+        connect_args={"check_same_thread": False}
+    )
+    SessionLocal.configure(bind=engine)
+    return engine
+
+def seed(media_path: str):
+    """A user, a library and one media item with a cached probe; returns (token, media_id)"""
+    fingerprint = FileScanner.calculate_fingerprint(media_path)
+    with session_scope() as db:
+        user = User(username="bench", email="bench@example.com", hashed_password=get_password_hash("bench"))
+        db.add(user)
+        db.flush()
+        library = MediaLibrary(
+            name="bench", path=os.path.dirname(media_path), media_type=MediaType.MOVIE, owner_id=user.id
+        )
+        db.add(library)
+        db.flush()
+        media_id = db.execute(Media.__table__.insert().values(
+            title="bench",
+            file_path=media_path,
+            media_type=MediaType.MOVIE,
+            metadata={},
+            fingerprint=fingerprint,
+            library_id=library.id
+        )).inserted_primary_key[0]
+        # No bit_rate: streams are not paced, and ffprobe never runs
+        db.execute(ProbeResult.__table__.insert().values(
+            fingerprint=fingerprint,
+            path=media_path,
+            duration=600.0,
+            data={"format": {"format_name": "matroska,webm", "duration": "600.0"}, "streams": []}
+        ))
+        db.commit()
+    # Held in memory from here on, as on a server that has played the file before
+    MediaProbe.get(media_path, fingerprint)
+    return create_access_token({"sub": "bench"}), media_id
+
+def make_app() -> FastAPI:
+    app = FastAPI()
+    app.include_router(player.router, prefix=settings.API_PREFIX)
+
+    def legacy_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
+        return UserService.get_current_user(db, token)
+
+    @app.get("/bench/legacy-stream/{media_id}")
+    async def legacy_stream(
+        media_id: int,
+        request: Request,
+        db: Session = Depends(get_db),
+        user: User = Depends(legacy_user)
+    ):
+        # The old handler: user and row come from the request's session,
+        # which get_db closes only after the body has been sent
+        media = db.query(Media).get(media_id)
+        throttle = await stream_throttle(media, user.id, request.client.host, time.monotonic())
+        return get_media_stream(media, request.headers, request.method, throttle)
+
+    @app.get("/bench/probe")
+    def probe():
+        # The connection goes back before the handler returns; a get_db exit
+        # would queue behind the probes filling the threadpool and deadlock them
+        with session_scope() as db:
+            return {"ok": db.execute(text("SELECT 1")).scalar()}
+
+    return app
+
+def serve(app: FastAPI, threads: int):
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    # "before" fails requests by design; keep their tracebacks out of the table
+    server = uvicorn.Server(uvicorn.Config(app, loop="asyncio", log_level="critical", backlog=4096))
+    server.install_signal_handlers = lambda: None
+
+    def run() -> None:
+        executor = ThreadPoolExecutor(threads)
+        loop = asyncio.new_event_loop()
+        loop.set_default_executor(executor)
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(server.serve(sockets=[sock]))
+        # Requests abandoned by their clients may still be queued here
+        executor.shutdown(wait=True)
+        loop.close()
+
+    thread = threading.Thread(target=run, name="stream-pool-server", daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, thread, f"http://127.0.0.1:{sock.getsockname()[1]}"
+
+def hold_streams(url: str, token: str, count: int, timeout: float):
+    """Open count streams that stop reading after one chunk; returns (opened, release)"""
+    opened = []
+    ready = threading.Semaphore(0)
+    release = threading.Event()
+    lock = threading.Lock()
+
+    def hold() -> None:
+        try:
+            with requests.get(url, headers={"Authorization": f"Bearer {token}"}, stream=True, timeout=timeout) as response:
+                response.raise_for_status()
+                next(response.iter_content(64 * 1024))
+                with lock:
+                    opened.append(response)
+                ready.release()
+                release.wait()
+        except (requests.RequestException, StopIteration):
+            ready.release()
+
+    for _ in range(count):
+        threading.Thread(target=hold, daemon=True).start()
+    for _ in range(count):
+        ready.acquire()
+    return opened, release
+
+def run_probes(url: str, count: int, timeout: float):
+    def probe(_) -> float:
+        started = time.perf_counter()
+        try:
+            ok = requests.get(url, timeout=timeout).status_code == 200
+        except requests.RequestException:
+            ok = False
+        return (time.perf_counter() - started) * 1000 if ok else None
+
+    with ThreadPoolExecutor(count) as pool:
+        return list(pool.map(probe, range(count)))
+
+def run(app: FastAPI, db_path: str, path: str, token: str, args) -> dict:
+    """One mode on its own server and pool, so requests left over from another cannot skew it"""
+    engine = connect(db_path, args.pool_size, args.pool_timeout)
+    server, thread, base = serve(app, args.threads)
+    timeout = args.pool_timeout * 4
+    try:
+        opened, release = hold_streams(base + path, token, args.streams, timeout)
+        held = engine.pool.checkedout()
+        latencies = run_probes(base + "/bench/probe", args.probes, timeout)
+        release.set()
+    finally:
+        server.should_exit = True
+        thread.join()
+        engine.dispose()
+
+    succeeded = [ms for ms in latencies if ms is not None]
+    return {
+        "opened": len(opened),
+        "held": held,
+        "probes_ok": len(succeeded),
+        "p50": median(succeeded) if succeeded else float("nan"),
+        "max": max(succeeded) if succeeded else float("nan")
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--streams", type=int, default=300, help="responses held open at once")
+    parser.add_argument("--probes", type=int, default=20, help="concurrent database-backed requests")
+    parser.add_argument("--pool-size", type=int, default=4, help="pooled connections, no overflow")
+    parser.add_argument("--pool-timeout", type=float, default=2.0, help="seconds to wait for a connection")
+    parser.add_argument("--threads", type=int, default=8, help="threadpool workers of the server loop")
+    parser.add_argument("--dir", default=tempfile.gettempdir(), help="where to write scratch files")
+    parser.add_argument("--size-mb", type=int, default=256, help="scratch media file size")
+    args = parser.parse_args()
+
+    media_path = make_file(args.dir, args.size_mb * MB)
+    fd, db_path = tempfile.mkstemp(dir=args.dir, suffix=".sqlite")
+    os.close(fd)
+    try:
+        engine = connect(db_path, args.pool_size, args.pool_timeout)
+        Base.metadata.create_all(bind=engine)
+        token, media_id = seed(media_path)
+        engine.dispose()
+        app = make_app()
+
+        print(f"{'mode':>8} {'streams open':>13} {'held conns':>11} {'probes ok':>10} {'p50 ms':>8} {'max ms':>8}")
+        results = {}
+        for mode, path in (
+            ("before", f"/bench/legacy-stream/{media_id}"),
+            ("after", f"{settings.API_PREFIX}/stream/{media_id}")
+        ):
+            result = results[mode] = run(app, db_path, path, token, args)
+            print(
+                f"{mode:>8} {result['opened']:>6}/{args.streams:<6} {result['held']:>11} "
+                f"{result['probes_ok']:>4}/{args.probes:<5} {result['p50']:>8.1f} {result['max']:>8.1f}"
+            )
+    finally:
+        os.unlink(media_path)
+        os.unlink(db_path)
+
+    after = results["after"]
+    if after["opened"] < args.streams or after["held"] or after["probes_ok"] < args.probes:
+        raise SystemExit("open streams still starve the connection pool")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Aggregate read throughput of N concurrent streams, with and without page cache hints.
+
+    python -m backend.benchmarks.stream_readahead --file /srv/media/film.mkv --readers 1 4 16
+
+"fixed" is the old loop: 1 MB os.pread calls with no hints. "hinted" is
+SequentialReader: SEQUENTIAL/WILLNEED read-ahead, adaptive chunks and
+drop-behind. Each reader streams its own slice of the file from a
+worker thread, like the response path does. Before every run the file
+is evicted from the page cache with POSIX_FADV_DONTNEED, so reads go to
+the device. Use a file on the storage you serve from; without --file a
+scratch file is written to --dir first. --client-mbps throttles each
+reader to a player's consumption rate.
+"""
+import os
+import time
+import argparse
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from backend.utils.readahead import HAS_FADVISE, SequentialReader
+
+MB = 1024 * 1024
+
+def make_file(directory: str, size: int) -> str:
+    fd, path = tempfile.mkstemp(dir=directory, suffix=".bin")
+    block = os.urandom(4 * MB)
+    with os.fdopen(fd, "wb") as file:
+        for _ in range(size // len(block)):
+            file.write(block)
+        file.flush()
+        os.fsync(file.fileno())
+    return path
+
+def evict(path: str) -> None:
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+    finally:
+        os.close(fd)
+
+def fixed_stream(fd: int, start: int, end: int, pace) -> int:
+    offset = start
+    while offset <= end:
+        chunk = os.pread(fd, min(MB, end - offset + 1), offset)
+        if not chunk:
+            break
+        offset += len(chunk)
+        pace(len(chunk))
+    return offset - start
+
+def hinted_stream(fd: int, start: int, end: int, pace) -> int:
+    reader = SequentialReader(fd, start, end)
+    offset = start
+    while offset <= end:
+        chunk = reader.read(offset)
+        if not chunk:
+            break
+        offset += len(chunk)
+        pace(len(chunk))
+    return offset - start
+
+def pacer(client_mbps: float):
+    if not client_mbps:
+        return lambda size: None
+    rate = client_mbps * MB / 8
+    def pace(size: int) -> None:
+        time.sleep(size / rate)
+    return pace
+
+def run(path: str, readers: int, stream, slice_bytes: int, client_mbps: float) -> float:
+    evict(path)
+    size = os.path.getsize(path)
+    stride = max(size // readers, 1)
+    fd = os.open(path, os.O_RDONLY)
+    barrier = threading.Barrier(readers)
+
+    def worker(i: int) -> int:
+        start = i * stride
+        end = min(start + slice_bytes, size) - 1
+        barrier.wait()
+        return stream(fd, start, end, pacer(client_mbps))
+
+    try:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(readers) as pool:
+            total = sum(pool.map(worker, range(readers)))
+        elapsed = time.perf_counter() - started
+    finally:
+        os.close(fd)
+    return total / elapsed / MB
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--file", help="existing large file to read (default: write a scratch file)")
+    parser.add_argument("--dir", default=tempfile.gettempdir(), help="where to write the scratch file")
+    parser.add_argument("--size-mb", type=int, default=1024, help="scratch file size")
+    parser.add_argument("--slice-mb", type=int, default=128, help="bytes each reader streams")
+    parser.add_argument("--readers", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--client-mbps", type=float, default=0, help="per-reader throttle, 0 for none")
+    args = parser.parse_args()
+
+    if not HAS_FADVISE:
+        raise SystemExit("posix_fadvise is not available on this platform")
+
+    path = args.file or make_file(args.dir, args.size_mb * MB)
+    try:
+        print(f"{'readers':>8} {'fixed MB/s':>12} {'hinted MB/s':>12} {'speedup':>8}")
+        for readers in args.readers:
+            slice_bytes = min(args.slice_mb * MB, os.path.getsize(path) // readers)
+            fixed = run(path, readers, fixed_stream, slice_bytes, args.client_mbps)
+            hinted = run(path, readers, hinted_stream, slice_bytes, args.client_mbps)
+            print(f"{readers:>8} {fixed:>12,.0f} {hinted:>12,.0f} {hinted / fixed:>7.2f}x")
+    finally:
+        if not args.file:
+            os.unlink(path)
+
+if __name__ == "__main__":
+    main()
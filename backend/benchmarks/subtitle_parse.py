@@ -0,0 +1,181 @@
+"""
+Cues per second parsed by SubtitleParser.parse versus the pysrt/webvtt implementation it replaced.
+
+    python -m backend.benchmarks.subtitle_parse --dir /srv/media/subs --repeat 5
+
+"legacy" is the previous parse path: chardet over a 1 KB sample, a pysrt
+or webvtt-py object graph, and datetime.strptime for every WebVTT
+timestamp. It needs `pip install pysrt webvtt-py`, which the server no
+longer depends on. "native" is the current parser. Without --dir, a
+corpus of large SRT and WebVTT files (styled multi-line cues, CRLF and
+UTF-8 text) is generated in a scratch directory. Each file is parsed
+--repeat times and the best run counts.
+
+FIXTURES are parsed first and checked against their expected cues
+(missing blank lines, short fractions, CRLF, NOTE and STYLE blocks); the
+exit status is non-zero when one differs.
+"""
+import re
+import time
+import random
+import shutil
+import argparse
+import tempfile
+from pathlib import Path
+from datetime import datetime, timedelta
+from backend.utils.subtitle_parser import SubtitleParser
+
+WORDS = "the a you I to it that what is was this me no know here for have we not my don't".split()
+STYLED = ["<i>{}</i>", "<b>{}</b>", "{}", "{}", "{}", "- {}", "Zoë: {}", "« {} »"]
+
+# name, contents, expected (start ms, end ms, text, SRT index or WebVTT identifier)
+FIXTURES = [
+    ("missing_blank.vtt", b"WEBVTT\n\n00:01.000 --> 00:02.500\nA\n00:03.000 --> 00:04.000\nB\n", [
+        (1000, 2500, "A", ""), (3000, 4000, "B", "")
+    ]),
+    ("missing_blank.srt", b"1\n00:00:01,000 --> 00:00:02,000\nOne\n2\n00:00:03,000 --> 00:00:04,000\nTwo\n", [
+        (1000, 2000, "One", 1), (3000, 4000, "Two", 2)
+    ]),
+    ("short_fraction.srt", b"1\n00:00:01,5 --> 00:00:02,05\nHi\n\n2\n00:00:03,250 --> 00:00:04,7\nThere\n", [
+        (1500, 2050, "Hi", 1), (3250, 4700, "There", 2)
+    ]),
+    ("crlf.srt", b"1\r\n00:00:01,000 --> 00:00:02,000\r\n<i>Line one</i>\r\nLine two\r\n\r\n"
+                 b"2\r\n00:00:03,000 --> 00:00:04,000\r\nThree\r\n", [
+        (1000, 2000, "Line one\nLine two", 1), (3000, 4000, "Three", 2)
+    ]),
+    ("blocks.vtt", b"WEBVTT - title\n\nSTYLE\n::cue { color: yellow }\n\nNOTE a comment\nover two lines\n\n"
+                   b"intro\n00:00.500 --> 00:01.000 line:90%\nHello\n\nNOTE between cues\n\n"
+                   b"00:02.000 --> 00:03.000\nBye\n", [
+        (500, 1000, "Hello", "intro"), (2000, 3000, "Bye", "")
+    ])
+]
+
+def check_fixtures(directory: Path) -> int:
+    """Parse every fixture and print the ones that differ; returns how many did"""
+    failed = 0
+    for name, contents, expected in FIXTURES:
+        path = directory / name
+        path.write_bytes(contents)
+        parsed = [
+            (cue["start"], cue["end"], cue["text"], cue["index"] if path.suffix == ".srt" else cue["styles"])
+            for cue in SubtitleParser.parse(path)
+        ]
+        path.unlink()
+        if parsed != expected:
+            failed += 1
+            print(f"  {name}: expected {expected!r}, parsed {parsed!r}")
+    print(f"fixtures: {len(FIXTURES) - failed}/{len(FIXTURES)} parsed as expected")
+    return failed
+
+def make_corpus(directory: Path, files: int, cues: int) -> None:
+    rng = random.Random(0)
+    for number in range(files):
+        srt, vtt = [], ["WEBVTT", ""]
+        start = 0
+        for i in range(1, cues + 1):
+            start += rng.randint(200, 4000)
+            end = start + rng.randint(800, 6000)
+            lines = [
+                rng.choice(STYLED).format(" ".join(rng.choice(WORDS) for _ in range(rng.randint(2, 9))))
+                for _ in range(rng.randint(1, 2))
+            ]
+            srt += [str(i), f"{_timestamp(start, ',')} --> {_timestamp(end, ',')}", *lines, ""]
+            vtt += [f"cue-{i}", f"{_timestamp(start, '.')} --> {_timestamp(end, '.')} line:90%", *lines, ""]
+        (directory / f"corpus_{number}.srt").write_bytes("\r\n".join(srt).encode("utf-8"))
+        (directory / f"corpus_{number}.vtt").write_bytes("\n".join(vtt).encode("utf-8"))
+
+def _timestamp(ms: int, separator: str) -> str:
+    seconds, ms = divmod(ms, 1000)
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours:02}:{minutes:02}:{seconds:02}{separator}{ms:03}"
+
+def legacy_parser():
+    """The previous SubtitleParser.parse, or None when its dependencies are missing"""
+    try:
+        import chardet
+        import pysrt
+        from webvtt import WebVTT
+    except ImportError:
+        return None
+
+    def vtt_time_to_ms(time_str: str) -> int:
+        dt = datetime.strptime(time_str, "%H:%M:%S.%f" if "." in time_str else "%H:%M:%S")
+        delta = timedelta(hours=dt.hour, minutes=dt.minute, seconds=dt.second, microseconds=dt.microsecond)
+        return int(delta.total_seconds() * 1000)
+
+    def clean(text: str) -> str:
+        return re.sub(r"\n{2,}", "\n", re.sub(r"<[^>]+>", "", text)).strip()
+
+    def parse(path: Path):
+        with open(path, "rb") as f:
+            encoding = chardet.detect(f.read(1024))["encoding"] or "utf-8"
+        if path.suffix == ".srt":
+            return [{
+                "index": sub.index, "start": sub.start.ordinal, "end": sub.end.ordinal,
+                "text": clean(sub.text), "position": sub.position, "coordinates": sub.position
+            } for sub in pysrt.open(path, encoding=encoding) if sub.start.ordinal < sub.end.ordinal]
+        parsed = []
+        for i, caption in enumerate(WebVTT().read(path).captions, start=1):
+            start, end = vtt_time_to_ms(caption.start), vtt_time_to_ms(caption.end)
+            if start < end:
+                # webvtt-py 0.4.5 captions have neither attribute; the old
+                # code raised here, so the benchmark reads them leniently
+                parsed.append({
+                    "index": i, "start": start, "end": end, "text": clean(caption.text),
+                    "styles": getattr(caption, "identifier", None), "position": getattr(caption, "position", None)
+                })
+        return parsed
+
+    return parse
+
+def measure(parse, paths, repeat: int):
+    cues, best = 0, float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        cues = sum(len(parse(path)) for path in paths)
+        best = min(best, time.perf_counter() - started)
+    return cues, best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--dir", help="directory of .srt/.vtt files (default: generate a corpus)")
+    parser.add_argument("--files", type=int, default=4, help="generated files per format")
+    parser.add_argument("--cues", type=int, default=20000, help="cues per generated file")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    scratch = Path(tempfile.mkdtemp())
+    try:
+        failed = check_fixtures(scratch)
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+    if failed:
+        raise SystemExit("the parser splits fixture cues differently than expected")
+
+    directory = Path(args.dir) if args.dir else Path(tempfile.mkdtemp())
+    try:
+        if not args.dir:
+            make_corpus(directory, args.files, args.cues)
+        legacy = legacy_parser()
+        if legacy is None:
+            print("pysrt/webvtt-py not installed; measuring the native parser only")
+
+        print(f"{'format':>7} {'files':>6} {'cues':>9} {'legacy cues/s':>14} {'native cues/s':>14} {'speedup':>8}")
+        for suffix in (".srt", ".vtt"):
+            paths = sorted(directory.glob(f"*{suffix}"))
+            if not paths:
+                continue
+            cues, native = measure(SubtitleParser.parse, paths, args.repeat)
+            if legacy is None:
+                print(f"{suffix[1:]:>7} {len(paths):>6} {cues:>9,} {'-':>14} {cues / native:>14,.0f} {'-':>8}")
+                continue
+            old_cues, old = measure(legacy, paths, args.repeat)
+            print(f"{suffix[1:]:>7} {len(paths):>6} {cues:>9,} {old_cues / old:>14,.0f} "
+                  f"{cues / native:>14,.0f} {(cues / native) / (old_cues / old):>7.1f}x")
+    finally:
+        if not args.dir:
+            shutil.rmtree(directory, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
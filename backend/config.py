@@ -1,6 +1,6 @@
 from pydantic import BaseSettings
 from pathlib import Path
-from typing import Optional
+from typing import Optional, Dict
 
 class Settings(BaseSettings):
     # Database configuration
@@ -15,6 +15,106 @@ class Settings(BaseSettings):
     MEDIA_ROOT: Path = Path("/media")
     SUBTITLE_DIR: Path = Path("/subtitles")
     
+    # Scan configuration
+    FINGERPRINT_BLOCK_SIZE: int = 64 * 1024  # bytes per sampled block
+    FINGERPRINT_SAMPLES: int = 8  # evenly spaced blocks between head and tail
+    SCAN_FULL_HASH: bool = False  # hash whole files during scans instead of in background verification
+    SCAN_SSD_WORKERS: int = 8  # concurrent hash/probe workers per solid-state device
+    SCAN_HDD_WORKERS: int = 2  # per rotational device, keeps seeks mostly sequential
+    SCAN_NETWORK_WORKERS: int = 4  # per NFS/SMB mount
+    SCAN_DEVICE_WORKERS: Dict[str, int] = {}  # per mount point overrides, e.g. {"/mnt/nas": 3}
+    INGEST_BATCH_SIZE: int = 500  # files per upsert/commit during library scans
+    SCAN_JOB_WORKERS: int = 1  # background scan job threads per process
+    SCAN_JOB_POLL_INTERVAL: float = 5.0  # seconds between checks for queued jobs
+    SCAN_JOB_HEARTBEAT_INTERVAL: float = 30.0  # running jobs refresh updated_at this often
+    SCAN_JOB_STALE_SECONDS: float = 120.0  # running jobs without a heartbeat this long are requeued
+    SCAN_VERIFY_FILES: int = 4  # files fully hashed each time the scan worker finds no job, 0 disables
+    FILENAME_CACHE_SIZE: int = 65536  # memoized guessit results
+    FILENAME_PARSE_WORKERS: int = 4  # processes for large filename batches, 0/1 parses in-process
+    FILENAME_PARSE_PROCESS_MIN: int = 1000  # batch size that is worth the process hand-off
+    
+    # Probe and subprocess configuration
+    FFPROBE_BINARY: str = "ffprobe"
+    FFMPEG_BINARY: str = "ffmpeg"
+    FFPROBE_TIMEOUT: float = 30.0  # seconds before a hung ffprobe is killed
+    SUBPROCESS_TIMEOUT: float = 120.0  # default for other ffmpeg children
+    SUBPROCESS_MAX_CONCURRENCY: int = 4  # ffmpeg/ffprobe children running at once
+    PROBE_CACHE_SIZE: int = 2048  # probe results kept in memory, keyed by fingerprint
+    KEYFRAME_CACHE_SIZE: int = 256  # keyframe indexes kept in memory, keyed by fingerprint
+    KEYFRAME_INDEX_TIMEOUT: float = 300.0  # a packet scan reads the whole file once
+    KEYFRAME_INDEX_DIR: Path = Path("/var/cache/wildmedia-keyframes")  # kept apart from the segment cache
+    KEYFRAME_INDEX_CACHE_MAX_BYTES: int = 1 * 1024 ** 3  # roughly 60 KB per film
+    
+    # Streaming configuration
+    STREAM_CHUNK_SIZE: int = 1024 * 1024  # first read size when the server has no zero-copy send
+    STREAM_CHUNK_MIN: int = 64 * 1024
+    STREAM_CHUNK_MAX: int = 4 * 1024 * 1024
+    STREAM_CHUNK_SECONDS: float = 0.25  # later reads cover this much of the client's consumption
+    STREAM_READAHEAD_SECONDS: float = 8.0  # WILLNEED window ahead of the read position
+    STREAM_READAHEAD_MIN: int = 4 * 1024 * 1024
+    STREAM_READAHEAD_MAX: int = 32 * 1024 * 1024
+    STREAM_DROP_BEHIND: bool = True  # drop pages already sent from the page cache
+    STREAM_DROP_BEHIND_MIN_SIZE: int = 512 * 1024 * 1024  # smaller files stay cached for other viewers
+    STREAM_DROP_BEHIND_KEEP: int = 16 * 1024 * 1024  # kept behind the read position for rewinds
+    STREAM_MULTIPART_RANGES: bool = True  # answer multi-range requests with multipart/byteranges
+    
+    # Bandwidth configuration
+    STREAM_UPLINK_RATE: int = 0  # bytes/s shared by every stream, 0 for unlimited
+    STREAM_USER_RATE: int = 0  # bytes/s cap per user across their streams, 0 for unlimited
+    STREAM_PACE_HEADROOM: float = 1.5  # streams are paced to the media bitrate times this, 0 disables
+    STREAM_PACE_BURST_SECONDS: float = 30.0  # sent unpaced first, to fill the player's buffer
+    STREAM_FLOW_ACTIVE_SECONDS: float = 5.0  # streams idle longer stop counting towards fair shares
+    STREAM_FLOW_IDLE_SECONDS: float = 120.0  # idle streams' counters are dropped after this
+    
+    # Stream session configuration
+    STREAM_MAX_SESSIONS: int = 0  # concurrent playback sessions server-wide, 0 for unlimited
+    STREAM_MAX_SESSIONS_PER_USER: int = 3  # 0 for unlimited
+    STREAM_SESSION_IDLE_SECONDS: float = 60.0  # requests further apart than this open a new session
+    
+    # Cache configuration
+    CACHE_DIR: Path = Path("/var/cache/wildmedia")  # generated segments, thumbnails
+    CACHE_MAX_BYTES: int = 20 * 1024 ** 3  # least recently used files are evicted beyond this
+    
+    # HLS configuration
+    HLS_SEGMENT_SECONDS: float = 6.0
+    HLS_PREFETCH_SEGMENTS: int = 3  # segments encoded ahead of the one requested
+    HLS_SEGMENT_TIMEOUT: float = 120.0  # seconds before a segment encoder is killed
+    HLS_MAX_WORKERS: int = 2  # concurrent segment encoders, prefetch included
+    
+    # Thumbnail configuration
+    THUMBNAIL_WORKERS: int = 1  # background extraction threads (and ffmpeg slots)
+    THUMBNAIL_NICE: bool = True  # run extraction at idle CPU/I/O priority
+    THUMBNAIL_POSTER_WIDTH: int = 480
+    THUMBNAIL_POSTER_POSITION: float = 0.1  # fraction of the runtime the poster is taken from
+    THUMBNAIL_INTERVAL: float = 10.0  # seconds of video per seek-bar thumbnail
+    THUMBNAIL_WIDTH: int = 160
+    THUMBNAIL_TILE: int = 10  # sprite sheets hold TILE x TILE thumbnails
+    THUMBNAIL_TIMEOUT: float = 1800.0  # a sprite pass reads every keyframe of the file
+    THUMBNAIL_DIR: Path = Path("/var/cache/wildmedia-thumbnails")  # kept apart from the segment cache
+    THUMBNAIL_CACHE_MAX_BYTES: int = 5 * 1024 ** 3
+    THUMBNAIL_RETRY_SECONDS: float = 3600.0  # files that failed are not retried on request before this
+
+    # Transcode configuration
+    TRANSCODE_MAX_WORKERS: int = 2  # concurrent full-length encoders
+    TRANSCODE_MAX_QUEUE: int = 4  # sessions waiting for an encoder before new ones are refused
+    TRANSCODE_IDLE_SECONDS: float = 30.0  # encoders without viewers this long are killed
+    TRANSCODE_REAP_INTERVAL: float = 5.0
+    TRANSCODE_DEFAULT_QUALITY: str = "auto"
+    REMUX_MAX_WORKERS: int = 8  # concurrent stream-copy remuxers, a fraction of a core each
+    REMUX_AUDIO_BITRATE: str = "192k"  # for audio tracks the client cannot decode
+    
+    # Playback progress configuration
+    PROGRESS_FLUSH_INTERVAL: float = 30.0  # seconds heartbeats are buffered before they are written
+    PROGRESS_FLUSH_BATCH: int = 500  # rows per upsert statement
+    PROGRESS_CACHE_SIZE: int = 10000  # flushed positions kept in memory for reads
+    PROGRESS_COMPLETE_RATIO: float = 0.92  # past this fraction of the runtime an item counts as watched
+    PROGRESS_MIN_POSITION: float = 30.0  # items left before this are not offered to resume
+    
+    # Watcher configuration
+    WATCHER_ENABLED: bool = True  # watch auto_scan libraries for changes
+    WATCHER_SETTLE_SECONDS: float = 10.0  # quiet period before a changed file is ingested
+    WATCHER_POLL_INTERVAL: float = 300.0  # seconds between snapshots on network mounts
+    
     # API configuration
     API_PREFIX: str = "/api/v1"
     PROJECT_NAME: str = "WildMediaServer"
@@ -1,48 +1,102 @@
-from fastapi import APIRouter, Depends, HTTPException
+from typing import Optional
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from backend.database.models.user import User
 from backend.database.session import get_db
 from backend.schemas.media import LibraryConfig, DirectoryScanResult
-from backend.services.media import (
-    scan_directory,
-    update_library_config,
-    get_directory_metadata
-)
+from backend.services.media import update_library_config
+from backend.services.directory_cache import get_directory_metadata
+from backend.services.hls import hls_service
+from backend.services.library_preview import preview_directory
+from backend.services.progress import progress_store
+from backend.services.stream_sessions import stream_sessions
+from backend.services.transcode import transcode_manager
 from backend.services.user import get_current_admin
+from backend.services.watcher import sync_library_watchers
+from backend.utils.exceptions import DirectoryScanException
+from backend.utils.bandwidth import bandwidth_scheduler
+from backend.utils.subprocess_executor import subprocess_executor
 
 router = APIRouter()
 
 @router.post("/admin/libraries/scan", response_model=DirectoryScanResult)
-async def admin_scan_directory(
+def admin_scan_directory(
     path: str,
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = None,
+    limit: int = Query(200, ge=1, le=1000),
     admin: User = Depends(get_current_admin)
 ):
     try:
-        scan_result = scan_directory(path)
-        return {
-            "path": path,
-            "total_files": scan_result.total_files,
-            "media_files": scan_result.media_files,
-            "subtitles_found": scan_result.subtitles_found
-        }
-    except Exception as e:
+        return preview_directory(path, cursor, limit)
+    except DirectoryScanException:
+        raise HTTPException(status_code=400, detail=f"Not a directory: {path}")
+    except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.put("/admin/libraries/config")
 async def update_config(
     config: LibraryConfig,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     admin: User = Depends(get_current_admin)
 ):
     updated_config = update_library_config(db, config)
+    # A changed path or auto_scan flag starts, moves or stops its watcher
+    background_tasks.add_task(sync_library_watchers)
     return {"message": "Library config updated", "config": updated_config}
 
 @router.get("/admin/libraries/metadata")
-async def get_directory_metadata(
+def admin_directory_metadata(
     path: str,
+    refresh: bool = False,
     db: Session = Depends(get_db),
     admin: User = Depends(get_current_admin)
 ):
-    metadata = get_directory_metadata(path)
-    return metadata
\ No newline at end of file
+    try:
+        return get_directory_metadata(db, path, refresh)
+    except DirectoryScanException:
+        raise HTTPException(status_code=400, detail=f"Not a directory: {path}")
+
+@router.get("/admin/subprocesses")
+async def admin_subprocess_stats(
+    admin: User = Depends(get_current_admin)
+):
+    """Queue depth and outcome counters of the shared ffmpeg/ffprobe executor and the HLS encoders"""
+    return dict(subprocess_executor.stats(), hls=hls_service.stats())
+
+@router.get("/admin/transcodes")
+async def admin_transcode_sessions(
+    admin: User = Depends(get_current_admin)
+):
+    """Running encoders, their viewers and the transcode pool's counters"""
+    return {"stats": transcode_manager.stats(), "sessions": transcode_manager.sessions()}
+
+@router.get("/admin/bandwidth")
+async def admin_bandwidth(
+    admin: User = Depends(get_current_admin)
+):
+    """Live per-stream byte counters, rates and time spent throttled"""
+    return {"stats": bandwidth_scheduler.stats(), "sessions": bandwidth_scheduler.sessions()}
+
+@router.get("/admin/progress")
+async def admin_progress_stats(
+    admin: User = Depends(get_current_admin)
+):
+    """Heartbeats buffered and rows written by the playback progress store"""
+    return progress_store.stats()
+
+@router.get("/admin/streams")
+async def admin_stream_sessions(
+    admin: User = Depends(get_current_admin)
+):
+    """Active playback sessions with bytes served, bitrate and time to first byte"""
+    return {"stats": stream_sessions.stats(), "sessions": stream_sessions.list()}
+
+@router.delete("/admin/streams/{session_id}")
+async def admin_terminate_stream(
+    session_id: str,
+    admin: User = Depends(get_current_admin)
+):
+    """End a playback session; its open responses stop at their next chunk"""
+    session = stream_sessions.terminate(session_id)
+    return {"message": "Stream terminated", "session": session.describe()}
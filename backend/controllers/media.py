@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
 from sqlalchemy.orm import Session
 from backend.database.models import User, MediaLibrary
 from backend.database.session import get_db
@@ -6,20 +6,27 @@ from backend.schemas.media import (
     MediaLibraryCreate,
     MediaLibraryResponse,
     MediaItemResponse,
-    MediaScanResult
+    ScanJobResponse
 )
 from backend.services.media import (
     create_media_library,
-    scan_media_directory,
     get_all_libraries,
     get_library_by_id,
     get_library_media
 )
+from backend.services.scan_jobs import (
+    enqueue_scan,
+    get_scan_job,
+    cancel_scan_job,
+    describe_scan_job
+)
 from backend.services.user import get_current_admin, get_current_user
+from backend.services.watcher import sync_library_watchers
 from backend.utils.exceptions import (
     MediaNotFoundException,
     DirectoryScanException,
-    InvalidMediaTypeException
+    InvalidMediaTypeException,
+    ScanJobNotFoundException
 )
 
 router = APIRouter()
@@ -27,6 +34,7 @@ router = APIRouter()
 @router.post("/libraries", response_model=MediaLibraryResponse)
 async def create_library(
     library_data: MediaLibraryCreate,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     admin: User = Depends(get_current_admin)
 ):
@@ -38,6 +46,8 @@ async def create_library(
             "media_type": library_data.media_type,
             "owner_id": admin.id
         })
+        # Start watching it if auto_scan is on
+        background_tasks.add_task(sync_library_watchers)
         return library
     except DirectoryScanException as e:
         raise HTTPException(
@@ -50,32 +60,48 @@ async def create_library(
             detail="Failed to create media library"
         )
 
-@router.post("/libraries/{library_id}/scan", response_model=MediaScanResult)
+@router.post("/libraries/{library_id}/scan", response_model=ScanJobResponse, status_code=202)
 async def scan_library(
     library_id: int,
     db: Session = Depends(get_db),
     admin: User = Depends(get_current_admin)
 ):
-    """Scan a media library for new content"""
+    """Queue a background scan of a media library, or join the one already running"""
     try:
-        library = get_library_by_id(db, library_id)
-        result = scan_media_directory(db, library.id)
-        return {
-            "total_files": result["total_files"],
-            "new_files": result["new_files"],
-            "updated_files": result["updated_files"],
-            "failed_files": result["failed_files"]
-        }
+        job = enqueue_scan(db, library_id, admin.id)
+        return describe_scan_job(job)
     except MediaNotFoundException as e:
         raise HTTPException(status_code=404, detail=str(e))
-    except DirectoryScanException as e:
-        raise HTTPException(status_code=500, detail=str(e))
     except Exception as e:
         raise HTTPException(
             status_code=500,
-            detail="Library scan failed"
+            detail="Failed to queue library scan"
         )
 
+@router.get("/scan-jobs/{job_id}", response_model=ScanJobResponse)
+async def get_scan_job_status(
+    job_id: int,
+    db: Session = Depends(get_db),
+    admin: User = Depends(get_current_admin)
+):
+    """Get live progress or the final result of a library scan"""
+    try:
+        return describe_scan_job(get_scan_job(db, job_id))
+    except ScanJobNotFoundException as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@router.delete("/scan-jobs/{job_id}", response_model=ScanJobResponse)
+async def cancel_scan(
+    job_id: int,
+    db: Session = Depends(get_db),
+    admin: User = Depends(get_current_admin)
+):
+    """Cancel a queued or running library scan"""
+    try:
+        return describe_scan_job(cancel_scan_job(db, job_id))
+    except ScanJobNotFoundException as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
 @router.get("/libraries", response_model=list[MediaLibraryResponse])
 async def list_libraries(
     skip: int = 0,
@@ -1,72 +1,269 @@
-from fastapi import APIRouter, Depends, HTTPException, Request
-from fastapi.responses import StreamingResponse, FileResponse
+import time
+from typing import List
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Path, Query, Request
+from starlette.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, Response
 from sqlalchemy.orm import Session
 from backend.database.models import User, Media
 from backend.database.session import get_db
 from backend.schemas.media import (
+    ClientCapabilities,
     PlaybackRequest,
+    ProgressUpdate,
     SubtitleConfig,
     PlayerSettings
 )
-from backend.services.media import (
-    get_media_item,
+from backend.services.media import get_related_media
+from backend.services.hls import HLSError, hls_service
+from backend.services.player import (
+    continue_watching,
     get_media_stream,
     get_subtitle_file,
-    get_related_media
+    keyframe_start,
+    load_media,
+    plan_media_playback,
+    resolve_playback_profile,
+    resume_position,
+    stream_throttle,
+    warm_keyframe_index
 )
+from backend.services.progress import progress_store
+from backend.services.thumbnails import thumbnail_pipeline
+from backend.services.transcode import PlaybackPlan, TranscodeBusy, TranscodeError, transcode_manager
 from backend.services.user import (
     get_current_user,
+    get_stream_user,
     update_user_settings,
     get_user_settings
 )
 from backend.utils.exceptions import (
     MediaNotFoundException,
+    StreamLimitException,
+    StreamTerminatedException,
     SubtitleNotFoundException,
     SettingsUpdateException
 )
+from backend.utils.streaming import FileRangeResponse, GrowingFileResponse
 
 router = APIRouter()
 
-@router.get("/stream/{media_id}")
+@router.api_route("/stream/{media_id}", methods=["GET", "HEAD"])
 async def stream_media(
     media_id: int,
     request: Request,
-    db: Session = Depends(get_db),
-    user: User = Depends(get_current_user)
+    user: User = Depends(get_stream_user)
 ):
-    """Stream media content with byte-range support"""
+    """
+    Stream media content with byte-range and conditional request support.
+    User and media are resolved in short-lived sessions, so no pooled
+    connection is held while the body is transferred, and the file is
+    stat'ed on a worker thread, since a slow mount would stall the loop.
+    """
+    received = time.monotonic()
     try:
-        media = get_media_item(db, media_id)
-        if not media:
-            raise MediaNotFoundException()
-        
-        range_header = request.headers.get("range")
-        stream_gen = get_media_stream(media.file_path, range_header)
-        
-        return StreamingResponse(
-            content=stream_gen["content"],
-            status_code=stream_gen["status_code"],
-            media_type=stream_gen["media_type"],
-            headers=stream_gen["headers"]
-        )
+        media = await run_in_threadpool(load_media, media_id)
+        throttle = await stream_throttle(media, user.id, request.client.host, received)
+        return await run_in_threadpool(get_media_stream, media, request.headers, request.method, throttle)
     except MediaNotFoundException as e:
         raise HTTPException(status_code=404, detail=str(e))
+    except (StreamLimitException, StreamTerminatedException):
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail="Failed to stream media content"
         )
 
+@router.post("/play")
+async def start_playback(
+    playback: PlaybackRequest,
+    background_tasks: BackgroundTasks,
+    user: User = Depends(get_current_user)
+):
+    """
+    Decide how a client should play a media item: directly, through a
+    stream-copy remux, or through a transcode at the resolved quality
+    """
+    try:
+        media = await run_in_threadpool(load_media, playback.media_id)
+        plan = await run_in_threadpool(plan_media_playback, media, playback.capabilities)
+        profile = await run_in_threadpool(resolve_playback_profile, media, playback.quality, user.id)
+    except MediaNotFoundException as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except TranscodeError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    start_time = playback.start_time
+    if start_time is None:
+        start_time = await run_in_threadpool(resume_position, user.id, media.id)
+    start, start_byte = await keyframe_start(media, start_time)
+    # Index the file in the background (a no-op once cached) so later
+    # seeks and HLS sessions start on keyframes
+    background_tasks.add_task(warm_keyframe_index, media)
+    # An explicit quality asks for a bitrate-capped encode; the stored
+    # default only picks the profile for transcodes and HLS
+    if playback.quality and playback.quality != "auto":
+        plan = PlaybackPlan("transcode")
+    if plan.mode == "direct":
+        stream_url = f"/stream/{media.id}"
+    elif plan.mode == "remux":
+        capabilities = playback.capabilities or ClientCapabilities()
+        stream_url = (
+            f"/remux/{media.id}?start={start}"
+            f"&video_codecs={','.join(capabilities.video_codecs)}"
+            f"&audio_codecs={','.join(capabilities.audio_codecs)}"
+        )
+    else:
+        stream_url = f"/transcode/{media.id}?quality={profile.name}&start={start}"
+    return {
+        "media_id": media.id,
+        "mode": plan.mode,
+        "quality": profile.name,
+        "start_time": start,
+        "start_byte": start_byte,
+        "stream_url": stream_url,
+        "hls_url": f"/hls/{media.id}/index.m3u8?quality={profile.name}",
+        "direct_url": f"/stream/{media.id}"
+    }
+
+@router.get("/remux/{media_id}")
+async def remux_media(
+    media_id: int,
+    request: Request,
+    start: float = Query(0.0, ge=0.0),
+    video_codecs: str = None,
+    audio_codecs: str = None,
+    user: User = Depends(get_stream_user)
+):
+    """
+    Fragmented MP4 with the video stream copied as-is. Audio is copied too
+    unless the client's audio_codecs (comma separated) rule it out, in which
+    case only the audio is transcoded to AAC. video_codecs and audio_codecs
+    carry the capabilities the client declared to /play.
+    """
+    capabilities = ClientCapabilities()
+    if video_codecs:
+        capabilities.video_codecs = _codec_list(video_codecs)
+    if audio_codecs:
+        capabilities.audio_codecs = _codec_list(audio_codecs)
+    received = time.monotonic()
+    try:
+        media = await run_in_threadpool(load_media, media_id)
+        plan = await run_in_threadpool(plan_media_playback, media, capabilities)
+        if plan.mode == "transcode":
+            raise HTTPException(status_code=409, detail="Video codec needs a transcode")
+        start, _ = await keyframe_start(media, start)
+        throttle = await stream_throttle(media, user.id, request.client.host, received)
+        session = transcode_manager.remux(media, plan, start)
+    except MediaNotFoundException as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except TranscodeBusy as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "10"})
+    return GrowingFileResponse(
+        session.spool,
+        is_complete=session.is_complete,
+        on_close=session.detach,
+        media_type="video/mp4",
+        headers={"Cache-Control": "no-store", "X-Start-Time": f"{start:.3f}"},
+        throttle=throttle
+    )
+
+@router.get("/transcode/{media_id}")
+async def transcode_media(
+    media_id: int,
+    request: Request,
+    quality: str = None,
+    start: float = Query(0.0, ge=0.0),
+    user: User = Depends(get_stream_user)
+):
+    """
+    Fragmented MP4 transcode at the requested quality. Viewers asking for the
+    same media, quality and start share one encoder.
+    """
+    received = time.monotonic()
+    try:
+        media = await run_in_threadpool(load_media, media_id)
+        profile = await run_in_threadpool(resolve_playback_profile, media, quality, user.id)
+        start, _ = await keyframe_start(media, start)
+        throttle = await stream_throttle(media, user.id, request.client.host, received)
+        session = transcode_manager.open(media, profile, start)
+    except MediaNotFoundException as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except TranscodeBusy as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "10"})
+    except TranscodeError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return GrowingFileResponse(
+        session.spool,
+        is_complete=session.is_complete,
+        on_close=session.detach,
+        media_type="video/mp4",
+        headers={"Cache-Control": "no-store", "X-Start-Time": f"{start:.3f}"},
+        throttle=throttle
+    )
+
+@router.get("/hls/{media_id}/index.m3u8")
+async def hls_playlist(
+    media_id: int,
+    quality: str = None,
+    user: User = Depends(get_stream_user)
+):
+    """VOD playlist for on-demand HLS, built from the probed duration"""
+    try:
+        media = await run_in_threadpool(load_media, media_id)
+        profile = await run_in_threadpool(resolve_playback_profile, media, quality, user.id)
+        playlist = await hls_service.playlist(media, profile)
+    except MediaNotFoundException as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except TranscodeError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except HLSError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return Response(
+        playlist,
+        media_type="application/vnd.apple.mpegurl",
+        headers={"Cache-Control": "no-cache"}
+    )
+
+@router.api_route("/hls/{media_id}/segment/{index}.ts", methods=["GET", "HEAD"])
+async def hls_segment(
+    media_id: int,
+    index: int,
+    request: Request,
+    quality: str = None,
+    layout: str = Query(None, regex="^(keyframe|fixed)$"),
+    user: User = Depends(get_stream_user)
+):
+    """One HLS segment, encoded on first request and served from the disk cache"""
+    received = time.monotonic()
+    try:
+        media = await run_in_threadpool(load_media, media_id)
+        profile = await run_in_threadpool(resolve_playback_profile, media, quality, user.id)
+        path = await hls_service.segment(media, index, profile, layout)
+        throttle = await stream_throttle(media, user.id, request.client.host, received)
+    except MediaNotFoundException as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except TranscodeError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except HLSError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return FileRangeResponse(
+        path,
+        media_type="video/mp2t",
+        headers={"Cache-Control": "private, max-age=86400"},
+        method=request.method,
+        throttle=throttle
+    )
+
 @router.get("/subtitles/{media_id}")
 async def get_subtitles(
     media_id: int,
     language: str = "en",
-    db: Session = Depends(get_db),
-    user: User = Depends(get_current_user)
+    user: User = Depends(get_stream_user)
 ):
     """Get subtitle file for specified media"""
     try:
-        subtitle_path = get_subtitle_file(db, media_id, language)
+        subtitle_path = await get_subtitle_file(media_id, language)
         return FileResponse(
             subtitle_path,
             media_type="text/vtt",
@@ -83,6 +280,50 @@ async def get_subtitles(
             detail="Failed to retrieve subtitles"
         )
 
+@router.post("/progress")
+async def report_progress(
+    update: ProgressUpdate,
+    user: User = Depends(get_current_user)
+):
+    """
+    Player heartbeat. Positions are buffered in memory and written in
+    batches, so clients may report every few seconds. The media is looked
+    up on the first heartbeat of a pair only, so unknown ids are refused
+    without a query per heartbeat.
+    """
+    if not progress_store.known(user.id, update.media_id):
+        try:
+            await run_in_threadpool(load_media, update.media_id)
+        except MediaNotFoundException as e:
+            raise HTTPException(status_code=404, detail=str(e))
+    progress = progress_store.record(user.id, update.media_id, update.position, update.duration)
+    return progress.describe()
+
+@router.get("/progress/{media_id}")
+async def get_progress(
+    media_id: int,
+    user: User = Depends(get_current_user)
+):
+    """Saved position of the current user in a media item"""
+    progress = await run_in_threadpool(progress_store.get, user.id, media_id)
+    if progress is None:
+        raise HTTPException(status_code=404, detail="No progress saved for this media")
+    return progress.describe()
+
+@router.get("/continue-watching")
+async def get_continue_watching(
+    limit: int = Query(20, ge=1, le=100),
+    user: User = Depends(get_current_user)
+):
+    """Unfinished media items, most recently watched first"""
+    try:
+        return {"items": await run_in_threadpool(continue_watching, user.id, limit)}
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail="Failed to load watch progress"
+        )
+
 @router.post("/settings")
 async def update_player_settings(
     settings: PlayerSettings,
@@ -109,6 +350,34 @@ async def update_player_settings(
             detail="Failed to update settings"
         )
 
+@router.get("/thumbnails/{fingerprint}/{name}")
+async def get_thumbnail(
+    request: Request,
+    fingerprint: str = Path(..., regex=r"^[0-9a-f-]{8,64}$"),
+    name: str = Path(..., regex=r"^(poster\.jpg|sprites\.vtt|sprite_\d{3}\.jpg)$"),
+    user: User = Depends(get_stream_user)
+):
+    """
+    Poster, seek-bar sprite sheet or its WebVTT index. URLs are addressed
+    by content fingerprint, so responses never change and are cached for
+    good; the origin file is never read.
+    """
+    path = thumbnail_pipeline.cached(fingerprint, name)
+    if path is None:
+        # Not generated yet, or evicted: move it to the front of the queue
+        thumbnail_pipeline.request(fingerprint, name)
+        raise HTTPException(
+            status_code=404,
+            detail="Thumbnail not generated yet",
+            headers={"Retry-After": "30"}
+        )
+    return FileRangeResponse(
+        path,
+        media_type="text/vtt" if name.endswith(".vtt") else "image/jpeg",
+        headers={"Cache-Control": "private, max-age=31536000, immutable"},
+        method=request.method
+    )
+
 @router.get("/related/{media_id}")
 async def get_related_content(
     media_id: int,
@@ -130,4 +399,7 @@ async def get_related_content(
         raise HTTPException(
             status_code=500,
             detail="Failed to find related content"
-        )
\ No newline at end of file
+        )
+
+def _codec_list(value: str) -> List[str]:
+    return [codec.strip() for codec in value.split(",") if codec.strip()]
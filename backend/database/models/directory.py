@@ -0,0 +1,17 @@
+from datetime import datetime
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime
+from sqlalchemy.sql import func
+from ..session import Base
+
+class DirectoryAggregate(Base):
+    __tablename__ = "directory_aggregates"
+
+    id = Column(Integer, primary_key=True, index=True)
+    path = Column(String(511), unique=True, nullable=False)
+    # Direct totals of the files in this directory, subtrees are summed by path prefix
+    size = Column(BigInteger, default=0, nullable=False)
+    file_count = Column(Integer, default=0, nullable=False)
+    media_count = Column(Integer, default=0, nullable=False)
+    newest_mtime_ns = Column(BigInteger, default=0, nullable=False)
+    scan_token = Column(BigInteger, index=True)  # Last full scan that saw this directory
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -2,4 +2,9 @@
 from .user import User, UserRole, InviteCode, InviteCodeUsage
 from .media import Media, MediaType
 from .library import MediaLibrary
-from .subtitle import Subtitle, SubtitleFormat, SubtitleSource, SubtitleSyncStatus
\ No newline at end of file
+from .subtitle import Subtitle, SubtitleFormat, SubtitleSource, SubtitleSyncStatus
+from .manifest import FileManifestEntry
+from .scan_job import ScanJob, ScanJobStatus
+from .directory import DirectoryAggregate
+from .probe import ProbeResult
+from .progress import PlaybackProgress
@@ -0,0 +1,20 @@
+from datetime import datetime
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime
+from sqlalchemy.sql import func
+from ..session import Base
+
+class FileManifestEntry(Base):
+    __tablename__ = "file_manifest"
+
+    id = Column(Integer, primary_key=True, index=True)
+    path = Column(String(511), unique=True, nullable=False)
+    device = Column(BigInteger, nullable=False)
+    inode = Column(BigInteger, nullable=False)
+    size = Column(BigInteger, nullable=False)
+    mtime_ns = Column(BigInteger, nullable=False)
+    fingerprint = Column(String(64), index=True, nullable=False)  # Sampled BLAKE2b fingerprint
+    hash = Column(String(128))  # Full BLAKE2b hash, filled by background verification
+    extension = Column(String(16))
+    scan_token = Column(BigInteger, index=True)  # Last full scan that saw this file
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
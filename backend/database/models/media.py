@@ -20,6 +20,8 @@ class Media(Base):
     media_type = Column(Enum(MediaType), nullable=False)
     metadata = Column(JSON, nullable=False)
     duration = Column(Integer)  # In seconds
+    fingerprint = Column(String(64), index=True)  # Sampled BLAKE2b fingerprint
+    hash = Column(String(128))  # Full BLAKE2b hash, filled by background verification
     library_id = Column(Integer, ForeignKey("media_libraries.id"), nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
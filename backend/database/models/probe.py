@@ -0,0 +1,14 @@
+from sqlalchemy import Column, Integer, Float, String, DateTime, JSON
+from sqlalchemy.sql import func
+from ..session import Base
+
+class ProbeResult(Base):
+    __tablename__ = "probe_results"
+
+    id = Column(Integer, primary_key=True, index=True)
+    fingerprint = Column(String(64), unique=True, nullable=False)  # Content fingerprint the probe belongs to
+    path = Column(String(511))  # Last path probed with this fingerprint
+    duration = Column(Float)  # Seconds, from format.duration
+    data = Column(JSON, nullable=False)  # Raw ffprobe JSON: format, streams, chapters
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
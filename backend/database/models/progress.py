@@ -0,0 +1,15 @@
+from sqlalchemy import Boolean, Column, Integer, Float, DateTime, ForeignKey, Index
+from ..session import Base
+
+class PlaybackProgress(Base):
+    __tablename__ = "playback_progress"
+    __table_args__ = (
+        Index("ix_playback_progress_user_updated", "user_id", "updated_at"),
+    )
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    media_id = Column(Integer, ForeignKey("media.id", ondelete="CASCADE"), primary_key=True)
+    position = Column(Float, nullable=False)  # Resume position in seconds
+    duration = Column(Float)  # Runtime reported by the player, in seconds
+    completed = Column(Boolean, default=False, nullable=False)
+    updated_at = Column(DateTime(timezone=True), nullable=False)  # Time of the last heartbeat, not of the flush
@@ -0,0 +1,37 @@
+from datetime import datetime
+from sqlalchemy import Column, Integer, BigInteger, String, Boolean, Enum, DateTime, ForeignKey, JSON
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
+from ..session import Base
+import enum
+
+class ScanJobStatus(enum.Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+class ScanJob(Base):
+    __tablename__ = "scan_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    library_id = Column(Integer, ForeignKey("media_libraries.id"), nullable=False, index=True)
+    # Holds library_id while the job is queued or running, NULL afterwards;
+    # the unique index makes concurrent scan requests coalesce into one job
+    active_lock = Column(Integer, unique=True)
+    status = Column(Enum(ScanJobStatus), default=ScanJobStatus.QUEUED, nullable=False, index=True)
+    cancel_requested = Column(Boolean, default=False, nullable=False)
+    estimated_files = Column(Integer, default=0)
+    files_processed = Column(Integer, default=0, nullable=False)
+    bytes_hashed = Column(BigInteger, default=0, nullable=False)
+    result = Column(JSON)
+    error = Column(String(1024))
+    requested_by = Column(Integer, ForeignKey("users.id"))
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True))
+    finished_at = Column(DateTime(timezone=True))
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+    # Relationships
+    library = relationship("MediaLibrary")
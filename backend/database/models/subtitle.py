@@ -34,6 +34,7 @@ class Subtitle(Base):
     sync_status = Column(Enum(SubtitleSyncStatus), default=SubtitleSyncStatus.PENDING)
     sync_offset = Column(Float)  # In seconds
     hash = Column(String(128), nullable=False)  # BLAKE2b hash
+    fingerprint = Column(String(64), index=True)  # Sampled BLAKE2b fingerprint
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     uploader_id = Column(Integer, ForeignKey("users.id"))
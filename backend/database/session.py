@@ -1,3 +1,4 @@
+from contextlib import contextmanager
 from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
@@ -21,4 +22,16 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+@contextmanager
+def session_scope():
+    """
+    Short-lived session for work that must not hold a pooled connection for
+    the rest of the request, such as long response bodies
+    """
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
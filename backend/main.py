@@ -1,7 +1,17 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from backend.database.session import engine, Base
+from backend.database.models.library import MediaLibrary
 from backend.config import settings
+from backend.services.hls import hls_service
+from backend.services.progress import progress_store
+from backend.services.scan_jobs import scan_worker
+from backend.services.thumbnails import thumbnail_pipeline
+from backend.services.transcode import transcode_manager
+from backend.services.watcher import library_watcher, sync_library_watchers
+from backend.utils.disk_cache import keyframe_cache, media_cache, thumbnail_cache
+from backend.utils.filename_parser import FilenameParser
+from backend.utils.subprocess_executor import subprocess_executor
 from backend.controllers import (
     auth,
     user,
@@ -36,6 +46,60 @@ app.include_router(library.router, prefix=settings.API_PREFIX)
 app.include_router(player.router, prefix=settings.API_PREFIX)
 app.include_router(subtitle.router, prefix=settings.API_PREFIX)
 
+@app.on_event("startup")
+def start_library_watcher():
+    sync_library_watchers()
+
+@app.on_event("shutdown")
+def stop_library_watcher():
+    library_watcher.stop()
+
+@app.on_event("startup")
+def load_media_cache():
+    media_cache.load()
+    thumbnail_cache.load()
+    keyframe_cache.load()
+
+@app.on_event("startup")
+def start_scan_worker():
+    scan_worker.start()
+
+@app.on_event("shutdown")
+def stop_scan_worker():
+    scan_worker.stop()
+
+@app.on_event("startup")
+def start_thumbnail_pipeline():
+    thumbnail_pipeline.start()
+
+@app.on_event("shutdown")
+def stop_thumbnail_pipeline():
+    thumbnail_pipeline.stop()
+
+@app.on_event("startup")
+def start_progress_store():
+    progress_store.start()
+
+@app.on_event("shutdown")
+def stop_progress_store():
+    progress_store.stop()
+
+@app.on_event("shutdown")
+async def stop_transcode_manager():
+    await transcode_manager.shutdown()
+
+@app.on_event("shutdown")
+def stop_hls_service():
+    hls_service.shutdown()
+
+@app.on_event("shutdown")
+def stop_subprocess_executor():
+    subprocess_executor.shutdown()
+
+@app.on_event("shutdown")
+def stop_filename_parser():
+    FilenameParser.shutdown()
+
 @app.get("/")
 def read_root():
     return {"message": "Welcome to WildMediaServer API"}
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field, validator
 from datetime import datetime
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, Union
 from enum import Enum
 
 class MediaType(str, Enum):
@@ -43,11 +43,60 @@ class MediaScanResult(BaseModel):
     failed_files: int
     scan_duration: float
 
+class ScanPreviewItem(BaseModel):
+    path: str
+    kind: str
+    title: Optional[str]
+    media_type: Optional[str]
+    year: Optional[int]
+    season: Optional[Union[int, List[int]]]
+    episode: Optional[Union[int, List[int]]]
+
+class DirectoryScanResult(BaseModel):
+    path: str
+    items: List[ScanPreviewItem]
+    media_files: int
+    subtitles_found: int
+    next_cursor: Optional[str]
+
+class ScanJobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+class ScanJobResponse(BaseModel):
+    id: int
+    library_id: int
+    status: ScanJobStatus
+    files_processed: int
+    estimated_files: Optional[int]
+    bytes_hashed: int
+    files_per_sec: float
+    eta_seconds: Optional[float]
+    created_at: Optional[datetime]
+    started_at: Optional[datetime]
+    finished_at: Optional[datetime]
+    result: Optional[MediaScanResult]
+    error: Optional[str]
+
+class ClientCapabilities(BaseModel):
+    containers: List[str] = ["mp4", "m4v", "mov", "webm"]
+    video_codecs: List[str] = ["h264"]
+    audio_codecs: List[str] = ["aac", "mp3", "opus", "vorbis", "flac"]
+
 class PlaybackRequest(BaseModel):
     media_id: int
-    start_time: Optional[float] = 0.0
+    start_time: Optional[float] = None  # None resumes from the saved position
     subtitle_lang: Optional[str] = "en"
-    quality: Optional[str] = "auto"
+    quality: Optional[str] = None  # None applies the user's default_quality
+    capabilities: Optional[ClientCapabilities] = None
+
+class ProgressUpdate(BaseModel):
+    media_id: int
+    position: float = Field(..., ge=0)  # seconds
+    duration: Optional[float] = Field(None, gt=0)
 
 class PlayerSettings(BaseModel):
     subtitle_font: Optional[str] = "Arial"
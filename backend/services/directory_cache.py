@@ -0,0 +1,144 @@
+import os
+import time
+import logging
+from pathlib import Path
+from typing import Dict, List
+from sqlalchemy import func
+from sqlalchemy.dialects.mysql import insert
+from sqlalchemy.orm import Session
+from backend.database.models.directory import DirectoryAggregate
+from backend.utils.exceptions import DirectoryScanException
+from backend.utils.file_scanner import FileScanner
+from backend.utils.walker import DirectoryTotals, DirectoryWalker
+
+logger = logging.getLogger(__name__)
+
+class DirectoryAggregateStore:
+    """
+    Buffers per-directory totals reported by the walker and writes them with
+    batched upserts on the caller's session
+    """
+
+    def __init__(self, db: Session, scan_token: int = None, batch_size: int = 500):
+        self.db = db
+        self.scan_token = scan_token
+        self.batch_size = batch_size
+        self._rows: List[Dict] = []
+
+    def record(self, totals: DirectoryTotals) -> None:
+        self._rows.append({
+            "path": totals.path,
+            "size": totals.size,
+            "file_count": totals.file_count,
+            "media_count": totals.matched_count,
+            "newest_mtime_ns": totals.newest_mtime_ns,
+            "scan_token": self.scan_token
+        })
+        if len(self._rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._rows:
+            return
+        stmt = insert(DirectoryAggregate.__table__).values(self._rows)
+        self.db.execute(stmt.on_duplicate_key_update(
+            size=stmt.inserted.size,
+            file_count=stmt.inserted.file_count,
+            media_count=stmt.inserted.media_count,
+            newest_mtime_ns=stmt.inserted.newest_mtime_ns,
+            scan_token=func.coalesce(stmt.inserted.scan_token, DirectoryAggregate.scan_token),
+            updated_at=func.now()
+        ))
+        self._rows = []
+
+    def sweep(self, root: Path) -> int:
+        """Drop aggregates under root for directories the current scan did not visit"""
+        self.flush()
+        return self.db.query(DirectoryAggregate).filter(
+            _under(root),
+            (DirectoryAggregate.scan_token != self.scan_token) |
+            DirectoryAggregate.scan_token.is_(None)
+        ).delete(synchronize_session=False)
+
+def refresh_directory(db: Session, path: Path) -> None:
+    """
+    Recompute the direct totals of a single directory, used for watcher events;
+    a directory that no longer exists has its whole subtree dropped
+    """
+    if not path.is_dir():
+        db.query(DirectoryAggregate).filter(_under(path)).delete(synchronize_session=False)
+        return
+
+    totals = DirectoryTotals(str(path))
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                if not entry.is_file():
+                    continue
+                st = entry.stat()
+                totals.size += st.st_size
+                totals.file_count += 1
+                totals.newest_mtime_ns = max(totals.newest_mtime_ns, st.st_mtime_ns)
+                if entry.name.rpartition('.')[2].lower() in FileScanner.MEDIA_EXTENSIONS:
+                    totals.matched_count += 1
+    except OSError as e:
+        logger.warning(f"Directory aggregate refresh failed for {path}: {str(e)}")
+        return
+
+    store = DirectoryAggregateStore(db)
+    store.record(totals)
+    store.flush()
+
+def get_directory_metadata(db: Session, path: str, refresh: bool = False) -> Dict:
+    """
+    Size, file count, media count and newest mtime of a directory tree,
+    answered from the aggregate cache unless a recomputation is requested
+    """
+    path_obj = Path(path)
+    if not path_obj.is_dir():
+        raise DirectoryScanException(context={"path": path})
+
+    # Rows under the path only cover all of it if the path itself was
+    # walked, as a root or beneath one; a scanned subtree alone does not
+    if not refresh and db.query(DirectoryAggregate.id).filter(
+        DirectoryAggregate.path == str(path_obj)
+    ).first() is not None:
+        return _summarize(db, path_obj)
+
+    scan_token = int(time.time() * 1000)
+    store = DirectoryAggregateStore(db, scan_token)
+    walker = DirectoryWalker(path_obj, FileScanner.MEDIA_EXTENSIONS, on_directory=store.record)
+    for _ in walker:
+        pass
+    store.sweep(path_obj)
+    db.commit()
+    return _summarize(db, path_obj)
+
+def _summarize(db: Session, path: Path):
+    row = db.query(
+        func.count(DirectoryAggregate.id),
+        func.coalesce(func.sum(DirectoryAggregate.size), 0),
+        func.coalesce(func.sum(DirectoryAggregate.file_count), 0),
+        func.coalesce(func.sum(DirectoryAggregate.media_count), 0),
+        func.coalesce(func.max(DirectoryAggregate.newest_mtime_ns), 0),
+        func.min(DirectoryAggregate.updated_at)
+    ).filter(_under(path)).one()
+
+    directories, total_size, file_count, media_count, newest_mtime_ns, computed_at = row
+    if not directories:
+        return None
+    return {
+        "path": str(path),
+        "total_size": int(total_size),
+        "file_count": int(file_count),
+        "media_count": int(media_count),
+        "directory_count": directories,
+        "newest_mtime": newest_mtime_ns / 1e9 if newest_mtime_ns else None,
+        "computed_at": computed_at
+    }
+
+def _under(path: Path):
+    key = str(path)
+    return (DirectoryAggregate.path == key) | DirectoryAggregate.path.startswith(
+        os.path.join(key, ''), autoescape=True
+    )
@@ -1,39 +1,50 @@
-import os
 import hashlib
 from pathlib import Path
 from typing import List, Dict
-from backend.config import settings
+from backend.utils.file_scanner import FileScanner
+from backend.utils.walker import DirectoryWalker
 
 MEDIA_EXTENSIONS = {'mp4', 'avi', 'mkv', 'mov', 'flv'}
 
 def scan_directory(path: str) -> List[Dict]:
-    media_files = []
-    for root, dirs, files in os.walk(path):
-        for file in files:
-            if file.split('.')[-1].lower() in MEDIA_EXTENSIONS:
-                file_path = Path(root) / file
-                media_files.append({
-                    'path': str(file_path),
-                    'size': file_path.stat().st_size,
-                    'modified': file_path.stat().st_mtime,
-                    'hash': calculate_file_hash(file_path)
-                })
-    return media_files
-
-def calculate_file_hash(file_path: Path, chunk_size: int = 8192) -> str:
+    return _describe_media(DirectoryWalker(Path(path), MEDIA_EXTENSIONS))
+
+def calculate_file_hash(file_path: Path, chunk_size: int = 1024 * 1024) -> str:
     hasher = hashlib.md5()
     with open(file_path, 'rb') as f:
         while chunk := f.read(chunk_size):
             hasher.update(chunk)
     return hasher.hexdigest()
 
+def calculate_file_fingerprint(file_path: Path, size: int = None) -> str:
+    return FileScanner.calculate_fingerprint(file_path, size)
+
 def get_directory_metadata(path: str) -> Dict:
     path_obj = Path(path)
     if not path_obj.is_dir():
         return {}
-    
+
+    # One walk yields totals for every file plus the media subset
+    walker = DirectoryWalker(path_obj)
+    media_entries = [
+        entry for entry in walker
+        if entry.path.suffix[1:].lower() in MEDIA_EXTENSIONS
+    ]
+
     return {
-        'total_size': sum(f.stat().st_size for f in path_obj.glob('**/*') if f.is_file()),
-        'file_count': sum(1 for _ in path_obj.glob('**/*') if _.is_file()),
-        'media_files': scan_directory(path)
-    }
\ No newline at end of file
+        'total_size': walker.total_size,
+        'file_count': walker.file_count,
+        'media_files': _describe_media(media_entries)
+    }
+
+def _describe_media(entries) -> List[Dict]:
+    return [
+        {
+            'path': metadata['path'],
+            'size': metadata['size'],
+            'modified': metadata['modified'],
+            'fingerprint': metadata['fingerprint'],
+            'hash': metadata['hash']
+        }
+        for metadata in FileScanner.describe_files(entries)
+    ]
@@ -0,0 +1,206 @@
+import math
+import asyncio
+import logging
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+from backend.config import settings
+from backend.database.models.media import Media
+from backend.services.transcode import PROFILES, TranscodeProfile
+from backend.utils.disk_cache import media_cache
+from backend.utils.keyframe_index import KeyframeIndex, KeyframeIndexError, KeyframeIndexer
+from backend.utils.media_probe import MediaProbe, MediaProbeError, probe_duration
+from backend.utils.subprocess_executor import SubprocessError, SubprocessExecutor
+
+logger = logging.getLogger(__name__)
+
+class HLSError(Exception):
+    """Raised when a playlist or segment cannot be produced"""
+
+class HLSService:
+    """
+    On-demand HLS for files browsers cannot play directly.
+
+    The VOD playlist is computed from the cached probe duration, so it is
+    available before any encoding happens. Segments start on keyframes
+    when the file's keyframe index is already cached; otherwise the
+    playlist uses fixed-length segments and the index is built in the
+    background for later plays. The layout is carried in segment URLs so
+    a playlist's boundaries never change under a player. Each segment is
+    encoded on its own with an input seek to its start, so a seek only
+    costs the segment it lands in.
+    Segments are cached in the shared disk LRU, and the next few are
+    encoded ahead of the playhead. Encoders run on their own executor, so
+    prefetching never holds the slots ffprobe needs.
+    """
+
+    def __init__(self):
+        self._executor = SubprocessExecutor(settings.HLS_MAX_WORKERS, name="hls-executor")
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._prefetching: Set[asyncio.Task] = set()
+        self._indexing: Dict[str, asyncio.Task] = {}
+
+    async def playlist(self, media: Media, profile: TranscodeProfile = PROFILES["1080p"]) -> str:
+        layout, spans = await self._segments(media)
+        lines = [
+            "#EXTM3U",
+            "#EXT-X-VERSION:3",
+            f"#EXT-X-TARGETDURATION:{math.ceil(max(length for _, length in spans))}",
+            "#EXT-X-MEDIA-SEQUENCE:0",
+            "#EXT-X-PLAYLIST-TYPE:VOD"
+        ]
+        for index, (_, length) in enumerate(spans):
+            lines.append(f"#EXTINF:{length:.3f},")
+            lines.append(f"segment/{index}.ts?quality={profile.name}&layout={layout}")
+        lines.append("#EXT-X-ENDLIST")
+        return "\n".join(lines) + "\n"
+
+    async def segment(
+        self,
+        media: Media,
+        index: int,
+        profile: TranscodeProfile = PROFILES["1080p"],
+        layout: str = None
+    ) -> Path:
+        """
+        Path of a cached segment, encoding it (and prefetching ahead) as
+        needed. layout is the one the playlist was built with.
+        """
+        _, spans = await self._segments(media, layout)
+        if not 0 <= index < len(spans):
+            raise HLSError(f"Segment {index} out of range")
+
+        path = await self._ensure(media, index, spans[index], profile)
+        for ahead in range(index + 1, min(index + 1 + settings.HLS_PREFETCH_SEGMENTS, len(spans))):
+            self._prefetch(media, ahead, spans[ahead], profile)
+        return path
+
+    def _prefetch(self, media: Media, index: int, span: Tuple[float, float], profile: TranscodeProfile) -> None:
+        key = self._key(media, span, profile)
+        if media_cache.get(key) or key in self._inflight:
+            return
+        task = asyncio.ensure_future(self._ensure(media, index, span, profile))
+        self._prefetching.add(task)
+        task.add_done_callback(self._prefetch_done)
+
+    def _prefetch_done(self, task: asyncio.Task) -> None:
+        self._prefetching.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(f"Segment prefetch failed: {str(task.exception())}")
+
+    async def _ensure(self, media: Media, index: int, span: Tuple[float, float], profile: TranscodeProfile) -> Path:
+        key = self._key(media, span, profile)
+        cached = media_cache.get(key)
+        if cached is not None:
+            return cached
+
+        # Viewers and prefetch asking for the same segment share one encoder
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._encode(media, index, span, profile, key))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def _encode(
+        self,
+        media: Media,
+        index: int,
+        span: Tuple[float, float],
+        profile: TranscodeProfile,
+        key: str
+    ) -> Path:
+        start, length = span
+        temp = media_cache.temp_path(".ts", profile.expected_bytes(length))
+        try:
+            await self._executor.run(
+                self._encode_args(media.file_path, profile, start, length, temp),
+                timeout=settings.HLS_SEGMENT_TIMEOUT
+            )
+            return media_cache.commit(key, temp)
+        except SubprocessError as e:
+            raise HLSError(f"Encoding segment {index} of media {media.id} failed: {str(e)}") from e
+        finally:
+            media_cache.release(temp)
+
+    @staticmethod
+    def _encode_args(source: str, profile: TranscodeProfile, start: float, length: float, output: Path) -> List[str]:
+        # Input seek jumps straight to the segment; the timestamp offset
+        # keeps segments contiguous on the player's timeline
+        return [
+            settings.FFMPEG_BINARY, "-nostdin", "-v", "error",
+            "-ss", f"{start:.3f}", "-i", source, "-t", f"{length:.3f}",
+            "-map", "0:v:0", "-map", "0:a:0?",
+            *profile.video_args(), *profile.audio_args(),
+            "-output_ts_offset", f"{start:.3f}", "-muxdelay", "0",
+            "-f", "mpegts", str(output)
+        ]
+
+    @staticmethod
+    async def _duration(media: Media) -> float:
+        try:
+            seconds = probe_duration(await MediaProbe.get_async(Path(media.file_path), media.fingerprint))
+        except MediaProbeError as e:
+            raise HLSError(f"Cannot probe media {media.id}: {str(e)}") from e
+        if seconds <= 0:
+            raise HLSError(f"Unknown duration for media {media.id}")
+        return seconds
+
+    async def _segments(self, media: Media, layout: str = None) -> Tuple[str, List[Tuple[float, float]]]:
+        """
+        Layout name and (start, length) of every segment. "keyframe" follows
+        the keyframe index, so each encode starts on a keyframe; "fixed" is
+        plain HLS_SEGMENT_SECONDS spans. Without a layout, keyframes are used
+        only if the index is already cached.
+        """
+        duration = await self._duration(media)
+        segment_seconds = settings.HLS_SEGMENT_SECONDS
+        if layout != "fixed":
+            index = await self._keyframes(media, wait=layout == "keyframe")
+            if index is not None:
+                return "keyframe", index.segments(duration, segment_seconds)
+        count = math.ceil(duration / segment_seconds)
+        return "fixed", [
+            (i * segment_seconds, min(segment_seconds, duration - i * segment_seconds)) for i in range(count)
+        ]
+
+    async def _keyframes(self, media: Media, wait: bool) -> Optional[KeyframeIndex]:
+        fingerprint = media.fingerprint or str(media.id)
+        index = await asyncio.to_thread(KeyframeIndexer.peek, fingerprint)
+        if index is not None:
+            return index
+
+        # A full packet scan takes minutes on large files; build it off the
+        # request path and start on fixed segments meanwhile
+        task = self._indexing.get(fingerprint)
+        if task is None:
+            task = asyncio.ensure_future(KeyframeIndexer.get_async(Path(media.file_path), fingerprint))
+            self._indexing[fingerprint] = task
+            task.add_done_callback(lambda done: self._indexed(fingerprint, media.id, done))
+        if not wait:
+            return None
+        # A keyframe playlist was served earlier but the index has since
+        # been evicted; its segments have to match it
+        try:
+            return await asyncio.shield(task)
+        except KeyframeIndexError as e:
+            raise HLSError(f"Keyframe index for media {media.id} unavailable: {str(e)}") from e
+
+    def _indexed(self, fingerprint: str, media_id: int, task: asyncio.Task) -> None:
+        self._indexing.pop(fingerprint, None)
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(f"No keyframe index for media {media_id}: {str(task.exception())}")
+
+    def stats(self) -> Dict:
+        return dict(self._executor.stats(), prefetching=len(self._prefetching))
+
+    def shutdown(self) -> None:
+        for task in list(self._prefetching):
+            task.cancel()
+        self._executor.shutdown()
+
+    @staticmethod
+    def _key(media: Media, span: Tuple[float, float], profile: TranscodeProfile) -> str:
+        start, length = span
+        return f"hls/{media.fingerprint or media.id}/{profile.name}/{start:.3f}-{length:.3f}.ts"
+
+hls_service = HLSService()
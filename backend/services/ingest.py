@@ -0,0 +1,243 @@
+import os
+import time
+import logging
+from itertools import chain, islice
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+from sqlalchemy.dialects.mysql import insert
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import func
+from backend.config import settings
+from backend.database.models.media import Media, MediaType
+from backend.database.models.library import MediaLibrary
+from backend.database.session import SessionLocal
+from backend.services.directory_cache import DirectoryAggregateStore, refresh_directory
+from backend.services.media import MediaService
+from backend.services.thumbnails import thumbnail_pipeline
+from backend.utils.exceptions import MediaNotFoundException
+from backend.utils.file_scanner import FileScanner
+from backend.utils.scan_manifest import ScanManifest
+from backend.utils.scan_pool import ScanPool
+from backend.utils.walker import DirectoryWalker, WalkEntry
+
+logger = logging.getLogger(__name__)
+
+ProgressCallback = Callable[[Dict], None]
+
+class IngestPipeline:
+    """
+    Streaming scan-to-database ingest:
+    walk -> fingerprint -> metadata -> batched INSERT ... ON DUPLICATE KEY UPDATE.
+
+    Entries are processed in batches of INGEST_BATCH_SIZE, each committed on
+    its own, so memory use does not grow with library size. Only rows whose
+    fingerprint differs from the stored one are written.
+    """
+
+    def __init__(
+        self,
+        db: Session,
+        library: MediaLibrary,
+        batch_size: int = None,
+        progress: Optional[ProgressCallback] = None,
+        should_stop: Optional[Callable[[], bool]] = None
+    ):
+        self.db = db
+        self.library = library
+        self.batch_size = batch_size or settings.INGEST_BATCH_SIZE
+        self.progress = progress
+        self.should_stop = should_stop
+        self.counts = {
+            "total_files": 0,
+            "new_files": 0,
+            "updated_files": 0,
+            "failed_files": 0,
+            "removed_files": 0,
+            "bytes_hashed": 0
+        }
+        # Fingerprints of hardlinked inodes, shared by every batch of the run
+        self.links = {}
+
+    def scan_library(self) -> Dict:
+        """Full scan of the library root, removing rows for vanished files"""
+        started = time.monotonic()
+        scan_token = int(time.time() * 1000)
+        manifest = ScanManifest(self.db, Path(self.library.path), preload=False)
+        aggregates = DirectoryAggregateStore(self.db, scan_token)
+        walker = DirectoryWalker(
+            Path(self.library.path),
+            FileScanner.MEDIA_EXTENSIONS,
+            on_directory=aggregates.record
+        )
+
+        completed = self.run(walker, manifest, scan_token)
+        if completed:
+            self._remove_stale(manifest, scan_token)
+            aggregates.sweep(Path(self.library.path))
+            self.library.last_scan = func.now()
+            self.db.commit()
+
+        self.counts["scan_duration"] = round(time.monotonic() - started, 3)
+        self.counts["cancelled"] = not completed
+        return self.counts
+
+    def run(self, entries: Iterable[WalkEntry], manifest: ScanManifest, scan_token: int = None) -> bool:
+        """Ingest the given entries; returns False if stopped before the end"""
+        with ScanPool() as pool:
+            for batch in _batched(entries, self.batch_size):
+                if self.should_stop is not None and self.should_stop():
+                    return False
+                self._ingest_batch(batch, manifest, pool, scan_token)
+        return True
+
+    def _ingest_batch(self, batch: List[WalkEntry], manifest: ScanManifest, pool: ScanPool, scan_token: Optional[int]) -> None:
+        self.counts["total_files"] += len(batch)
+        manifest.prefetch(entry.path for entry in batch)
+        described = list(FileScanner.describe_files(batch, manifest, pool, self.links))
+        self.counts["failed_files"] += len(batch) - len(described)
+        self.counts["bytes_hashed"] += sum(
+            FileScanner.bytes_read(info["size"]) for info in described if info["changed"]
+        )
+
+        stored = dict(
+            self.db.query(Media.file_path, Media.fingerprint).filter(
+                Media.file_path.in_([info["path"] for info in described])
+            )
+        )
+        changed = [info for info in described if stored.get(info["path"]) != info["fingerprint"]]
+
+        rows = []
+        new_files = 0
+        fingerprints = {info["path"]: info["fingerprint"] for info in changed}
+        hashes = {info["path"]: info["hash"] for info in changed}
+        changed_paths = (Path(info["path"]) for info in changed)
+        for path, metadata in MediaService.extract_metadata_batch(changed_paths, pool, fingerprints):
+            if not metadata:
+                self.counts["failed_files"] += 1
+                continue
+            new_files += str(path) not in stored
+            rows.append(self._media_row(path, metadata, fingerprints[str(path)], hashes[str(path)]))
+
+        try:
+            if rows:
+                self.db.execute(self._upsert(rows))
+            self.db.flush()
+            if scan_token is not None:
+                manifest.touch((entry.path for entry in batch), scan_token)
+            self.db.commit()
+            self.counts["new_files"] += new_files
+            self.counts["updated_files"] += len(rows) - new_files
+            thumbnail_pipeline.enqueue((row["fingerprint"], row["file_path"]) for row in rows)
+        except Exception as e:
+            self.db.rollback()
+            logger.error(f"Ingest batch of {len(batch)} files failed: {str(e)}")
+            self.counts["failed_files"] += len(rows)
+        finally:
+            manifest.release()
+
+        if self.progress is not None:
+            self.progress(dict(self.counts))
+
+    def _media_row(self, path: Path, metadata: Dict, fingerprint: str, file_hash: Optional[str]) -> Dict:
+        return {
+            "title": metadata.get("title") or path.stem,
+            "file_path": str(path),
+            "media_type": MediaType.EPISODE if metadata.get("type") == "episode" else MediaType.MOVIE,
+            "metadata": metadata,
+            "duration": int(metadata.get("duration") or 0),
+            "fingerprint": fingerprint,
+            # None unless SCAN_FULL_HASH; background verification fills it in
+            "hash": file_hash,
+            "library_id": self.library.id
+        }
+
+    @staticmethod
+    def _upsert(rows: List[Dict]):
+        stmt = insert(Media.__table__).values(rows)
+        return stmt.on_duplicate_key_update(
+            title=stmt.inserted.title,
+            media_type=stmt.inserted.media_type,
+            metadata=stmt.inserted["metadata"],
+            duration=stmt.inserted.duration,
+            fingerprint=stmt.inserted.fingerprint,
+            hash=stmt.inserted.hash,
+            library_id=stmt.inserted.library_id,
+            updated_at=func.now()
+        )
+
+    def _remove_stale(self, manifest: ScanManifest, scan_token: int) -> None:
+        stale = manifest.stale_paths(scan_token, FileScanner.MEDIA_EXTENSIONS).subquery()
+        self.counts["removed_files"] = self.db.query(Media).filter(
+            Media.library_id == self.library.id,
+            Media.file_path.in_(stale.select())
+        ).delete(synchronize_session=False)
+        manifest.sweep(scan_token, FileScanner.MEDIA_EXTENSIONS)
+
+def scan_media_directory(
+    db: Session,
+    library_id: int,
+    progress: Optional[ProgressCallback] = None,
+    should_stop: Optional[Callable[[], bool]] = None
+) -> Dict:
+    """Scan a whole library through the streaming ingest pipeline"""
+    library = db.query(MediaLibrary).get(library_id)
+    if not library:
+        raise MediaNotFoundException(context={"library_id": library_id})
+    return IngestPipeline(db, library, progress=progress, should_stop=should_stop).scan_library()
+
+def ingest_paths(db: Session, library: MediaLibrary, paths: Iterable[Path]) -> Dict:
+    """
+    Add, refresh or remove media rows for specific files or directories of a
+    library without rescanning the rest of the tree
+    """
+    pipeline = IngestPipeline(db, library)
+    manifest = ScanManifest(db, Path(library.path), preload=False)
+    aggregates = DirectoryAggregateStore(db)
+    entries = []
+
+    for path in paths:
+        if path.is_dir():
+            entries.append(DirectoryWalker(
+                path, FileScanner.MEDIA_EXTENSIONS, on_directory=aggregates.record
+            ))
+        elif path.is_file():
+            if path.suffix[1:].lower() in FileScanner.MEDIA_EXTENSIONS:
+                entries.append([WalkEntry(path, path.stat())])
+            refresh_directory(db, path.parent)
+        else:
+            pipeline.counts["removed_files"] += _remove_media_under(db, library, path)
+            manifest.forget(path)
+            refresh_directory(db, path)
+            refresh_directory(db, path.parent)
+    db.commit()
+
+    pipeline.run(chain.from_iterable(entries), manifest)
+    aggregates.flush()
+    db.commit()
+    return pipeline.counts
+
+def ingest_library_paths(library_id: int, paths: List[Path]) -> Dict:
+    """Watcher callback: ingest touched paths in a session of its own"""
+    db = SessionLocal()
+    try:
+        library = db.query(MediaLibrary).get(library_id)
+        if library is None:
+            return {}
+        counts = ingest_paths(db, library, paths)
+        logger.info(f"Library {library_id} updated from {len(paths)} watched paths: {counts}")
+        return counts
+    finally:
+        db.close()
+
+def _remove_media_under(db: Session, library: MediaLibrary, path: Path) -> int:
+    prefix = os.path.join(str(path), '')
+    return db.query(Media).filter(
+        Media.library_id == library.id,
+        (Media.file_path == str(path)) |
+        Media.file_path.startswith(prefix, autoescape=True)
+    ).delete(synchronize_session=False)
+
+def _batched(items: Iterable, size: int) -> Iterator[List]:
+    iterator = iter(items)
+    while batch := list(islice(iterator, size)):
+        yield batch
@@ -0,0 +1,155 @@
+import os
+import base64
+import binascii
+import logging
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+from backend.utils.exceptions import DirectoryScanException
+from backend.utils.file_scanner import FileScanner
+from backend.utils.filename_parser import FilenameParser
+
+logger = logging.getLogger(__name__)
+
+PREVIEW_EXTENSIONS = FileScanner.MEDIA_EXTENSIONS | FileScanner.SUB_EXTENSIONS
+
+def preview_directory(path: str, cursor: Optional[str] = None, limit: int = 200) -> Dict:
+    """
+    One page of the media and subtitle candidates under path, in sorted
+    depth-first order. Only directory entries are read: nothing is hashed,
+    probed or statted beyond one stat per directory for loop detection.
+
+    The returned next_cursor resumes the listing after the last item; the
+    walk skips every directory that sorts before it without listing it.
+    """
+    root = Path(path)
+    if not root.is_dir():
+        raise DirectoryScanException(context={"path": path})
+
+    after = _decode_cursor(cursor) if cursor else ()
+    page = []
+    last = None
+    for parts, kind in _iter_candidates(root, after):
+        if len(page) == limit:
+            break
+        page.append((parts, kind))
+        last = parts
+    else:
+        last = None
+
+    paths = [root.joinpath(*parts) for parts, _ in page]
+    media = [path for path, (_, kind) in zip(paths, page) if kind == "media"]
+    guesses = dict(zip(media, FilenameParser.parse_batch(media)))
+    items = [_describe(path, kind, guesses.get(path)) for path, (_, kind) in zip(paths, page)]
+
+    return {
+        "path": str(root),
+        "items": items,
+        "media_files": sum(item["kind"] == "media" for item in items),
+        "subtitles_found": sum(item["kind"] == "subtitle" for item in items),
+        "next_cursor": _encode_cursor(last) if last else None
+    }
+
+def _iter_candidates(root: Path, after: Tuple[str, ...]) -> Iterator[Tuple[Tuple[str, ...], str]]:
+    """
+    Yield (relative path parts, kind) for candidates sorting after the
+    cursor. Directories are listed lazily one level at a time, so the first
+    page of a huge tree costs a handful of scandir calls.
+    """
+    try:
+        root_stat = os.stat(root)
+    except OSError as e:
+        raise DirectoryScanException(context={"path": str(root), "error": str(e)})
+
+    # Each frame: (relative parts, sorted entries, next index, still on cursor path, dir key)
+    stack = [((), _sorted_entries(str(root)), 0, bool(after), (root_stat.st_dev, root_stat.st_ino))]
+    while stack:
+        parts, entries, index, on_cursor, key = stack[-1]
+        if index == len(entries):
+            stack.pop()
+            continue
+        stack[-1] = (parts, entries, index + 1, on_cursor, key)
+
+        entry = entries[index]
+        depth = len(parts)
+        entry_parts = parts + (entry.name,)
+        descend_on_cursor = False
+        if on_cursor:
+            bound = after[depth]
+            if entry.name < bound:
+                continue
+            if entry.name == bound:
+                if depth + 1 == len(after):
+                    # The cursor item itself was returned by the previous page
+                    continue
+                descend_on_cursor = True
+
+        try:
+            is_dir = entry.is_dir()
+        except OSError:
+            continue
+
+        if is_dir:
+            child_key = _directory_key(entry)
+            if child_key is None or any(frame[4] == child_key for frame in stack):
+                logger.debug(f"Skipping already visited directory {entry.path}")
+                continue
+            stack.append((entry_parts, _sorted_entries(entry.path), 0, descend_on_cursor, child_key))
+        elif not descend_on_cursor:
+            extension = entry.name.rpartition('.')[2].lower()
+            if extension in FileScanner.MEDIA_EXTENSIONS:
+                yield entry_parts, "media"
+            elif extension in FileScanner.SUB_EXTENSIONS:
+                yield entry_parts, "subtitle"
+
+def _sorted_entries(path: str) -> List[os.DirEntry]:
+    try:
+        with os.scandir(path) as it:
+            return sorted(it, key=lambda entry: entry.name)
+    except OSError as e:
+        logger.warning(f"Skipping unreadable directory {path}: {str(e)}")
+        return []
+
+def _directory_key(entry: os.DirEntry) -> Optional[Tuple[int, int]]:
+    try:
+        st = entry.stat()
+    except OSError:
+        return None
+    return (st.st_dev, st.st_ino)
+
+def _describe(path: Path, kind: str, guess: Optional[Dict]) -> Dict:
+    item = {
+        "path": str(path),
+        "kind": kind,
+        "title": None,
+        "media_type": None,
+        "year": None,
+        "season": None,
+        "episode": None
+    }
+    if kind != "media":
+        return item
+
+    # Parent directory names often carry the show or film title
+    guess = guess or {}
+    item.update({
+        "title": guess.get("title") or path.stem,
+        "media_type": guess.get("type", "movie"),
+        "year": guess.get("year"),
+        "season": guess.get("season"),
+        "episode": guess.get("episode")
+    })
+    return item
+
+def _encode_cursor(parts: Tuple[str, ...]) -> str:
+    raw = os.fsencode(os.path.join(*parts))
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+def _decode_cursor(cursor: str) -> Tuple[str, ...]:
+    try:
+        relative = os.fsdecode(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except (binascii.Error, UnicodeError):
+        raise ValueError("Invalid cursor")
+    parts = tuple(part for part in relative.split(os.sep) if part)
+    if not parts or ".." in parts:
+        raise ValueError("Invalid cursor")
+    return parts
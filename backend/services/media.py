@@ -2,31 +2,43 @@ import os
 import re
 import logging
 from pathlib import Path
-import subprocess
-from guessit import guessit  # Added local metadata parser
+from typing import Dict, Iterable, Iterator, Tuple
 from sqlalchemy.orm import Session
 from backend.config import settings
 from backend.utils.exceptions import MediaProcessingError
+from backend.utils.filename_parser import FilenameParser
+from backend.utils.media_probe import MediaProbe, MediaProbeError
+from backend.utils.scan_pool import ScanPool
 
 logger = logging.getLogger(__name__)
 
 class MediaService:
     @staticmethod
-    def extract_metadata(file_path: Path) -> dict:
-        """Extract metadata using filename analysis and local file properties"""
+    def extract_metadata(file_path: Path, fingerprint: str = None) -> dict:
+        """
+        Extract metadata from filename analysis and the cached container probe.
+        Codec and resolution come from the container, falling back to the
+        filename when the file cannot be probed.
+        """
         try:
-            # Parse filename with guessit
-            guess = guessit(str(file_path))
+            # Parse filename with guessit (memoized)
+            guess = FilenameParser.parse(file_path)
             
             # Get basic file info
             stat = file_path.stat()
             
+            try:
+                probe = MediaProbe.summary(file_path, fingerprint)
+            except MediaProbeError as e:
+                logger.warning(f"Probe failed for {file_path}: {str(e)}")
+                probe = {}
+            
             # Build metadata
             metadata = {
                 'title': guess.get('title', file_path.stem),
                 'year': guess.get('year'),
-                'duration': MediaService._get_local_duration(file_path),
-                'resolution': guess.get('screen_size'),
+                'duration': probe.get('duration', 0.0),
+                'resolution': probe.get('resolution') or guess.get('screen_size'),
                 'type': guess.get('type', 'movie'),
                 'season': guess.get('season'),
                 'episode': guess.get('episode'),
@@ -35,13 +47,19 @@ class MediaService:
                 'modified': stat.st_mtime
             }
             
-            # Add video codec if detected
-            if guess.get('video_codec'):
-                metadata['video_codec'] = guess.get('video_codec')
+            # Add codecs, preferring what the container reports
+            video_codec = probe.get('video_codec') or guess.get('video_codec')
+            if video_codec:
+                metadata['video_codec'] = video_codec
                 
-            # Add audio codec if detected
-            if guess.get('audio_codec'):
-                metadata['audio_codec'] = guess.get('audio_codec')
+            audio_codec = probe.get('audio_codec') or guess.get('audio_codec')
+            if audio_codec:
+                metadata['audio_codec'] = audio_codec
+            
+            if probe:
+                metadata['container'] = probe['container']
+                metadata['audio_tracks'] = probe['audio_tracks']
+                metadata['subtitle_tracks'] = probe['subtitle_tracks']
                 
             return metadata
             
@@ -50,17 +68,44 @@ class MediaService:
             return {}
 
     @staticmethod
-    def _get_local_duration(path: Path) -> float:
-        """Get duration using ffprobe"""
+    def extract_metadata_batch(
+        paths: Iterable[Path],
+        pool: ScanPool = None,
+        fingerprints: Dict[str, str] = None
+    ) -> Iterator[Tuple[Path, dict]]:
+        """
+        Extract metadata for many files, probing in parallel per device.
+        Known fingerprints spare the probe cache from computing them again.
+        """
+        own_pool = pool is None
+        pool = pool or ScanPool()
+        fingerprints = fingerprints or {}
+        paths = list(paths)
+        # Warm the filename cache in bulk so per-file extraction only probes
+        FilenameParser.parse_batch(paths)
         try:
-            result = subprocess.run(
-                ['ffprobe', '-v', 'error', '-show_entries', 
-                 'format=duration', '-of', 'default=noprint_wrappers=1:nokey=1', str(path)],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                check=True
+            items = (
+                (MediaService._device_of(path), 0, (path, fingerprints.get(str(path))))
+                for path in paths
             )
-            return float(result.stdout.decode().strip())
+            for (path, _), future in pool.map_ordered(MediaService.extract_metadata, items):
+                yield path, future.result()
+        finally:
+            if own_pool:
+                pool.shutdown()
+
+    @staticmethod
+    def _device_of(path: Path) -> int:
+        try:
+            return path.stat().st_dev
+        except OSError:
+            return 0
+
+    @staticmethod
+    def _get_local_duration(path: Path) -> float:
+        """Container duration from the probe cache"""
+        try:
+            return MediaProbe.duration(path)
         except Exception as e:
             logger.warning(f"Duration detection failed: {str(e)}")
-            return 0.0
\ No newline at end of file
+            return 0.0
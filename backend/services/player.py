@@ -1,53 +1,187 @@
 import os
-import subprocess
+import asyncio
+import logging
 from pathlib import Path
-from typing import Generator
+from typing import Dict, List, Tuple
 from fastapi import HTTPException
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import Response
 from sqlalchemy.orm import Session
 from backend.database.models.media import Media
+from backend.database.models.subtitle import PlayerSettings
 from backend.config import settings
+from backend.database.session import session_scope
 from backend.utils.exceptions import (
     MediaNotFoundException,
     SubtitleNotFoundException
 )
+from backend.utils.http_range import (
+    RangeNotSatisfiable,
+    check_preconditions,
+    if_range_matches,
+    make_etag,
+    parse_range,
+    validator_headers
+)
+from backend.schemas.media import ClientCapabilities
+from backend.services.progress import progress_store
+from backend.services.stream_sessions import stream_sessions
+from backend.services.transcode import PlaybackPlan, TranscodeProfile, plan_playback, resolve_profile
+from backend.utils.keyframe_index import KeyframeIndexError, KeyframeIndexer
+from backend.utils.media_probe import MediaProbe, MediaProbeError, summarize
+from backend.utils.streaming import FileRangeResponse, Throttle
+from backend.utils.subprocess_executor import SubprocessError, subprocess_executor
 
-def get_media_stream(file_path: str, range_header: str) -> Generator:
-    file_size = os.path.getsize(file_path)
-    start, end = 0, file_size - 1
-    
-    if range_header:
-        range_ = range_header.split("=")[1]
-        start, end = map(int, range_.split("-"))
-    
-    chunk_size = 1024 * 1024  # 1MB chunks
-    with open(file_path, "rb") as video_file:
-        video_file.seek(start)
-        remaining = end - start + 1
-        while remaining > 0:
-            bytes_to_read = min(chunk_size, remaining)
-            data = video_file.read(bytes_to_read)
-            if not data:
-                break
-            remaining -= len(data)
-            yield data
-
-def convert_subtitle_to_vtt(srt_path: Path) -> Path:
+logger = logging.getLogger(__name__)
+
+def load_media(media_id: int) -> Media:
+    """
+    Look up a media row in a session that is closed before returning. The
+    detached row carries every column, and no pooled connection stays
+    checked out while its file is transferred.
+    """
+    with session_scope() as db:
+        media = db.query(Media).get(media_id)
+        if not media:
+            raise MediaNotFoundException()
+        return media
+
+async def stream_throttle(media: Media, user_id: int, client: str, received: float) -> Throttle:
+    """
+    Join or open the viewer's playback session for a media item and return
+    the send hooks for one request, paced to the container bitrate from the
+    probe cache. received is when the request arrived (time.monotonic()).
+    """
+    try:
+        bitrate = summarize(await MediaProbe.get_async(Path(media.file_path), media.fingerprint))["bit_rate"]
+    except MediaProbeError:
+        bitrate = None
+    session = stream_sessions.open(user_id, media.id, client, bitrate)
+    return session.throttle(received)
+
+def get_media_stream(media: Media, headers, method: str = "GET", throttle: Throttle = None) -> Response:
+    """
+    Stream a media file honouring Range, If-Range and conditional headers.
+    The ETag comes from the stored content fingerprint. Stats the file, so
+    async callers run it in the threadpool.
+    """
+    stat_result = os.stat(media.file_path)
+    etag = make_etag(media.fingerprint, stat_result)
+    validators = validator_headers(etag, stat_result)
+
+    status_code = check_preconditions(headers, etag, stat_result.st_mtime)
+    if status_code is not None:
+        return Response(status_code=status_code, headers=validators)
+
+    range_header = headers.get("range")
+    if not if_range_matches(headers.get("if-range"), etag, stat_result.st_mtime):
+        range_header = None
+
+    try:
+        ranges = parse_range(range_header, stat_result.st_size)
+    except RangeNotSatisfiable:
+        return Response(
+            status_code=416,
+            headers={**validators, "content-range": f"bytes */{stat_result.st_size}"}
+        )
+    if ranges and len(ranges) > 1 and not settings.STREAM_MULTIPART_RANGES:
+        ranges = [(ranges[0][0], ranges[-1][1])]
+
+    # The server copies the ranges straight from the page cache when it can
+    return FileRangeResponse(
+        media.file_path,
+        ranges=ranges,
+        headers=validators,
+        stat_result=stat_result,
+        method=method,
+        throttle=throttle
+    )
+
+def resolve_playback_profile(media: Media, quality: str = None, user_id: int = None) -> TranscodeProfile:
+    """
+    Transcode profile for a playback request. Without an explicit quality
+    the user's default_quality applies; "auto" is capped at the source height.
+    """
+    if not quality and user_id is not None:
+        with session_scope() as db:
+            player_settings = db.query(PlayerSettings).get(user_id)
+            quality = player_settings.default_quality if player_settings else None
+    quality = quality or settings.TRANSCODE_DEFAULT_QUALITY
+
+    try:
+        height = MediaProbe.summary(Path(media.file_path), media.fingerprint).get("height")
+    except MediaProbeError:
+        height = None
+    return resolve_profile(quality, height)
+
+def plan_media_playback(media: Media, capabilities: ClientCapabilities = None) -> PlaybackPlan:
+    """Direct play, remux or transcode for this client, from cached probe data"""
+    try:
+        summary = MediaProbe.summary(Path(media.file_path), media.fingerprint)
+    except MediaProbeError:
+        return PlaybackPlan("transcode")
+    return plan_playback(summary, Path(media.file_path).suffix, capabilities)
+
+async def keyframe_start(media: Media, seconds: float) -> Tuple[float, int]:
+    """
+    Time and byte offset of the keyframe a playback starting at seconds
+    should begin from. Sessions starting within one GOP then share an
+    encoder, and stream copies start exactly where the client expects.
+    Only a cached index is used; without one the start is not snapped
+    (byte offset -1) rather than waiting for a full-file scan.
+    """
+    if seconds <= 0:
+        return 0.0, 0
+    index = await asyncio.to_thread(KeyframeIndexer.peek, media.fingerprint or str(media.id))
+    if index is None:
+        return seconds, -1
+    return index.floor(seconds)
+
+def warm_keyframe_index(media: Media) -> None:
+    """Build the keyframe index ahead of the first seek"""
+    try:
+        KeyframeIndexer.get(Path(media.file_path), media.fingerprint or str(media.id))
+    except KeyframeIndexError as e:
+        logger.warning(f"No keyframe index for media {media.id}: {str(e)}")
+
+def resume_position(user_id: int, media_id: int) -> float:
+    """Saved position to resume from, 0 when the item was finished or barely started"""
+    progress = progress_store.get(user_id, media_id)
+    return progress.position if progress is not None and progress.resumable else 0.0
+
+def continue_watching(user_id: int, limit: int = 20) -> List[Dict]:
+    """Unfinished items with their media details, most recently watched first"""
+    entries = progress_store.continue_watching(user_id, limit)
+    if not entries:
+        return []
+    with session_scope() as db:
+        media = {
+            item.id: item for item in
+            db.query(Media).filter(Media.id.in_([entry.media_id for entry in entries]))
+        }
+        return [
+            dict(
+                entry.describe(),
+                title=media[entry.media_id].title,
+                type=media[entry.media_id].media_type.value,
+                thumbnail=media[entry.media_id].metadata.get("thumbnail")
+            )
+            for entry in entries if entry.media_id in media
+        ]
+
+async def convert_subtitle_to_vtt(srt_path: Path) -> Path:
     vtt_path = srt_path.with_suffix(".vtt")
     try:
-        subprocess.run(
-            ["ffmpeg", "-i", str(srt_path), str(vtt_path)],
-            check=True,
-            capture_output=True
+        await subprocess_executor.run(
+            [settings.FFMPEG_BINARY, "-y", "-i", str(srt_path), str(vtt_path)]
         )
         return vtt_path
-    except subprocess.CalledProcessError as e:
+    except SubprocessError as e:
         raise SubtitleNotFoundException(
-            f"Subtitle conversion failed: {e.stderr.decode()}")
+            f"Subtitle conversion failed: {str(e)}")
 
-def get_subtitle_file(media_id: int, language: str) -> Path:
-    media = Media.query.get(media_id)
-    if not media:
-        raise MediaNotFoundException()
+async def get_subtitle_file(media_id: int, language: str) -> Path:
+    media = await run_in_threadpool(load_media, media_id)
     
     media_path = Path(media.file_path)
     subtitle_dir = settings.SUBTITLE_DIR / str(media_id)
@@ -60,7 +194,7 @@ def get_subtitle_file(media_id: int, language: str) -> Path:
     # Check for SRT files and convert
     srt_file = subtitle_dir / f"{language}.srt"
     if srt_file.exists():
-        return convert_subtitle_to_vtt(srt_file)
+        return await convert_subtitle_to_vtt(srt_file)
     
     # Fallback to opensubtitles integration
     return fetch_opensubtitles(media, language)
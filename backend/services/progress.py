@@ -0,0 +1,261 @@
+import logging
+import threading
+from datetime import datetime
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set, Tuple
+from sqlalchemy.dialects.mysql import insert
+from sqlalchemy.exc import IntegrityError
+from backend.config import settings
+from backend.database.session import session_scope
+from backend.database.models.progress import PlaybackProgress
+
+logger = logging.getLogger(__name__)
+
+ProgressKey = Tuple[int, int]
+
+@dataclass(frozen=True)
+class Progress:
+    """Resume position of one user in one media item"""
+    user_id: int
+    media_id: int
+    position: float
+    duration: Optional[float]
+    completed: bool
+    updated_at: datetime
+
+    @property
+    def resumable(self) -> bool:
+        return not self.completed and self.position >= settings.PROGRESS_MIN_POSITION
+
+    def as_row(self) -> Dict:
+        return {
+            "user_id": self.user_id,
+            "media_id": self.media_id,
+            "position": self.position,
+            "duration": self.duration,
+            "completed": self.completed,
+            "updated_at": self.updated_at
+        }
+
+    def describe(self) -> Dict:
+        return {
+            "media_id": self.media_id,
+            "position": round(self.position, 3),
+            "duration": self.duration,
+            "percent": round(100 * self.position / self.duration, 1) if self.duration else None,
+            "completed": self.completed,
+            "updated_at": self.updated_at
+        }
+
+class ProgressStore:
+    """
+    Write-behind buffer for player heartbeats.
+
+    A heartbeat only replaces the in-memory entry for its (user, media)
+    pair and marks it dirty, so a viewer reporting every few seconds
+    costs one row write per flush instead of one UPDATE per heartbeat.
+    A background thread upserts the dirty entries every
+    PROGRESS_FLUSH_INTERVAL seconds in multi-row statements, and stop()
+    flushes what is left at shutdown.
+
+    Reads are served from memory first. Flushed entries stay cached up
+    to PROGRESS_CACHE_SIZE; entries that are dirty or being written are
+    never evicted. Entries are immutable and replaced on every heartbeat,
+    so a flush writes a consistent snapshot without holding the lock.
+    """
+
+    def __init__(self):
+        self._entries: "OrderedDict[ProgressKey, Progress]" = OrderedDict()
+        self._dirty: Set[ProgressKey] = set()
+        self._flushing: Set[ProgressKey] = set()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._heartbeats = 0
+        self._flushes = 0
+        self._rows_written = 0
+        self._rows_dropped = 0
+
+    def start(self) -> None:
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="progress-flusher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the flusher and write every pending heartbeat"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=settings.PROGRESS_FLUSH_INTERVAL)
+        self.flush()
+
+    def record(self, user_id: int, media_id: int, position: float, duration: float = None) -> Progress:
+        """Buffer a heartbeat; duration falls back to the one reported before"""
+        key = (user_id, media_id)
+        with self._lock:
+            previous = self._entries.get(key)
+            if not duration and previous is not None:
+                duration = previous.duration
+            if duration:
+                position = min(position, duration)
+            entry = Progress(
+                user_id, media_id, position, duration or None,
+                bool(duration) and position >= duration * settings.PROGRESS_COMPLETE_RATIO,
+                datetime.utcnow()
+            )
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            self._dirty.add(key)
+            self._heartbeats += 1
+            self._evict()
+        return entry
+
+    def known(self, user_id: int, media_id: int) -> bool:
+        """Whether the pair has an entry in memory, i.e. its media was seen to exist"""
+        with self._lock:
+            return (user_id, media_id) in self._entries
+
+    def get(self, user_id: int, media_id: int) -> Optional[Progress]:
+        key = (user_id, media_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry
+
+        with session_scope() as db:
+            row = db.query(PlaybackProgress).filter(
+                PlaybackProgress.user_id == user_id,
+                PlaybackProgress.media_id == media_id
+            ).first()
+            if row is None:
+                return None
+            loaded = _from_row(row)
+
+        with self._lock:
+            # A heartbeat that arrived during the query is newer than the row
+            entry = self._entries.setdefault(key, loaded)
+            self._evict()
+        return entry
+
+    def continue_watching(self, user_id: int, limit: int = 20) -> List[Progress]:
+        """Most recently watched unfinished items, pending heartbeats included"""
+        with self._lock:
+            pending = {
+                key[1]: self._entries[key] for key in self._dirty | self._flushing
+                if key[0] == user_id and key in self._entries
+            }
+
+        with session_scope() as db:
+            # Pending entries may replace rows, so fetch enough to still fill the page
+            rows = db.query(PlaybackProgress).filter(
+                PlaybackProgress.user_id == user_id,
+                PlaybackProgress.completed.is_(False),
+                PlaybackProgress.position >= settings.PROGRESS_MIN_POSITION
+            ).order_by(PlaybackProgress.updated_at.desc()).limit(limit + len(pending)).all()
+            merged = {row.media_id: _from_row(row) for row in rows}
+
+        merged.update(pending)
+        entries = [entry for entry in merged.values() if entry.resumable]
+        entries.sort(key=lambda entry: entry.updated_at, reverse=True)
+        return entries[:limit]
+
+    def flush(self) -> int:
+        """Upsert every dirty entry; returns the number of rows written"""
+        with self._flush_lock:
+            with self._lock:
+                batch = [self._entries[key] for key in self._dirty if key in self._entries]
+                self._flushing = {(entry.user_id, entry.media_id) for entry in batch}
+                self._dirty.clear()
+            if not batch:
+                return 0
+
+            written = 0
+            try:
+                for i in range(0, len(batch), settings.PROGRESS_FLUSH_BATCH):
+                    written += self._write(batch[i:i + settings.PROGRESS_FLUSH_BATCH])
+            except Exception:
+                with self._lock:
+                    # Retry on the next flush, unless a newer heartbeat already did
+                    self._dirty |= self._flushing
+                raise
+            finally:
+                with self._lock:
+                    self._flushing = set()
+                    self._flushes += 1
+                    self._rows_written += written
+                    self._evict()
+            return written
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "dirty": len(self._dirty),
+                "heartbeats": self._heartbeats,
+                "flushes": self._flushes,
+                "rows_written": self._rows_written,
+                "rows_dropped": self._rows_dropped,
+                "flush_interval": settings.PROGRESS_FLUSH_INTERVAL
+            }
+
+    def _loop(self) -> None:
+        while not self._stop.wait(settings.PROGRESS_FLUSH_INTERVAL):
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Playback progress flush failed: {str(e)}")
+
+    def _write(self, batch: List[Progress]) -> int:
+        with session_scope() as db:
+            try:
+                db.execute(_upsert([entry.as_row() for entry in batch]))
+                db.commit()
+                return len(batch)
+            except IntegrityError:
+                db.rollback()
+
+            # A media item or user was deleted while its heartbeats were
+            # buffered; write the rest of the batch row by row
+            written = 0
+            for entry in batch:
+                try:
+                    db.execute(_upsert([entry.as_row()]))
+                    db.commit()
+                    written += 1
+                except IntegrityError:
+                    db.rollback()
+                    key = (entry.user_id, entry.media_id)
+                    with self._lock:
+                        self._rows_dropped += 1
+                        if self._entries.get(key) is entry:
+                            del self._entries[key]
+                            self._dirty.discard(key)
+            return written
+
+    def _evict(self) -> None:
+        # Called with the lock held
+        excess = len(self._entries) - settings.PROGRESS_CACHE_SIZE
+        if excess <= 0:
+            return
+        for key in list(self._entries):
+            if excess <= 0:
+                break
+            if key not in self._dirty and key not in self._flushing:
+                del self._entries[key]
+                excess -= 1
+
+def _upsert(rows: List[Dict]):
+    stmt = insert(PlaybackProgress.__table__).values(rows)
+    return stmt.on_duplicate_key_update(
+        position=stmt.inserted.position,
+        duration=stmt.inserted.duration,
+        completed=stmt.inserted.completed,
+        updated_at=stmt.inserted.updated_at
+    )
+
+def _from_row(row: PlaybackProgress) -> Progress:
+    return Progress(row.user_id, row.media_id, row.position, row.duration, row.completed, row.updated_at)
+
+progress_store = ProgressStore()
@@ -0,0 +1,316 @@
+import os
+import logging
+import threading
+from pathlib import Path
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Set
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import func
+from backend.config import settings
+from backend.database.session import SessionLocal
+from backend.database.models.library import MediaLibrary
+from backend.database.models.manifest import FileManifestEntry
+from backend.database.models.scan_job import ScanJob, ScanJobStatus
+from backend.services.ingest import scan_media_directory
+from backend.utils.exceptions import MediaNotFoundException, ScanJobNotFoundException
+from backend.utils.file_scanner import FileScanner
+from backend.utils.scan_manifest import ScanManifest
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = (ScanJobStatus.QUEUED, ScanJobStatus.RUNNING)
+
+def enqueue_scan(db: Session, library_id: int, user_id: int = None) -> ScanJob:
+    """
+    Queue a scan of the library, or return the job already queued/running
+    for it so duplicate requests coalesce
+    """
+    library = db.query(MediaLibrary).get(library_id)
+    if not library:
+        raise MediaNotFoundException(context={"library_id": library_id})
+
+    active = _active_job(db, library_id)
+    if active is not None:
+        return active
+
+    # Files recorded by earlier scans give the ETA a denominator
+    estimated = db.query(FileManifestEntry).filter(
+        FileManifestEntry.path.startswith(os.path.join(library.path, ''), autoescape=True),
+        FileManifestEntry.extension.in_(list(FileScanner.MEDIA_EXTENSIONS))
+    ).count()
+    for _ in range(2):
+        job = ScanJob(
+            library_id=library_id,
+            active_lock=library_id,
+            status=ScanJobStatus.QUEUED,
+            estimated_files=estimated,
+            requested_by=user_id
+        )
+        try:
+            db.add(job)
+            db.commit()
+        except IntegrityError:
+            # Another request queued a scan of this library first; if that
+            # job already finished, the lock is free again, so retry once
+            db.rollback()
+            active = _active_job(db, library_id)
+            if active is not None:
+                return active
+            continue
+
+        db.refresh(job)
+        scan_worker.wake()
+        return job
+
+    return db.query(ScanJob).filter(ScanJob.library_id == library_id).order_by(ScanJob.id.desc()).first()
+
+def get_scan_job(db: Session, job_id: int) -> ScanJob:
+    job = db.query(ScanJob).get(job_id)
+    if not job:
+        raise ScanJobNotFoundException(context={"job_id": job_id})
+    return job
+
+def cancel_scan_job(db: Session, job_id: int) -> ScanJob:
+    """Cancel a queued job immediately, or ask a running one to stop"""
+    job = get_scan_job(db, job_id)
+    if job.status == ScanJobStatus.QUEUED:
+        _finish(job, ScanJobStatus.CANCELLED)
+    elif job.status == ScanJobStatus.RUNNING:
+        job.cancel_requested = True
+        # Heartbeats are UTC; keep the column's onupdate (server time) out of it
+        job.updated_at = datetime.utcnow()
+    db.commit()
+    db.refresh(job)
+    return job
+
+def describe_scan_job(job: ScanJob) -> Dict:
+    """Job state with live throughput and ETA derived from its counters"""
+    elapsed = 0.0
+    if job.started_at:
+        elapsed = ((job.finished_at or datetime.utcnow()) - job.started_at).total_seconds()
+
+    files_per_sec = job.files_processed / elapsed if elapsed > 0 else 0.0
+    eta = None
+    if job.status == ScanJobStatus.RUNNING and files_per_sec > 0 and job.estimated_files:
+        eta = max(job.estimated_files - job.files_processed, 0) / files_per_sec
+
+    return {
+        "id": job.id,
+        "library_id": job.library_id,
+        "status": job.status.value,
+        "files_processed": job.files_processed,
+        "estimated_files": job.estimated_files,
+        "bytes_hashed": job.bytes_hashed,
+        "files_per_sec": round(files_per_sec, 2),
+        "eta_seconds": round(eta, 1) if eta is not None else None,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+        "result": job.result,
+        "error": job.error
+    }
+
+class ScanJobWorker:
+    """
+    Background threads that claim queued scan jobs and run them.
+
+    A heartbeat thread stamps updated_at on the jobs this process is
+    running. Jobs left RUNNING by a process that crashed or restarted stop
+    receiving heartbeats; once they are SCAN_JOB_STALE_SECONDS old they are
+    requeued, or cancelled if a cancel was requested, so the library's
+    active_lock is never held by a dead job.
+
+    Whenever no job is queued, a worker fully hashes up to
+    SCAN_VERIFY_FILES files that scans only fingerprinted, filling the
+    manifest's and media rows' hash columns a few files at a time.
+    """
+
+    def __init__(self, workers: int = None):
+        self.workers = workers or settings.SCAN_JOB_WORKERS
+        self._threads = []
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._running: Set[int] = set()
+        self._running_lock = threading.Lock()
+
+    def start(self) -> None:
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._loop, name=f"scan-job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        thread = threading.Thread(target=self._heartbeat_loop, name="scan-job-heartbeat", daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+
+    def wake(self) -> None:
+        self._wake.set()
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                if self._run_next():
+                    continue
+                self.verify_hashes()
+            except Exception as e:
+                logger.error(f"Scan job worker error: {str(e)}")
+            self._wake.wait(settings.SCAN_JOB_POLL_INTERVAL)
+            self._wake.clear()
+
+    def _heartbeat_loop(self) -> None:
+        while True:
+            try:
+                self._heartbeat()
+                self.recover_stale()
+            except Exception as e:
+                logger.error(f"Scan job heartbeat error: {str(e)}")
+            if self._stop.wait(settings.SCAN_JOB_HEARTBEAT_INTERVAL):
+                return
+
+    def _heartbeat(self) -> None:
+        with self._running_lock:
+            running = list(self._running)
+        if not running:
+            return
+        db = SessionLocal()
+        try:
+            db.query(ScanJob).filter(ScanJob.id.in_(running)).update(
+                {ScanJob.updated_at: datetime.utcnow()}, synchronize_session=False
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    def recover_stale(self) -> int:
+        """Requeue or cancel RUNNING jobs whose process stopped sending heartbeats"""
+        cutoff = datetime.utcnow() - timedelta(seconds=settings.SCAN_JOB_STALE_SECONDS)
+        with self._running_lock:
+            running = list(self._running)
+        db = SessionLocal()
+        try:
+            stale = db.query(ScanJob).filter(
+                ScanJob.status == ScanJobStatus.RUNNING,
+                func.coalesce(ScanJob.updated_at, ScanJob.started_at, ScanJob.created_at) < cutoff,
+                ScanJob.id.notin_(running)
+            ).all()
+            for job in stale:
+                if job.cancel_requested:
+                    _finish(job, ScanJobStatus.CANCELLED)
+                else:
+                    logger.warning(f"Scan job {job.id} lost its worker; requeueing")
+                    job.status = ScanJobStatus.QUEUED
+                    job.started_at = None
+                    job.files_processed = 0
+                    job.bytes_hashed = 0
+            db.commit()
+        finally:
+            db.close()
+        if stale:
+            self.wake()
+        return len(stale)
+
+    def verify_hashes(self) -> int:
+        """Hash up to SCAN_VERIFY_FILES unverified files across libraries; returns how many were tried"""
+        remaining = settings.SCAN_VERIFY_FILES
+        if remaining <= 0:
+            return 0
+        db = SessionLocal()
+        try:
+            for library in db.query(MediaLibrary).order_by(MediaLibrary.id):
+                manifest = ScanManifest(db, Path(library.path), preload=False)
+                pending = len(manifest.pending_verification(remaining))
+                if pending:
+                    FileScanner.verify_full_hashes(manifest, limit=remaining)
+                    remaining -= pending
+                if remaining <= 0 or self._stop.is_set():
+                    break
+        finally:
+            db.close()
+        return settings.SCAN_VERIFY_FILES - remaining
+
+    def _run_next(self) -> bool:
+        db = SessionLocal()
+        try:
+            job = self._claim(db)
+            if job is None:
+                return False
+            with self._running_lock:
+                self._running.add(job.id)
+            try:
+                self._execute(db, job)
+            finally:
+                with self._running_lock:
+                    self._running.discard(job.id)
+            return True
+        finally:
+            db.close()
+
+    @staticmethod
+    def _claim(db: Session) -> Optional[ScanJob]:
+        candidate = db.query(ScanJob.id).filter(
+            ScanJob.status == ScanJobStatus.QUEUED
+        ).order_by(ScanJob.id).first()
+        if candidate is None:
+            return None
+
+        claimed = db.query(ScanJob).filter(
+            ScanJob.id == candidate.id,
+            ScanJob.status == ScanJobStatus.QUEUED
+        ).update({
+            ScanJob.status: ScanJobStatus.RUNNING,
+            ScanJob.started_at: datetime.utcnow(),
+            ScanJob.updated_at: datetime.utcnow()
+        }, synchronize_session=False)
+        db.commit()
+        return db.query(ScanJob).get(candidate.id) if claimed else None
+
+    @staticmethod
+    def _execute(db: Session, job: ScanJob) -> None:
+        job_id = job.id
+
+        def progress(counts: Dict) -> None:
+            db.query(ScanJob).filter(ScanJob.id == job_id).update({
+                ScanJob.files_processed: counts["total_files"],
+                ScanJob.bytes_hashed: counts["bytes_hashed"],
+                ScanJob.updated_at: datetime.utcnow()
+            }, synchronize_session=False)
+            db.commit()
+
+        def should_stop() -> bool:
+            return bool(db.query(ScanJob.cancel_requested).filter(ScanJob.id == job_id).scalar())
+
+        try:
+            result = scan_media_directory(db, job.library_id, progress=progress, should_stop=should_stop)
+            job = db.query(ScanJob).get(job_id)
+            job.result = {
+                key: result[key] for key in (
+                    "total_files", "new_files", "updated_files", "failed_files", "scan_duration"
+                )
+            }
+            job.files_processed = result["total_files"]
+            job.bytes_hashed = result["bytes_hashed"]
+            _finish(job, ScanJobStatus.CANCELLED if result["cancelled"] else ScanJobStatus.COMPLETED)
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Scan job {job_id} failed: {str(e)}")
+            job = db.query(ScanJob).get(job_id)
+            job.error = str(e)[:1024]
+            _finish(job, ScanJobStatus.FAILED)
+        db.commit()
+
+def _active_job(db: Session, library_id: int) -> Optional[ScanJob]:
+    return db.query(ScanJob).filter(
+        ScanJob.library_id == library_id,
+        ScanJob.status.in_(ACTIVE_STATUSES)
+    ).order_by(ScanJob.id).first()
+
+def _finish(job: ScanJob, status: ScanJobStatus) -> None:
+    job.status = status
+    job.active_lock = None
+    job.finished_at = datetime.utcnow()
+
+scan_worker = ScanJobWorker()
@@ -0,0 +1,183 @@
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+from backend.config import settings
+from backend.utils.bandwidth import Flow, bandwidth_scheduler
+from backend.utils.exceptions import (
+    StreamLimitException,
+    StreamSessionNotFoundException,
+    StreamTerminatedException
+)
+from backend.utils.streaming import Throttle
+
+SessionKey = Tuple[int, int, str]
+
+@dataclass
+class StreamSession:
+    """
+    One viewer watching one media item from one client. Every range,
+    segment or remux request the player makes for it is folded into the
+    same session until it goes idle.
+    """
+    id: str
+    user_id: int
+    media_id: int
+    client: str
+    flow: Flow
+    requests: int = 0
+    bytes_served: int = 0
+    first_byte_seconds: Optional[float] = None  # time to first byte of the first request
+    last_first_byte_seconds: Optional[float] = None  # ... and of the latest one (seeks)
+    terminated: bool = False
+    in_flight: int = 0  # responses still sending
+    started_at: float = field(default_factory=time.time)
+    last_seen: float = field(default_factory=time.monotonic)
+
+    @property
+    def key(self) -> SessionKey:
+        return (self.user_id, self.media_id, self.client)
+
+    def is_idle(self, now: float) -> bool:
+        return not self.in_flight and now - self.last_seen > settings.STREAM_SESSION_IDLE_SECONDS
+
+    def throttle(self, received: float) -> "SessionThrottle":
+        """Send hooks for one request; received is when it arrived (time.monotonic())"""
+        return SessionThrottle(self, received)
+
+    def describe(self) -> Dict:
+        return {
+            "id": self.id,
+            "user_id": self.user_id,
+            "media_id": self.media_id,
+            "client": self.client,
+            "requests": self.requests,
+            "bytes_served": self.bytes_served,
+            "bitrate": round(self.flow.rate * 8),
+            "first_byte_ms": _ms(self.first_byte_seconds),
+            "last_first_byte_ms": _ms(self.last_first_byte_seconds),
+            "started_at": self.started_at,
+            "idle_seconds": round(time.monotonic() - self.last_seen, 3),
+            "terminated": self.terminated
+        }
+
+class SessionThrottle(Throttle):
+    """
+    Send hooks of one request in a session: records time to first byte,
+    counts bytes, applies the bandwidth scheduler and aborts the response
+    once the session is terminated.
+
+    Sessions nothing paces leave paced unset, so a response may send a
+    whole range or file in one go and let the server copy it; its bytes
+    are counted when that send is made.
+    """
+
+    def __init__(self, session: StreamSession, received: float):
+        self.session = session
+        self.received = received
+        self.paced = bandwidth_scheduler.paces(session.flow)
+        self._pace = bandwidth_scheduler.throttle(session.flow)
+
+    def started(self) -> None:
+        session = self.session
+        session.in_flight += 1
+        session.last_first_byte_seconds = time.monotonic() - self.received
+        if session.first_byte_seconds is None:
+            session.first_byte_seconds = session.last_first_byte_seconds
+
+    async def pace(self, amount: int) -> None:
+        session = self.session
+        if session.terminated:
+            raise StreamTerminatedException(context={"session_id": session.id})
+        await self._pace(amount)
+        session.bytes_served += amount
+        session.last_seen = time.monotonic()
+
+    def finished(self) -> None:
+        self.session.in_flight -= 1
+        self.session.last_seen = time.monotonic()
+
+class StreamSessionRegistry:
+    """
+    In-process registry of playback sessions keyed by user, media and
+    client address.
+
+    Requests for a key that has been seen within STREAM_SESSION_IDLE_SECONDS
+    join its session; anything else opens a new one, subject to the
+    per-user and server-wide concurrency limits. Opening a new media item
+    closes the user's idle sessions on the same client, so skipping
+    through episodes does not use up the per-user limit. A terminated
+    session ends its in-flight responses at their next chunk and refuses
+    new requests until it has been idle for the same window.
+    """
+
+    def __init__(self):
+        self._sessions: Dict[SessionKey, StreamSession] = {}
+
+    def open(self, user_id: int, media_id: int, client: str, bitrate: Optional[int] = None) -> StreamSession:
+        now = time.monotonic()
+        self._prune(now)
+        key = (user_id, media_id, client)
+        session = self._sessions.get(key)
+        if session is not None:
+            if session.terminated:
+                raise StreamTerminatedException(context={"session_id": session.id})
+        else:
+            self._close_idle(user_id, client)
+            self._check_limits(user_id)
+            session = StreamSession(
+                uuid.uuid4().hex, user_id, media_id, client,
+                bandwidth_scheduler.flow(key, user_id, bitrate)
+            )
+            self._sessions[key] = session
+        session.requests += 1
+        session.last_seen = now
+        return session
+
+    def list(self) -> List[Dict]:
+        self._prune(time.monotonic())
+        return [session.describe() for session in self._sessions.values()]
+
+    def terminate(self, session_id: str) -> StreamSession:
+        for session in self._sessions.values():
+            if session.id == session_id:
+                session.terminated = True
+                session.last_seen = time.monotonic()
+                return session
+        raise StreamSessionNotFoundException(context={"session_id": session_id})
+
+    def stats(self) -> Dict:
+        self._prune(time.monotonic())
+        live = [session for session in self._sessions.values() if not session.terminated]
+        return {
+            "sessions": len(live),
+            "users": len({session.user_id for session in live}),
+            "bitrate": round(sum(session.flow.rate for session in live) * 8),
+            "max_sessions": settings.STREAM_MAX_SESSIONS,
+            "max_sessions_per_user": settings.STREAM_MAX_SESSIONS_PER_USER
+        }
+
+    def _check_limits(self, user_id: int) -> None:
+        live = [session for session in self._sessions.values() if not session.terminated]
+        if settings.STREAM_MAX_SESSIONS and len(live) >= settings.STREAM_MAX_SESSIONS:
+            raise StreamLimitException(context={"limit": settings.STREAM_MAX_SESSIONS})
+        per_user = sum(1 for session in live if session.user_id == user_id)
+        if settings.STREAM_MAX_SESSIONS_PER_USER and per_user >= settings.STREAM_MAX_SESSIONS_PER_USER:
+            raise StreamLimitException(context={"limit": settings.STREAM_MAX_SESSIONS_PER_USER})
+
+    def _close_idle(self, user_id: int, client: str) -> None:
+        # Terminated sessions stay until they idle out so they keep refusing requests
+        for key in [
+            key for key, session in self._sessions.items()
+            if key[0] == user_id and key[2] == client and not session.in_flight and not session.terminated
+        ]:
+            del self._sessions[key]
+
+    def _prune(self, now: float) -> None:
+        for key in [key for key, session in self._sessions.items() if session.is_idle(now)]:
+            del self._sessions[key]
+
+def _ms(seconds: Optional[float]) -> Optional[float]:
+    return round(seconds * 1000, 1) if seconds is not None else None
+
+stream_sessions = StreamSessionRegistry()
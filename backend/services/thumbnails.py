@@ -0,0 +1,258 @@
+import math
+import time
+import shutil
+import logging
+import threading
+from pathlib import Path
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+from backend.config import settings
+from backend.database.session import session_scope
+from backend.database.models.media import Media
+from backend.utils.disk_cache import thumbnail_cache
+from backend.utils.media_probe import MediaProbe, MediaProbeError
+from backend.utils.subprocess_executor import SubprocessError, SubprocessExecutor
+
+logger = logging.getLogger(__name__)
+
+POSTER = "poster.jpg"
+SPRITE_INDEX = "sprites.vtt"
+
+class ThumbnailError(Exception):
+    """Raised when posters or sprites cannot be extracted"""
+
+class ThumbnailPipeline:
+    """
+    Background generation of posters and seek-bar sprite sheets.
+
+    Work is keyed by content fingerprint, so copies of a file share one
+    set of images, and output is stored under thumbs/<fingerprint>/ in
+    the thumbnail cache, apart from HLS segments. Images requested after
+    being evicted are regenerated ahead of the backlog. Only keyframes
+    are decoded (-skip_frame nokey), and ffmpeg runs on its own executor
+    at idle CPU and I/O priority, so playback encoders are never queued
+    behind it.
+    """
+
+    def __init__(self, workers: int = None):
+        self.workers = workers or settings.THUMBNAIL_WORKERS
+        self._executor = SubprocessExecutor(self.workers, name="thumbnail-executor")
+        self._queue: "OrderedDict[str, Optional[str]]" = OrderedDict()
+        self._failed: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def start(self) -> None:
+        """Start the workers; the first one queues items still missing thumbnails"""
+        for i in range(self.workers):
+            thread = threading.Thread(
+                target=self._loop, args=(i == 0,), name=f"thumbnail-worker-{i}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+        self._executor.shutdown()
+
+    def enqueue(self, items: Iterable[Tuple[str, str]]) -> None:
+        """Queue (fingerprint, path) pairs; a fingerprint already queued is skipped"""
+        with self._lock:
+            for fingerprint, path in items:
+                if fingerprint:
+                    self._queue.setdefault(fingerprint, path)
+        self._wake.set()
+
+    def request(self, fingerprint: str, name: str) -> None:
+        """
+        Regenerate a missing image a client asked for, ahead of the backlog.
+        The file path is looked up by the worker; files that failed within
+        THUMBNAIL_RETRY_SECONDS are not retried.
+        """
+        with self._lock:
+            failed_at = self._failed.get(fingerprint)
+            if failed_at is not None and time.monotonic() - failed_at < settings.THUMBNAIL_RETRY_SECONDS:
+                return
+            if name != POSTER:
+                # A lost sheet is only rebuilt by a sprite pass, which the index gates
+                thumbnail_cache.discard(_key(fingerprint, SPRITE_INDEX))
+            self._queue[fingerprint] = self._queue.get(fingerprint)
+            self._queue.move_to_end(fingerprint, last=False)
+        self._wake.set()
+
+    def enqueue_missing(self) -> None:
+        """Queue every media item that has no poster yet"""
+        table = Media.__table__
+        with session_scope() as db:
+            rows = db.execute(
+                table.select().with_only_columns(
+                    [table.c.fingerprint, table.c.file_path, table.c["metadata"]]
+                ).where(table.c.fingerprint.isnot(None))
+            )
+            self.enqueue(
+                (fingerprint, path) for fingerprint, path, metadata in rows
+                if not (metadata or {}).get("thumbnail")
+            )
+
+    def stats(self) -> Dict:
+        with self._lock:
+            queued = len(self._queue)
+        return dict(self._executor.stats(), queued=queued)
+
+    @staticmethod
+    def cached(fingerprint: str, name: str) -> Optional[Path]:
+        return thumbnail_cache.get(_key(fingerprint, name))
+
+    def generate(self, fingerprint: str, path: Path) -> None:
+        """Extract the poster, sprite sheets and their WebVTT index of one file"""
+        missing_poster = self.cached(fingerprint, POSTER) is None
+        missing_sprites = self.cached(fingerprint, SPRITE_INDEX) is None
+        if missing_poster or missing_sprites:
+            try:
+                summary = MediaProbe.summary(path, fingerprint)
+            except MediaProbeError as e:
+                raise ThumbnailError(str(e)) from e
+            duration = summary["duration"]
+            if not duration or not summary.get("width") or not summary.get("height"):
+                raise ThumbnailError(f"No video stream in {path}")
+
+            if missing_poster:
+                self._poster(fingerprint, path, duration)
+            if missing_sprites:
+                self._sprites(fingerprint, path, duration, summary["width"], summary["height"])
+        self._record(fingerprint)
+
+    def _loop(self, sweep: bool) -> None:
+        if sweep:
+            try:
+                self.enqueue_missing()
+            except Exception as e:
+                logger.error(f"Thumbnail sweep failed: {str(e)}")
+        while not self._stop.is_set():
+            with self._lock:
+                item = self._queue.popitem(last=False) if self._queue else None
+            if item is None:
+                self._wake.wait()
+                self._wake.clear()
+                continue
+            fingerprint, path = item
+            try:
+                path = path or self._path_for(fingerprint)
+                if path is None:
+                    continue
+                self.generate(fingerprint, Path(path))
+            except ThumbnailError as e:
+                logger.warning(f"Thumbnails for {path} failed: {str(e)}")
+                with self._lock:
+                    self._failed[fingerprint] = time.monotonic()
+            except Exception as e:
+                logger.error(f"Thumbnail worker error on {path}: {str(e)}")
+
+    def _poster(self, fingerprint: str, path: Path, duration: float) -> None:
+        temp = thumbnail_cache.temp_path(".jpg")
+        try:
+            self._run([
+                "-skip_frame", "nokey", "-ss", f"{duration * settings.THUMBNAIL_POSTER_POSITION:.3f}",
+                "-i", str(path), "-map", "0:v:0", "-frames:v", "1",
+                "-vf", f"scale={settings.THUMBNAIL_POSTER_WIDTH}:-2", "-q:v", "3", str(temp)
+            ])
+            thumbnail_cache.commit(_key(fingerprint, POSTER), temp)
+        finally:
+            temp.unlink(missing_ok=True)
+
+    def _sprites(self, fingerprint: str, path: Path, duration: float, width: int, height: int) -> None:
+        interval = settings.THUMBNAIL_INTERVAL
+        tile = settings.THUMBNAIL_TILE
+        thumb_width = settings.THUMBNAIL_WIDTH
+        thumb_height = max(2, round(thumb_width * height / width / 2) * 2)
+        count = max(1, math.ceil(duration / interval))
+
+        scratch = thumbnail_cache.temp_path()
+        scratch.mkdir(parents=True)
+        try:
+            self._run([
+                "-skip_frame", "nokey", "-i", str(path), "-map", "0:v:0",
+                "-vf", f"fps=1/{interval},scale={thumb_width}:{thumb_height},tile={tile}x{tile}",
+                "-vsync", "vfr", "-q:v", "5", str(scratch / "sprite_%03d.jpg")
+            ])
+            sheets = sorted(scratch.glob("sprite_*.jpg"))
+            if not sheets:
+                raise ThumbnailError(f"No sprite sheets produced for {path}")
+            # ffmpeg numbers from 1; sheet names in the index are 0-based
+            for number, sheet in enumerate(sheets):
+                thumbnail_cache.commit(_key(fingerprint, f"sprite_{number:03d}.jpg"), sheet)
+        finally:
+            shutil.rmtree(scratch, ignore_errors=True)
+
+        per_sheet = tile * tile
+        count = min(count, len(sheets) * per_sheet)
+        lines = ["WEBVTT", ""]
+        for i in range(count):
+            start, end = i * interval, min((i + 1) * interval, duration)
+            sheet, cell = divmod(i, per_sheet)
+            row, column = divmod(cell, tile)
+            lines.append(f"{_timestamp(start)} --> {_timestamp(end)}")
+            lines.append(
+                f"sprite_{sheet:03d}.jpg#xywh={column * thumb_width},{row * thumb_height},"
+                f"{thumb_width},{thumb_height}"
+            )
+            lines.append("")
+        thumbnail_cache.put(_key(fingerprint, SPRITE_INDEX), "\n".join(lines).encode())
+
+    def _run(self, args: List[str]) -> None:
+        command = [settings.FFMPEG_BINARY, "-nostdin", "-v", "error", "-y", *args]
+        if settings.THUMBNAIL_NICE:
+            command = _idle_priority() + command
+        try:
+            self._executor.run_sync(command, timeout=settings.THUMBNAIL_TIMEOUT)
+        except SubprocessError as e:
+            raise ThumbnailError(str(e)) from e
+
+    @staticmethod
+    def _path_for(fingerprint: str) -> Optional[str]:
+        with session_scope() as db:
+            return db.query(Media.file_path).filter(Media.fingerprint == fingerprint).limit(1).scalar()
+
+    @staticmethod
+    def _record(fingerprint: str) -> None:
+        """Point every media row with this content at its thumbnails"""
+        table = Media.__table__
+        with session_scope() as db:
+            rows = db.execute(
+                table.select().with_only_columns([table.c.id, table.c["metadata"]]).where(
+                    table.c.fingerprint == fingerprint
+                )
+            ).fetchall()
+            for media_id, metadata in rows:
+                metadata = dict(
+                    metadata or {},
+                    thumbnail=thumbnail_url(fingerprint, POSTER),
+                    sprites=thumbnail_url(fingerprint, SPRITE_INDEX)
+                )
+                db.execute(table.update().where(table.c.id == media_id).values({"metadata": metadata}))
+            db.commit()
+
+def thumbnail_url(fingerprint: str, name: str) -> str:
+    return f"/thumbnails/{fingerprint}/{name}"
+
+def _key(fingerprint: str, name: str) -> str:
+    return f"thumbs/{fingerprint}/{name}"
+
+def _timestamp(seconds: float) -> str:
+    millis = int(round(seconds * 1000))
+    hours, millis = divmod(millis, 3600000)
+    minutes, millis = divmod(millis, 60000)
+    return f"{hours:02d}:{minutes:02d}:{millis // 1000:02d}.{millis % 1000:03d}"
+
+def _idle_priority() -> List[str]:
+    prefix = []
+    if shutil.which("ionice"):
+        prefix += ["ionice", "-c", "3"]
+    if shutil.which("nice"):
+        prefix += ["nice", "-n", "19"]
+    return prefix
+
+thumbnail_pipeline = ThumbnailPipeline()
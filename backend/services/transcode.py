@@ -0,0 +1,316 @@
+import time
+import asyncio
+import logging
+from pathlib import Path
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+from backend.config import settings
+from backend.database.models.media import Media
+from backend.schemas.media import ClientCapabilities
+from backend.utils.disk_cache import media_cache
+from backend.utils.subprocess_executor import SubprocessError, SubprocessExecutor
+
+logger = logging.getLogger(__name__)
+
+QUALITY_AUTO = "auto"
+
+# Pixel formats browsers decode in H.264; 10-bit and 4:4:4 streams are not
+BROWSER_PIXEL_FORMATS = {"yuv420p", "yuvj420p"}
+
+FRAGMENTED_MP4 = ["-movflags", "frag_keyframe+empty_moov+default_base_moof", "-f", "mp4"]
+
+class TranscodeError(Exception):
+    """Raised when a transcode cannot be started"""
+
+class TranscodeBusy(TranscodeError):
+    """Raised when every encoder slot is taken and the queue is full"""
+
+@dataclass(frozen=True)
+class TranscodeProfile:
+    name: str
+    height: int
+    video_bitrate: str
+    maxrate: str
+    bufsize: str
+    audio_bitrate: str
+    preset: str = "veryfast"
+
+    def video_args(self) -> List[str]:
+        # Never upscale: sources smaller than the profile keep their height
+        return [
+            "-c:v", "libx264", "-preset", self.preset, "-pix_fmt", "yuv420p",
+            "-vf", f"scale=-2:'min({self.height},ih)'",
+            "-b:v", self.video_bitrate, "-maxrate", self.maxrate, "-bufsize", self.bufsize
+        ]
+
+    def audio_args(self) -> List[str]:
+        return ["-c:a", "aac", "-ac", "2", "-b:a", self.audio_bitrate]
+
+    def expected_bytes(self, seconds: float) -> int:
+        """Output size of seconds of encode at the rate caps, for cache reservations"""
+        return int(seconds * (_bits_per_second(self.maxrate) + _bits_per_second(self.audio_bitrate)) / 8)
+
+def _bits_per_second(rate: str) -> int:
+    """ffmpeg rate strings such as "8000k" or "1.5M" """
+    multiplier = {"k": 1000, "m": 1000 ** 2}.get(rate[-1:].lower(), 1)
+    return int(float(rate.rstrip("kKmM")) * multiplier)
+
+PROFILES: Dict[str, TranscodeProfile] = {
+    "480p": TranscodeProfile("480p", 480, "1500k", "2000k", "3000k", "128k"),
+    "720p": TranscodeProfile("720p", 720, "3500k", "4500k", "7000k", "160k"),
+    "1080p": TranscodeProfile("1080p", 1080, "6500k", "8000k", "12000k", "192k")
+}
+
+def resolve_profile(quality: Optional[str], source_height: Optional[int] = None) -> TranscodeProfile:
+    """
+    Map a quality name to a profile. "auto" picks the largest profile the
+    source can fill, so nothing is encoded above its native height.
+    """
+    quality = (quality or QUALITY_AUTO).lower()
+    if quality in PROFILES:
+        return PROFILES[quality]
+    if quality != QUALITY_AUTO:
+        raise TranscodeError(f"Unknown quality: {quality}")
+
+    ordered = sorted(PROFILES.values(), key=lambda profile: profile.height)
+    if not source_height:
+        return ordered[-1]
+    fitting = [profile for profile in ordered if profile.height <= source_height]
+    return fitting[-1] if fitting else ordered[0]
+
+@dataclass(frozen=True)
+class PlaybackPlan:
+    mode: str  # "direct", "remux" or "transcode"
+    copy_audio: bool = True
+    audio_index: Optional[int] = None  # ffprobe stream index of the chosen track
+
+def plan_playback(summary: Dict, container: str, capabilities: ClientCapabilities = None) -> PlaybackPlan:
+    """
+    Cheapest way to get a file playing on a client, from cached probe data.
+
+    Direct play when the client takes the container and every codec, a
+    stream-copy remux into fragmented MP4 when only the container (and
+    possibly the audio codec) is the problem, a full transcode otherwise.
+    """
+    capabilities = capabilities or ClientCapabilities()
+    video_codecs = {codec.lower() for codec in capabilities.video_codecs}
+    audio_codecs = {codec.lower() for codec in capabilities.audio_codecs}
+
+    codec = summary.get("video_codec")
+    pixel_format = summary.get("pixel_format")
+    if codec is not None and (
+        codec not in video_codecs
+        or (codec == "h264" and pixel_format and pixel_format not in BROWSER_PIXEL_FORMATS)
+    ):
+        return PlaybackPlan("transcode")
+
+    tracks = summary.get("audio_tracks") or []
+    track = next((track for track in tracks if track.get("default")), tracks[0] if tracks else None)
+    copy_audio = track is None or (track.get("codec") or "").lower() in audio_codecs
+    audio_index = track.get("index") if track else None
+
+    if container.lower().lstrip(".") in {name.lower() for name in capabilities.containers} and copy_audio:
+        return PlaybackPlan("direct", True, audio_index)
+    return PlaybackPlan("remux", copy_audio, audio_index)
+
+@dataclass
+class TranscodeSession:
+    """One encoder writing fragmented MP4 to a spool file that viewers follow"""
+    key: Tuple
+    media_id: int
+    profile: str
+    start: float
+    spool: Path
+    args: List[str]
+    viewers: int = 0
+    idle_since: float = field(default_factory=time.monotonic)
+    created_at: float = field(default_factory=time.time)
+    done: bool = False
+    error: Optional[str] = None
+    task: Optional[asyncio.Task] = None
+
+    def attach(self) -> None:
+        self.viewers += 1
+
+    def detach(self) -> None:
+        self.viewers -= 1
+        if self.viewers <= 0:
+            self.viewers = 0
+            self.idle_since = time.monotonic()
+
+    def is_complete(self) -> bool:
+        return self.done
+
+    def describe(self) -> Dict:
+        return {
+            "media_id": self.media_id,
+            "profile": self.profile,
+            "start": self.start,
+            "viewers": self.viewers,
+            "done": self.done,
+            "error": self.error,
+            "created_at": self.created_at
+        }
+
+class TranscodeManager:
+    """
+    Owns bounded pools of ffmpeg encoders and stream-copy remuxers.
+
+    Requests for the same media, profile (or remux mode) and start offset
+    share one session. Every viewer follows the same spool file from its first byte,
+    so late joiners need no buffering in memory. Encoders that have had no
+    viewers for TRANSCODE_IDLE_SECONDS are killed and their spool removed.
+    """
+
+    def __init__(self):
+        self._executor = SubprocessExecutor(settings.TRANSCODE_MAX_WORKERS, name="transcode-executor")
+        # Stream copies are cheap, so they get their own, wider pool
+        self._remux_executor = SubprocessExecutor(settings.REMUX_MAX_WORKERS, name="remux-executor")
+        self._sessions: Dict[Tuple, TranscodeSession] = {}
+        self._reaper: Optional[asyncio.Task] = None
+
+    def open(self, media: Media, profile: TranscodeProfile, start: float = 0.0) -> TranscodeSession:
+        """
+        Join the matching encoder or start a new one. The caller is counted
+        as a viewer and must detach() once it stops reading.
+        """
+        key = (media.fingerprint or media.id, profile.name, round(start, 3))
+        session = self._sessions.get(key)
+        if session is None or session.error is not None:
+            session = self.start_session(
+                key, media.id, profile.name, start,
+                lambda output: self.encode_args(media.file_path, profile, start, output),
+                reserve=profile.expected_bytes(_remaining(media, start))
+            )
+        session.attach()
+        return session
+
+    def remux(self, media: Media, plan: PlaybackPlan, start: float = 0.0) -> TranscodeSession:
+        """
+        Join or start a stream-copy remux into fragmented MP4. Video is
+        never re-encoded; audio only when plan.copy_audio is false.
+        """
+        name = "remux" if plan.copy_audio else "remux-aac"
+        key = (media.fingerprint or media.id, name, plan.audio_index, round(start, 3))
+        session = self._sessions.get(key)
+        if session is None or session.error is not None:
+            # A stream copy comes out about as large as the part of the source it covers
+            size = media.metadata.get("size") or 0
+            session = self.start_session(
+                key, media.id, name, start,
+                lambda output: self.remux_args(media.file_path, plan, start, output),
+                remux=True,
+                reserve=int(size * _remaining(media, start) / media.duration) if media.duration else 0
+            )
+        session.attach()
+        return session
+
+    def start_session(
+        self,
+        key: Tuple,
+        media_id: int,
+        profile: str,
+        start: float,
+        build_args,
+        remux: bool = False,
+        reserve: int = 0
+    ) -> TranscodeSession:
+        """
+        Start an encoder under key; build_args gets the spool path to write
+        to. reserve is the spool's expected size, held in the disk cache
+        for as long as the session lives.
+        """
+        executor = self._remux_executor if remux else self._executor
+        stats = executor.stats()
+        if stats["running"] >= stats["max_concurrency"] and stats["waiting"] >= settings.TRANSCODE_MAX_QUEUE:
+            raise TranscodeBusy("All encoders are busy")
+
+        self._discard(key)
+        spool = media_cache.temp_path(".mp4", reserve)
+        spool.touch()
+        session = TranscodeSession(key, media_id, profile, start, spool, build_args(spool))
+        session.task = asyncio.ensure_future(self._run(session, executor))
+        self._sessions[key] = session
+        self._ensure_reaper()
+        return session
+
+    @staticmethod
+    def encode_args(source: str, profile: TranscodeProfile, start: float, output: Path) -> List[str]:
+        return [
+            settings.FFMPEG_BINARY, "-nostdin", "-v", "error", "-y",
+            "-ss", f"{start:.3f}", "-i", source,
+            "-map", "0:v:0", "-map", "0:a:0?",
+            *profile.video_args(), *profile.audio_args(),
+            *FRAGMENTED_MP4, str(output)
+        ]
+
+    @staticmethod
+    def remux_args(source: str, plan: PlaybackPlan, start: float, output: Path) -> List[str]:
+        # With stream copy the input seek lands on the keyframe before start
+        audio_map = f"0:{plan.audio_index}" if plan.audio_index is not None else "0:a:0?"
+        if plan.copy_audio:
+            audio = ["-c:a", "copy"]
+        else:
+            audio = ["-c:a", "aac", "-ac", "2", "-b:a", settings.REMUX_AUDIO_BITRATE]
+        return [
+            settings.FFMPEG_BINARY, "-nostdin", "-v", "error", "-y",
+            "-ss", f"{start:.3f}", "-i", source,
+            "-map", "0:v:0?", "-map", audio_map, "-sn", "-dn",
+            "-c:v", "copy", *audio,
+            *FRAGMENTED_MP4, str(output)
+        ]
+
+    def sessions(self) -> List[Dict]:
+        return [session.describe() for session in self._sessions.values()]
+
+    def stats(self) -> Dict:
+        return dict(
+            self._executor.stats(),
+            remux=self._remux_executor.stats(),
+            sessions=len(self._sessions)
+        )
+
+    async def shutdown(self) -> None:
+        if self._reaper is not None:
+            self._reaper.cancel()
+        for key in list(self._sessions):
+            self._discard(key)
+        self._executor.shutdown()
+        self._remux_executor.shutdown()
+
+    async def _run(self, session: TranscodeSession, executor: SubprocessExecutor) -> None:
+        try:
+            await executor.run(session.args, timeout=0)
+        except SubprocessError as e:
+            session.error = str(e)
+            logger.error(f"Transcode of media {session.media_id} ({session.profile}) failed: {str(e)}")
+        finally:
+            session.done = True
+
+    def _ensure_reaper(self) -> None:
+        if self._reaper is None or self._reaper.done():
+            self._reaper = asyncio.ensure_future(self._reap())
+
+    async def _reap(self) -> None:
+        while self._sessions:
+            await asyncio.sleep(settings.TRANSCODE_REAP_INTERVAL)
+            now = time.monotonic()
+            for key, session in list(self._sessions.items()):
+                if session.viewers == 0 and now - session.idle_since >= settings.TRANSCODE_IDLE_SECONDS:
+                    logger.info(f"Stopping idle transcode of media {session.media_id} ({session.profile})")
+                    self._discard(key)
+
+    def _discard(self, key: Tuple) -> None:
+        session = self._sessions.pop(key, None)
+        if session is None:
+            return
+        if session.task is not None and not session.task.done():
+            # Cancelling the run kills the encoder's process group
+            session.task.cancel()
+        media_cache.release(session.spool)
+
+def _remaining(media: Media, start: float) -> float:
+    """Seconds of the media after start; 0 when its duration is unknown"""
+    return max((media.duration or 0) - start, 0.0)
+
+transcode_manager = TranscodeManager()
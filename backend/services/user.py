@@ -1,5 +1,7 @@
 import logging
 from datetime import datetime, timedelta
+from fastapi import Depends
+from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import SQLAlchemyError, IntegrityError
 from passlib.context import CryptContext
@@ -12,6 +14,7 @@ from backend.database.models import (
     PlayerSettings
 )
 from backend.config import settings
+from backend.database.session import session_scope
 from backend.utils.exceptions import (
     InvalidCredentialsException,
     InactiveUserException,
@@ -25,6 +28,15 @@ from backend.utils.exceptions import (
 
 logger = logging.getLogger(__name__)
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_PREFIX}/token")
+
+def get_stream_user(token: str = Depends(oauth2_scheme)) -> User:
+    """
+    Authenticate in a session that is closed before the handler runs, so
+    long downloads do not keep a pooled connection checked out
+    """
+    with session_scope() as db:
+        return UserService.get_current_user(db, token)
 
 class UserService:
     @staticmethod
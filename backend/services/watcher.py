@@ -0,0 +1,281 @@
+import os
+import time
+import struct
+import select
+import logging
+import threading
+import ctypes
+import ctypes.util
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Set, Tuple
+from backend.config import settings
+from backend.database.models.library import MediaLibrary
+from backend.database.session import session_scope
+from backend.services.ingest import ingest_library_paths
+from backend.utils.file_scanner import FileScanner
+from backend.utils.scan_pool import ScanPool
+from backend.utils.walker import DirectoryWalker
+
+logger = logging.getLogger(__name__)
+
+WATCHED_EXTENSIONS = FileScanner.MEDIA_EXTENSIONS | FileScanner.SUB_EXTENSIONS
+
+# inotify event masks (linux/inotify.h)
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+
+WATCH_MASK = (
+    IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO |
+    IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF
+)
+EVENT_HEADER = struct.Struct("iIII")
+
+class WatcherUnavailable(Exception):
+    """Raised when inotify cannot be used for a library path"""
+
+class InotifyBackend:
+    """Recursive inotify watches on a library tree, via libc through ctypes"""
+
+    def __init__(self, root: Path):
+        self.root = root
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c") or None, use_errno=True)
+        if not hasattr(self._libc, "inotify_init1"):
+            raise WatcherUnavailable("inotify is not supported on this platform")
+
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise WatcherUnavailable(os.strerror(ctypes.get_errno()))
+        self._watches: Dict[int, Path] = {}
+        self._add_tree(root)
+
+    def poll(self, timeout: float) -> Tuple[Set[Path], bool]:
+        """Wait for events and return (touched paths, overflowed)"""
+        touched = set()
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return touched, False
+
+        try:
+            buf = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return touched, False
+
+        overflowed = False
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(buf):
+            wd, mask, _cookie, length = EVENT_HEADER.unpack_from(buf, offset)
+            name = buf[offset + EVENT_HEADER.size:offset + EVENT_HEADER.size + length]
+            offset += EVENT_HEADER.size + length
+
+            if mask & IN_Q_OVERFLOW:
+                overflowed = True
+                continue
+            if mask & IN_IGNORED:
+                self._watches.pop(wd, None)
+                continue
+
+            parent = self._watches.get(wd)
+            if parent is None:
+                continue
+            path = parent / os.fsdecode(name.rstrip(b"\0")) if length else parent
+
+            if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                # New or moved-in directory: watch it and report its contents
+                self._add_tree(path)
+                touched.add(path)
+            elif mask & IN_ISDIR or _is_watched_file(path):
+                touched.add(path)
+        return touched, overflowed
+
+    def close(self) -> None:
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+    def _add_tree(self, root: Path) -> None:
+        self._add_watch(root)
+        for current, dirs, _ in os.walk(root):
+            for name in dirs:
+                self._add_watch(Path(current) / name)
+
+    def _add_watch(self, path: Path) -> None:
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(str(path)), WATCH_MASK)
+        if wd < 0:
+            error = ctypes.get_errno()
+            self.close()
+            raise WatcherUnavailable(f"Cannot watch {path}: {os.strerror(error)}")
+        self._watches[wd] = path
+
+class PollingBackend:
+    """Periodic stat snapshots for mounts where inotify sees no remote changes"""
+
+    def __init__(self, root: Path):
+        self.root = root
+        self._snapshot = self._take_snapshot()
+        self._next_snapshot = time.monotonic() + settings.WATCHER_POLL_INTERVAL
+
+    def poll(self, timeout: float) -> Tuple[Set[Path], bool]:
+        time.sleep(timeout)
+        if time.monotonic() < self._next_snapshot:
+            return set(), False
+
+        current = self._take_snapshot()
+        self._next_snapshot = time.monotonic() + settings.WATCHER_POLL_INTERVAL
+        touched = {
+            path for path in current.keys() | self._snapshot.keys()
+            if current.get(path) != self._snapshot.get(path)
+        }
+        self._snapshot = current
+        return touched, False
+
+    def close(self) -> None:
+        self._snapshot = {}
+
+    def _take_snapshot(self) -> Dict[Path, Tuple[int, int]]:
+        return {
+            entry.path: (entry.stat.st_size, entry.stat.st_mtime_ns)
+            for entry in DirectoryWalker(self.root, WATCHED_EXTENSIONS)
+        }
+
+class LibraryWatcher(threading.Thread):
+    """
+    Watches one auto-scan library. Events are debounced per path and only
+    handed to the ingest callback once the file has stopped changing for
+    WATCHER_SETTLE_SECONDS, so in-progress copies are picked up once.
+
+    The backend (watch tree or first snapshot) is built on the watcher's
+    own thread; on a large network library that takes minutes.
+    """
+
+    def __init__(self, library_id: int, root: Path, on_changes: Callable[[int, List[Path]], None]):
+        super().__init__(name=f"library-watcher-{library_id}", daemon=True)
+        self.library_id = library_id
+        self.root = root
+        self.on_changes = on_changes
+        self._stop_event = threading.Event()
+        self._pending: Dict[Path, Tuple[float, Optional[Tuple[int, int]]]] = {}
+        self.backend = None
+
+    def stop(self) -> None:
+        self._stop_event.set()
+
+    def run(self) -> None:
+        try:
+            self.backend = self._select_backend()
+        except OSError as e:
+            logger.error(f"Cannot watch library {self.library_id} at {self.root}: {str(e)}")
+            return
+        logger.info(f"Watching library {self.library_id} at {self.root} ({type(self.backend).__name__})")
+        try:
+            while not self._stop_event.is_set():
+                try:
+                    touched, overflowed = self.backend.poll(timeout=1.0)
+                except WatcherUnavailable as e:
+                    # Out of watches on a new subdirectory: events since the
+                    # last poll are lost, so poll from here and rescan once
+                    logger.warning(f"Falling back to polling for {self.root}: {str(e)}")
+                    self.backend.close()
+                    self.backend = PollingBackend(self.root)
+                    touched, overflowed = {self.root}, False
+                now = time.monotonic()
+                if overflowed:
+                    logger.warning(f"Event queue overflow on {self.root}, rescanning library")
+                    touched = {self.root}
+                for path in touched:
+                    self._pending[path] = (now, self._signature(path))
+                self._flush_settled(now)
+        except Exception as e:
+            logger.error(f"Watcher for library {self.library_id} stopped: {str(e)}")
+        finally:
+            self.backend.close()
+
+    def _flush_settled(self, now: float) -> None:
+        settled = []
+        for path, (changed_at, signature) in list(self._pending.items()):
+            current = self._signature(path)
+            if current != signature:
+                # Still being written, restart the quiet period
+                self._pending[path] = (now, current)
+            elif now - changed_at >= settings.WATCHER_SETTLE_SECONDS:
+                settled.append(path)
+                del self._pending[path]
+
+        if settled:
+            try:
+                self.on_changes(self.library_id, settled)
+            except Exception as e:
+                logger.error(f"Ingest of {len(settled)} watched paths failed: {str(e)}")
+
+    def _select_backend(self):
+        if ScanPool.device_kind(os.stat(self.root).st_dev) == "network":
+            return PollingBackend(self.root)
+        try:
+            return InotifyBackend(self.root)
+        except WatcherUnavailable as e:
+            logger.warning(f"Falling back to polling for {self.root}: {str(e)}")
+            return PollingBackend(self.root)
+
+    @staticmethod
+    def _signature(path: Path) -> Optional[Tuple[int, int]]:
+        try:
+            stat = path.stat()
+        except OSError:
+            return None
+        return (stat.st_size, stat.st_mtime_ns)
+
+class WatcherService:
+    """Keeps one LibraryWatcher running for every auto-scan library"""
+
+    def __init__(self, on_changes: Callable[[int, List[Path]], None]):
+        self.on_changes = on_changes
+        self._watchers: Dict[int, LibraryWatcher] = {}
+        self._lock = threading.Lock()
+
+    def sync(self, libraries) -> None:
+        """Start watchers for new auto-scan libraries and stop removed ones"""
+        wanted = {
+            library.id: Path(library.path)
+            for library in libraries
+            if library.auto_scan
+        }
+        with self._lock:
+            for library_id in list(self._watchers):
+                watcher = self._watchers[library_id]
+                if wanted.get(library_id) != watcher.root:
+                    watcher.stop()
+                    del self._watchers[library_id]
+
+            for library_id, root in wanted.items():
+                if library_id in self._watchers or not root.is_dir():
+                    continue
+                watcher = LibraryWatcher(library_id, root, self.on_changes)
+                watcher.start()
+                self._watchers[library_id] = watcher
+
+    def stop(self) -> None:
+        with self._lock:
+            for watcher in self._watchers.values():
+                watcher.stop()
+            self._watchers.clear()
+
+library_watcher = WatcherService(ingest_library_paths)
+
+def sync_library_watchers() -> None:
+    """Match the running watchers to the libraries; called at startup and after library changes"""
+    if not settings.WATCHER_ENABLED:
+        return
+    with session_scope() as db:
+        library_watcher.sync(db.query(MediaLibrary).all())
+
+def _is_watched_file(path: Path) -> bool:
+    return path.suffix[1:].lower() in WATCHED_EXTENSIONS
@@ -0,0 +1,188 @@
+import time
+import heapq
+import asyncio
+import itertools
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+from backend.config import settings
+
+class TokenBucket:
+    """
+    Token bucket that lets callers go into debt: a reservation always
+    succeeds and returns how long to wait before sending, which paces
+    chunks exactly without a polling loop
+    """
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def reserve(self, amount: int) -> float:
+        if not self.rate:
+            return 0.0
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= amount
+        return -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+@dataclass
+class Flow:
+    """Bandwidth state and live counters of one viewer's stream"""
+    key: Hashable
+    user_id: int
+    pace: TokenBucket
+    bytes_sent: int = 0
+    rate: float = 0.0  # recent bytes/s, exponentially averaged
+    throttled_seconds: float = 0.0
+    finish_tag: float = 0.0
+    started: float = field(default_factory=time.time)
+    last_active: float = field(default_factory=time.monotonic)
+
+    def record(self, amount: int) -> None:
+        now = time.monotonic()
+        elapsed = max(now - self.last_active, 1e-3)
+        self.rate = 0.8 * self.rate + 0.2 * (amount / elapsed)
+        self.bytes_sent += amount
+        self.last_active = now
+
+    def describe(self) -> Dict:
+        return {
+            "key": list(self.key) if isinstance(self.key, tuple) else self.key,
+            "user_id": self.user_id,
+            "bytes_sent": self.bytes_sent,
+            "rate": round(self.rate),
+            "pace_rate": round(self.pace.rate),
+            "throttled_seconds": round(self.throttled_seconds, 3),
+            "started": self.started,
+            "idle_seconds": round(time.monotonic() - self.last_active, 3)
+        }
+
+class BandwidthScheduler:
+    """
+    Shares the uplink between concurrent streams.
+
+    Every chunk passes three gates before it is sent:
+
+    - the stream's own bucket, paced to the media bitrate times
+      STREAM_PACE_HEADROOM after an initial burst that fills the
+      player's buffer,
+    - the user's bucket (STREAM_USER_RATE),
+    - the shared uplink (STREAM_UPLINK_RATE), granted in start-time fair
+      queuing order. Each user has equal weight, split between their
+      active streams. Bandwidth a paced stream leaves unused goes to
+      whoever is still queued.
+
+    All state lives on the event loop; nothing here blocks.
+    """
+
+    def __init__(self):
+        self._flows: Dict[Hashable, Flow] = {}
+        self._users: Dict[int, TokenBucket] = {}
+        self._uplink: Optional[TokenBucket] = None
+        self._queue: List[Tuple[float, int, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        self._virtual_time = 0.0
+        self._dispatcher: Optional[asyncio.Task] = None
+
+    def flow(self, key: Hashable, user_id: int, bitrate: Optional[int] = None) -> Flow:
+        """
+        The stream identified by key, created on first use. bitrate is the
+        media's in bits/s; without one the stream is not paced.
+        """
+        self._prune()
+        rate = bitrate / 8 * settings.STREAM_PACE_HEADROOM if bitrate else 0.0
+        flow = self._flows.get(key)
+        if flow is None:
+            flow = Flow(key, user_id, TokenBucket(rate, rate * settings.STREAM_PACE_BURST_SECONDS))
+            self._flows[key] = flow
+        elif rate and flow.pace.rate != rate:
+            flow.pace.rate = rate
+            flow.pace.burst = rate * settings.STREAM_PACE_BURST_SECONDS
+        return flow
+
+    def paces(self, flow: Flow) -> bool:
+        """Whether any gate can hold back the flow's chunks"""
+        return bool(flow.pace.rate or settings.STREAM_USER_RATE or settings.STREAM_UPLINK_RATE)
+
+    def throttle(self, flow: Flow) -> Callable[[int], Awaitable[None]]:
+        """Callable a response awaits before sending each chunk"""
+        return lambda amount: self.acquire(flow, amount)
+
+    async def acquire(self, flow: Flow, amount: int) -> None:
+        started = time.monotonic()
+        delay = max(flow.pace.reserve(amount), self._user_bucket(flow.user_id).reserve(amount))
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if settings.STREAM_UPLINK_RATE:
+            await self._uplink_turn(flow, amount)
+        flow.throttled_seconds += time.monotonic() - started
+        flow.record(amount)
+
+    def sessions(self) -> List[Dict]:
+        return [flow.describe() for flow in self._flows.values()]
+
+    def stats(self) -> Dict:
+        return {
+            "flows": len(self._flows),
+            "queued_chunks": len(self._queue),
+            "uplink_rate": settings.STREAM_UPLINK_RATE,
+            "user_rate": settings.STREAM_USER_RATE,
+            "current_rate": round(sum(flow.rate for flow in self._active_flows()))
+        }
+
+    async def _uplink_turn(self, flow: Flow, amount: int) -> None:
+        # Start-time fair queuing: a chunk's virtual start is the end of the
+        # flow's previous chunk, stretched by the inverse of its weight.
+        # Ordering by start rather than finish keeps flows that only ever
+        # have one chunk outstanding (every response loop) fair.
+        start = max(self._virtual_time, flow.finish_tag)
+        flow.finish_tag = start + amount / self._weight(flow)
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, (start, next(self._sequence), amount, future))
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.ensure_future(self._dispatch())
+        await future
+
+    async def _dispatch(self) -> None:
+        if self._uplink is None or self._uplink.rate != settings.STREAM_UPLINK_RATE:
+            # A quarter second of burst keeps the link busy between grants
+            self._uplink = TokenBucket(settings.STREAM_UPLINK_RATE, settings.STREAM_UPLINK_RATE / 4)
+        while self._queue:
+            start, _, amount, future = heapq.heappop(self._queue)
+            if future.done():
+                # The response was cancelled while waiting
+                continue
+            self._virtual_time = start
+            future.set_result(None)
+            # Hold the next grant until the link has paid for this one; the
+            # granted flow re-queues meanwhile and competes on its new tag
+            delay = self._uplink.reserve(amount)
+            await asyncio.sleep(delay)
+
+    def _weight(self, flow: Flow) -> float:
+        active = sum(1 for other in self._active_flows() if other.user_id == flow.user_id)
+        return 1.0 / max(active, 1)
+
+    def _user_bucket(self, user_id: int) -> TokenBucket:
+        bucket = self._users.get(user_id)
+        if bucket is None or bucket.rate != settings.STREAM_USER_RATE:
+            bucket = TokenBucket(settings.STREAM_USER_RATE, settings.STREAM_USER_RATE / 4)
+            self._users[user_id] = bucket
+        return bucket
+
+    def _active_flows(self) -> List[Flow]:
+        cutoff = time.monotonic() - settings.STREAM_FLOW_ACTIVE_SECONDS
+        return [flow for flow in self._flows.values() if flow.last_active >= cutoff]
+
+    def _prune(self) -> None:
+        cutoff = time.monotonic() - settings.STREAM_FLOW_IDLE_SECONDS
+        for key in [key for key, flow in self._flows.items() if flow.last_active < cutoff]:
+            del self._flows[key]
+        active_users = {flow.user_id for flow in self._flows.values()}
+        for user_id in [user_id for user_id in self._users if user_id not in active_users]:
+            del self._users[user_id]
+
+bandwidth_scheduler = BandwidthScheduler()
@@ -0,0 +1,143 @@
+import os
+import uuid
+import shutil
+import logging
+import threading
+from pathlib import Path
+from collections import OrderedDict
+from typing import Dict, Optional
+from backend.config import settings
+
+logger = logging.getLogger(__name__)
+
+class DiskCache:
+    """
+    Size-bounded LRU of generated files (HLS segments, thumbnails, ...).
+
+    Keys are relative paths under root. Files are written to a temporary
+    name and renamed into place, so readers never see partial output.
+    Evicted files are unlinked; responses already reading them keep their
+    open descriptor. A writer can reserve its expected output size when it
+    takes a temporary file, so space is made before the file grows rather
+    than after it is committed.
+    """
+
+    TMP_DIR = ".tmp"
+
+    def __init__(self, root: Path, max_bytes: int):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._size = 0  # committed entries plus reservations
+        self._reserved: Dict[str, int] = {}  # temporary file name -> bytes held for its writer
+        self._lock = threading.Lock()
+        self._loaded = False
+
+    def load(self) -> None:
+        """Index files left by a previous run, oldest access first"""
+        with self._lock:
+            if self._loaded:
+                return
+            shutil.rmtree(self.root / self.TMP_DIR, ignore_errors=True)
+            (self.root / self.TMP_DIR).mkdir(parents=True, exist_ok=True)
+
+            found = []
+            for current, dirs, files in os.walk(self.root):
+                dirs[:] = [name for name in dirs if name != self.TMP_DIR]
+                for name in files:
+                    path = Path(current) / name
+                    try:
+                        st = path.stat()
+                    except OSError:
+                        continue
+                    found.append((st.st_atime, path.relative_to(self.root).as_posix(), st.st_size))
+
+            for _, key, size in sorted(found):
+                self._entries[key] = size
+                self._size += size
+            self._loaded = True
+            self._evict()
+
+    def get(self, key: str) -> Optional[Path]:
+        self.load()
+        path = self.root / key
+        with self._lock:
+            if key not in self._entries:
+                return None
+            if not path.exists():
+                self._size -= self._entries.pop(key)
+                return None
+            self._entries.move_to_end(key)
+        return path
+
+    def temp_path(self, suffix: str = "", reserve: int = 0) -> Path:
+        """
+        Scratch file for a writer; pass it to commit() once complete, or to
+        release() if it is abandoned. reserve bytes count against max_bytes
+        until then, evicting older entries to make room.
+        """
+        self.load()
+        temp = self.root / self.TMP_DIR / f"{uuid.uuid4().hex}{suffix}"
+        if reserve > 0:
+            with self._lock:
+                self._reserved[temp.name] = reserve = min(reserve, self.max_bytes)
+                self._size += reserve
+                self._evict()
+        return temp
+
+    def commit(self, key: str, temp: Path) -> Path:
+        path = self.root / key
+        path.parent.mkdir(parents=True, exist_ok=True)
+        size = temp.stat().st_size
+        os.replace(temp, path)
+        with self._lock:
+            self._size -= self._reserved.pop(temp.name, 0)
+            self._size -= self._entries.pop(key, 0)
+            self._entries[key] = size
+            self._size += size
+            self._evict()
+        return path
+
+    def put(self, key: str, data: bytes) -> Path:
+        temp = self.temp_path()
+        temp.write_bytes(data)
+        return self.commit(key, temp)
+
+    def release(self, temp: Path) -> None:
+        """Remove a temporary file that will not be committed and free its reservation"""
+        temp.unlink(missing_ok=True)
+        with self._lock:
+            self._size -= self._reserved.pop(temp.name, 0)
+
+    def discard(self, prefix: str) -> None:
+        """Drop every entry under a key prefix, e.g. a media item's segments"""
+        with self._lock:
+            for key in [key for key in self._entries if key.startswith(prefix)]:
+                self._remove(key)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "reserved": sum(self._reserved.values()),
+                "max_bytes": self.max_bytes
+            }
+
+    def _evict(self) -> None:
+        while self._size > self.max_bytes and self._entries:
+            key = next(iter(self._entries))
+            self._remove(key)
+
+    def _remove(self, key: str) -> None:
+        self._size -= self._entries.pop(key)
+        try:
+            (self.root / key).unlink()
+        except OSError as e:
+            logger.debug(f"Cache eviction of {key} failed: {str(e)}")
+
+media_cache = DiskCache(settings.CACHE_DIR, settings.CACHE_MAX_BYTES)
+# Posters and sprites are small and long-lived; segment churn must not evict them
+thumbnail_cache = DiskCache(settings.THUMBNAIL_DIR, settings.THUMBNAIL_CACHE_MAX_BYTES)
+# A lost index costs a full read of the file on its next seek; keep them out of the churn too
+keyframe_cache = DiskCache(settings.KEYFRAME_INDEX_DIR, settings.KEYFRAME_INDEX_CACHE_MAX_BYTES)
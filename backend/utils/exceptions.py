@@ -114,6 +114,47 @@ class DirectoryScanException(APIException):
             context=context
         )
 
+class ScanJobNotFoundException(APIException):
+    """Requested scan job not found"""
+    def __init__(self, context: Optional[Dict] = None):
+        super().__init__(
+            status_code=status.HTTP_404_NOT_FOUND,
+            error_code="scan_job_not_found",
+            message="Scan job not found",
+            context=context
+        )
+
+# Streaming Exceptions
+class StreamLimitException(APIException):
+    """Too many concurrent playback sessions"""
+    def __init__(self, context: Optional[Dict] = None):
+        super().__init__(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            error_code="stream_limit_reached",
+            message="Too many concurrent streams",
+            context=context
+        )
+
+class StreamTerminatedException(APIException):
+    """Playback session was ended by an administrator"""
+    def __init__(self, context: Optional[Dict] = None):
+        super().__init__(
+            status_code=status.HTTP_403_FORBIDDEN,
+            error_code="stream_terminated",
+            message="Stream was terminated",
+            context=context
+        )
+
+class StreamSessionNotFoundException(APIException):
+    """Requested playback session not found"""
+    def __init__(self, context: Optional[Dict] = None):
+        super().__init__(
+            status_code=status.HTTP_404_NOT_FOUND,
+            error_code="stream_session_not_found",
+            message="Stream session not found",
+            context=context
+        )
+
 # Subtitle Exceptions
 class SubtitleDownloadException(APIException):
     """Subtitle download failed"""
@@ -179,6 +220,12 @@ COMMON_ERROR_CODES = {
     # Media
     "media_not_found": "Media file not found",
     "invalid_media_type": "Unsupported media type",
+    "scan_job_not_found": "Scan job not found",
+    
+    # Streaming
+    "stream_limit_reached": "Too many concurrent streams",
+    "stream_terminated": "Stream was terminated",
+    "stream_session_not_found": "Stream session not found",
     
     # Subtitle
     "subtitle_download_failed": "Subtitle download failed",
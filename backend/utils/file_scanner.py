@@ -2,9 +2,15 @@ import os
 import logging
 import hashlib
 from pathlib import Path
-from typing import List, Dict, Tuple
+from collections import deque
+from concurrent.futures import Future
+from typing import List, Dict, Tuple, Iterable, Iterator, Optional
 from datetime import datetime
 from backend.config import settings
+from backend.database.models.media import Media
+from backend.utils.scan_manifest import ScanManifest
+from backend.utils.scan_pool import ScanPool
+from backend.utils.walker import DirectoryWalker
 
 logger = logging.getLogger(__name__)
 
@@ -13,21 +19,22 @@ class FileScanner:
     SUB_EXTENSIONS = {'srt', 'vtt', 'ass'}
 
     @classmethod
-    def scan_directory(cls, path: Path) -> Tuple[List[Dict], List[Dict]]:
-        """Scan directory and return media/subtitle files with metadata"""
+    def scan_directory(cls, path: Path, manifest: ScanManifest = None) -> Tuple[List[Dict], List[Dict]]:
+        """
+        Scan directory and return media/subtitle files with metadata.
+        When a manifest is given, files whose stat signature is unchanged reuse
+        the stored fingerprint instead of being read again.
+        """
         media_files = []
         subtitle_files = []
         
         try:
-            for entry in path.rglob('*'):
-                if entry.is_file():
-                    ext = entry.suffix[1:].lower()
-                    metadata = cls._get_file_metadata(entry)
-                    
-                    if ext in cls.MEDIA_EXTENSIONS:
-                        media_files.append(metadata)
-                    elif ext in cls.SUB_EXTENSIONS:
-                        subtitle_files.append(metadata)
+            walker = DirectoryWalker(path, cls.MEDIA_EXTENSIONS | cls.SUB_EXTENSIONS)
+            for metadata in cls.describe_files(walker, manifest):
+                if metadata["extension"] in cls.MEDIA_EXTENSIONS:
+                    media_files.append(metadata)
+                else:
+                    subtitle_files.append(metadata)
                         
         except Exception as e:
             logger.error(f"Directory scan failed: {str(e)}")
@@ -35,34 +42,187 @@ class FileScanner:
         return media_files, subtitle_files
 
     @classmethod
-    def find_new_files(cls, path: Path, last_scan: float) -> List[Dict]:
-        """Find files modified since last scan"""
-        new_files = []
+    def find_new_files(cls, path: Path, last_scan: float = None, manifest: ScanManifest = None) -> List[Dict]:
+        """
+        Find files added or modified since the last scan.
+        With a manifest the comparison is against the recorded stat signature,
+        so only new or changed files are fingerprinted; without one it falls
+        back to comparing mtimes against last_scan.
+        """
+        def candidates():
+            for entry, stat in DirectoryWalker(path):
+                if manifest is not None:
+                    if manifest.lookup(entry, stat) is None:
+                        yield entry, stat
+                elif last_scan is None or stat.st_mtime > last_scan:
+                    yield entry, stat
+
         try:
-            for entry in path.rglob('*'):
-                if entry.is_file() and entry.stat().st_mtime > last_scan:
-                    new_files.append(cls._get_file_metadata(entry))
+            return list(cls.describe_files(candidates(), manifest))
         except Exception as e:
             logger.error(f"New file detection failed: {str(e)}")
-        return new_files
+            return []
+
+    @classmethod
+    def describe_files(
+        cls,
+        files: Iterable[Tuple[Path, os.stat_result]],
+        manifest: ScanManifest = None,
+        pool: ScanPool = None,
+        links: Dict[Tuple[int, int], Future] = None
+    ) -> Iterator[Dict]:
+        """
+        Build metadata for (path, stat) pairs in input order. Files that need
+        fingerprinting are fanned out to the device-aware scan pool while a
+        bounded window of results is kept in flight. Hardlinks of an inode
+        already being fingerprinted share its result instead of being read again;
+        pass the same links map to every call of a scan that is described in
+        several batches so this holds across batches too.
+        """
+        own_pool = pool is None
+        pool = pool or ScanPool()
+        pending = deque()
+        links = {} if links is None else links
+        try:
+            for path, stat in files:
+                cached = manifest.lookup(path, stat) if manifest is not None else None
+                if cached is not None and not pending:
+                    yield cls._build_metadata(path, stat, cached.fingerprint, cached.hash, changed=False)
+                    continue
+
+                future = None
+                if cached is None:
+                    link_key = (stat.st_dev, stat.st_ino) if stat.st_nlink > 1 else None
+                    future = links.get(link_key)
+                    if future is None:
+                        future = pool.submit(
+                            stat.st_dev, cls._digest_file, path, stat.st_size,
+                            nbytes=cls.bytes_read(stat.st_size)
+                        )
+                        if link_key is not None:
+                            links[link_key] = future
+                pending.append((path, stat, cached, future))
+
+                while pending and (len(pending) >= pool.window or cls._is_ready(pending[0])):
+                    metadata = cls._complete(pending.popleft(), manifest)
+                    if metadata is not None:
+                        yield metadata
+
+            while pending:
+                metadata = cls._complete(pending.popleft(), manifest)
+                if metadata is not None:
+                    yield metadata
+        finally:
+            if own_pool:
+                pool.shutdown()
+
+    @staticmethod
+    def _is_ready(item: tuple) -> bool:
+        future = item[3]
+        return future is None or future.done()
+
+    @classmethod
+    def _complete(cls, item: tuple, manifest: ScanManifest) -> Optional[Dict]:
+        path, stat, cached, future = item
+        if future is None:
+            return cls._build_metadata(path, stat, cached.fingerprint, cached.hash, changed=False)
+
+        try:
+            fingerprint, file_hash = future.result()
+        except OSError as e:
+            logger.warning(f"Fingerprinting failed for {path}: {str(e)}")
+            return None
+
+        ext = path.suffix[1:].lower()
+        if manifest is not None:
+            manifest.record(path, stat, fingerprint, ext, file_hash)
+        return cls._build_metadata(path, stat, fingerprint, file_hash, changed=True)
 
     @staticmethod
-    def _get_file_metadata(path: Path) -> Dict:
-        stat = path.stat()
+    def _digest_file(path: Path, size: int) -> Tuple[str, Optional[str]]:
+        fingerprint = FileScanner.calculate_fingerprint(path, size)
+        file_hash = FileScanner.calculate_hash(path) if settings.SCAN_FULL_HASH else None
+        return fingerprint, file_hash
+
+    @staticmethod
+    def bytes_read(size: int) -> int:
+        if settings.SCAN_FULL_HASH:
+            return size
+        return min(size, settings.FINGERPRINT_BLOCK_SIZE * (settings.FINGERPRINT_SAMPLES + 2))
+
+    @staticmethod
+    def _build_metadata(path: Path, stat: os.stat_result, fingerprint: str, file_hash: Optional[str], changed: bool) -> Dict:
         return {
             "path": str(path),
             "size": stat.st_size,
             "modified": stat.st_mtime,
             "created": stat.st_ctime,
-            "hash": FileScanner.calculate_hash(path),
-            "extension": path.suffix[1:].lower()
+            "fingerprint": fingerprint,
+            "hash": file_hash,
+            "extension": path.suffix[1:].lower(),
+            "changed": changed
         }
 
+    @classmethod
+    def verify_full_hashes(cls, manifest: ScanManifest, limit: int = None, reverify: bool = False) -> List[str]:
+        """
+        Background verification pass: compute full hashes for manifest entries
+        that only carry a fingerprint (or for every entry when reverify is set)
+        and copy them to media rows with the same fingerprint.
+        Returns paths whose content no longer matches a previously stored hash.
+        """
+        mismatched = []
+        for entry in manifest.pending_verification(limit, reverify):
+            try:
+                file_hash = cls.calculate_hash(Path(entry.path))
+            except OSError as e:
+                logger.warning(f"Hash verification skipped for {entry.path}: {str(e)}")
+                continue
+
+            if entry.hash and entry.hash != file_hash:
+                logger.warning(f"Content changed without stat change: {entry.path}")
+                mismatched.append(entry.path)
+            entry.hash = file_hash
+            manifest.db.query(Media).filter(
+                Media.file_path == entry.path,
+                Media.fingerprint == entry.fingerprint
+            ).update({Media.hash: file_hash}, synchronize_session=False)
+        manifest.save()
+        return mismatched
+
     @staticmethod
     def calculate_hash(path: Path) -> str:
         """Calculate BLAKE2b file hash with chunked reading"""
         blake = hashlib.blake2b()
         with open(path, 'rb') as f:
-            while chunk := f.read(8192):
+            while chunk := f.read(1024 * 1024):
                 blake.update(chunk)
-        return blake.hexdigest()
\ No newline at end of file
+        return blake.hexdigest()
+
+    @staticmethod
+    def calculate_fingerprint(path: Path, size: int = None) -> str:
+        """
+        Calculate a sampled content fingerprint: file size plus BLAKE2b of
+        fixed-size blocks from the head, the tail and evenly spaced offsets.
+        Small files are hashed in full.
+        """
+        block_size = settings.FINGERPRINT_BLOCK_SIZE
+        samples = settings.FINGERPRINT_SAMPLES
+        size = os.path.getsize(path) if size is None else size
+
+        blake = hashlib.blake2b(digest_size=20)
+        blake.update(size.to_bytes(8, 'little'))
+        with open(path, 'rb') as f:
+            if size <= block_size * (samples + 2):
+                while chunk := f.read(1024 * 1024):
+                    blake.update(chunk)
+            else:
+                fd = f.fileno()
+                for offset in FileScanner._sample_offsets(size, block_size, samples):
+                    blake.update(os.pread(fd, block_size, offset))
+        return f"{size:x}-{blake.hexdigest()}"
+
+    @staticmethod
+    def _sample_offsets(size: int, block_size: int, samples: int) -> List[int]:
+        last = size - block_size
+        return [0] + [last * i // (samples + 1) for i in range(1, samples + 1)] + [last]
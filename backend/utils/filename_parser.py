@@ -0,0 +1,114 @@
+import os
+import logging
+import threading
+from pathlib import Path
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Optional
+from guessit import guessit
+from backend.config import settings
+
+logger = logging.getLogger(__name__)
+
+class FilenameParser:
+    """
+    Memoized guessit analysis.
+
+    Results are kept in an LRU keyed by the analysed name: the file name
+    plus its two parent directories, which carry the show/season context
+    guessit needs. parse_batch resolves cache misses in bulk, across worker
+    processes once a batch is large enough to amortize the hand-off.
+    """
+
+    _cache: "OrderedDict[str, Dict]" = OrderedDict()
+    _lock = threading.Lock()
+    _pool: Optional[ProcessPoolExecutor] = None
+    _pool_lock = threading.Lock()
+
+    @staticmethod
+    def analysis_key(path) -> str:
+        parts = Path(path).parts
+        return os.path.join(*parts[-3:]) if parts else ""
+
+    @classmethod
+    def parse(cls, path) -> Dict:
+        key = cls.analysis_key(path)
+        cached = cls._cached(key)
+        if cached is None:
+            cached = _guess(key)
+            cls._remember({key: cached})
+        return dict(cached)
+
+    @classmethod
+    def parse_batch(cls, paths: Iterable, workers: int = None) -> List[Dict]:
+        """Parse many names at once, in input order"""
+        keys = [cls.analysis_key(path) for path in paths]
+        with cls._lock:
+            results = {key: cls._cache[key] for key in set(keys) if key in cls._cache}
+        misses = [key for key in dict.fromkeys(keys) if key not in results]
+
+        if misses:
+            parsed = cls._parse_misses(misses, workers)
+            cls._remember(parsed)
+            results.update(parsed)
+        return [dict(results[key]) for key in keys]
+
+    @classmethod
+    def shutdown(cls) -> None:
+        with cls._pool_lock:
+            if cls._pool is not None:
+                cls._pool.shutdown(cancel_futures=True)
+                cls._pool = None
+
+    @classmethod
+    def _parse_misses(cls, keys: List[str], workers: Optional[int]) -> Dict[str, Dict]:
+        workers = settings.FILENAME_PARSE_WORKERS if workers is None else workers
+        if workers > 1 and len(keys) >= settings.FILENAME_PARSE_PROCESS_MIN:
+            try:
+                pool = cls._get_pool(workers)
+                chunksize = max(1, len(keys) // (workers * 4))
+                return dict(zip(keys, pool.map(_guess, keys, chunksize=chunksize)))
+            except Exception as e:
+                logger.warning(f"Process pool parsing failed, parsing in-process: {str(e)}")
+                cls.shutdown()
+        return {key: _guess(key) for key in keys}
+
+    @classmethod
+    def _get_pool(cls, workers: int) -> ProcessPoolExecutor:
+        with cls._pool_lock:
+            if cls._pool is None:
+                cls._pool = ProcessPoolExecutor(max_workers=workers)
+            return cls._pool
+
+    @classmethod
+    def _cached(cls, key: str) -> Optional[Dict]:
+        with cls._lock:
+            data = cls._cache.get(key)
+            if data is not None:
+                cls._cache.move_to_end(key)
+            return data
+
+    @classmethod
+    def _remember(cls, parsed: Dict[str, Dict]) -> None:
+        with cls._lock:
+            for key, data in parsed.items():
+                cls._cache[key] = data
+                cls._cache.move_to_end(key)
+            while len(cls._cache) > settings.FILENAME_CACHE_SIZE:
+                cls._cache.popitem(last=False)
+
+def _guess(name: str) -> Dict:
+    """guessit result as plain values, safe to pickle and to share from the cache"""
+    try:
+        guess = guessit(name)
+    except Exception as e:
+        logger.debug(f"Filename parsing failed for {name}: {str(e)}")
+        return {}
+    return {key: _plain(value) for key, value in guess.items()}
+
+def _plain(value):
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, (list, tuple, set)):
+        return [_plain(item) for item in value]
+    return str(value)
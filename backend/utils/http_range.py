@@ -0,0 +1,145 @@
+import os
+from email.utils import formatdate, parsedate_to_datetime
+from typing import List, Optional, Tuple
+
+# More ranges than this in one request are served as a single covering range
+MAX_RANGES = 16
+
+ByteRange = Tuple[int, int]
+
+class RangeNotSatisfiable(Exception):
+    """Raised when none of the requested byte ranges overlaps the file"""
+
+def make_etag(fingerprint: Optional[str], stat_result: os.stat_result) -> str:
+    """
+    Strong validator from the stored content fingerprint. The mtime keeps it
+    honest for files modified since they were last ingested.
+    """
+    mtime = f"{stat_result.st_mtime_ns:x}"
+    if fingerprint:
+        return f'"{fingerprint}-{mtime}"'
+    return f'"{stat_result.st_size:x}-{mtime}"'
+
+def validator_headers(etag: str, stat_result: os.stat_result) -> dict:
+    return {
+        "etag": etag,
+        "last-modified": formatdate(stat_result.st_mtime, usegmt=True),
+        "accept-ranges": "bytes"
+    }
+
+def check_preconditions(headers, etag: str, mtime: float) -> Optional[int]:
+    """
+    Evaluate conditional request headers in RFC 9110 order.
+    Returns 412 or 304 when the request should end there, else None.
+    """
+    if_match = headers.get("if-match")
+    if if_match is not None:
+        if not _etag_listed(if_match, etag, weak=False):
+            return 412
+    else:
+        unmodified_since = _parse_date(headers.get("if-unmodified-since"))
+        if unmodified_since is not None and int(mtime) > unmodified_since:
+            return 412
+
+    if_none_match = headers.get("if-none-match")
+    if if_none_match is not None:
+        return 304 if _etag_listed(if_none_match, etag, weak=True) else None
+
+    modified_since = _parse_date(headers.get("if-modified-since"))
+    if modified_since is not None and int(mtime) <= modified_since:
+        return 304
+    return None
+
+def if_range_matches(if_range: Optional[str], etag: str, mtime: float) -> bool:
+    """Whether a Range request may be honoured given its If-Range validator"""
+    if if_range is None:
+        return True
+    if_range = if_range.strip()
+    if if_range.startswith(('"', 'W/')):
+        # Strong comparison only: weak tags never match
+        return if_range == etag
+    date = _parse_date(if_range)
+    return date is not None and date == int(mtime)
+
+def parse_range(header: Optional[str], size: int) -> Optional[List[ByteRange]]:
+    """
+    Parse a Range header into sorted, coalesced inclusive (start, end) pairs.
+
+    Returns None when the header is absent, malformed or not in bytes (the
+    whole file is served). Raises RangeNotSatisfiable when it is valid but
+    no range overlaps the file.
+    """
+    if not header:
+        return None
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or not spec.strip():
+        return None
+
+    ranges = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        first, dash, last = part.partition("-")
+        if not dash:
+            return None
+        first, last = first.strip(), last.strip()
+        try:
+            if not first:
+                # Suffix range: the final N bytes
+                length = int(last)
+                if length <= 0:
+                    continue
+                ranges.append((max(size - length, 0), size - 1))
+                continue
+            start = int(first)
+            end = int(last) if last else None
+        except ValueError:
+            return None
+        if start < 0 or (end is not None and end < start):
+            return None
+        if start >= size:
+            continue
+        if end is None:
+            end = size - 1
+        ranges.append((start, min(end, size - 1)))
+
+    if not ranges or size == 0:
+        raise RangeNotSatisfiable()
+    return _coalesce(ranges)
+
+def _coalesce(ranges: List[ByteRange]) -> List[ByteRange]:
+    ranges.sort()
+    merged = [ranges[0]]
+    for start, end in ranges[1:]:
+        last_start, last_end = merged[-1]
+        if start <= last_end + 1:
+            merged[-1] = (last_start, max(last_end, end))
+        else:
+            merged.append((start, end))
+    if len(merged) > MAX_RANGES:
+        merged = [(merged[0][0], merged[-1][1])]
+    return merged
+
+def _etag_listed(header: str, etag: str, weak: bool) -> bool:
+    header = header.strip()
+    if header == "*":
+        return True
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if weak:
+            if candidate.startswith("W/"):
+                candidate = candidate[2:]
+        elif candidate.startswith("W/"):
+            continue
+        if candidate == etag:
+            return True
+    return False
+
+def _parse_date(value: Optional[str]) -> Optional[int]:
+    if not value:
+        return None
+    try:
+        return int(parsedate_to_datetime(value).timestamp())
+    except (TypeError, ValueError, IndexError):
+        return None
@@ -0,0 +1,197 @@
+import sys
+import struct
+import asyncio
+import logging
+import threading
+from array import array
+from bisect import bisect_right
+from pathlib import Path
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from backend.config import settings
+from backend.utils.disk_cache import keyframe_cache
+from backend.utils.subprocess_executor import SubprocessError, subprocess_executor
+
+logger = logging.getLogger(__name__)
+
+class KeyframeIndexError(Exception):
+    """Raised when a file's keyframes cannot be read"""
+
+class KeyframeIndex:
+    """
+    Keyframe presentation times and byte offsets of a video stream.
+
+    Both columns live in flat typed arrays (16 bytes per keyframe, about
+    60 KB for a two-hour film with 2 s GOPs), searched with bisect.
+    Offsets are -1 where the container does not report them.
+    """
+
+    MAGIC = b"KFI1"
+
+    def __init__(self, times: array, positions: array):
+        self.times = times
+        self.positions = positions
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def floor(self, seconds: float) -> Tuple[float, int]:
+        """Time and byte offset of the last keyframe at or before seconds"""
+        if not self.times:
+            return 0.0, 0
+        i = max(bisect_right(self.times, seconds) - 1, 0)
+        return self.times[i], self.positions[i]
+
+    def segments(self, duration: float, target: float) -> List[Tuple[float, float]]:
+        """
+        (start, length) spans of roughly target seconds, each starting on
+        a keyframe so an encoder seeking to it decodes nothing it discards
+        """
+        starts = [0.0]
+        for time in self.times:
+            if time - starts[-1] >= target and time < duration:
+                starts.append(time)
+        ends = starts[1:] + [duration]
+        return [(start, end - start) for start, end in zip(starts, ends) if end > start]
+
+    def to_bytes(self) -> bytes:
+        times, positions = _little_endian(self.times), _little_endian(self.positions)
+        return self.MAGIC + struct.pack("<I", len(times)) + times.tobytes() + positions.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "KeyframeIndex":
+        if data[:4] != cls.MAGIC:
+            raise ValueError("Not a keyframe index")
+        (count,) = struct.unpack_from("<I", data, 4)
+        times, positions = array("d"), array("q")
+        times.frombytes(data[8:8 + count * 8])
+        positions.frombytes(data[8 + count * 8:8 + count * 16])
+        if len(times) != count or len(positions) != count:
+            raise ValueError("Truncated keyframe index")
+        return cls(_little_endian(times), _little_endian(positions))
+
+    @classmethod
+    def parse(cls, output: str) -> "KeyframeIndex":
+        """Build from ffprobe packet CSV lines of pts_time,pos,flags"""
+        points = []
+        for line in output.splitlines():
+            fields = line.split(",")
+            if len(fields) < 3 or "K" not in fields[2]:
+                continue
+            try:
+                time = float(fields[0])
+            except ValueError:
+                continue
+            position = int(fields[1]) if fields[1].isdigit() else -1
+            points.append((time, position))
+
+        # Packets come in decode order; B-frame reordering can swap times
+        points.sort()
+        return cls(array("d", (time for time, _ in points)), array("q", (pos for _, pos in points)))
+
+class KeyframeIndexer:
+    """
+    Keyframe indexes keyed by content fingerprint, built lazily.
+
+    A file's index is read from the video packet headers with one ffprobe
+    pass (no decoding), kept in an in-memory LRU and persisted in a disk
+    cache of their own, so later seeks on any worker resolve without
+    touching the file and segment churn cannot evict them.
+    """
+
+    _cache: "OrderedDict[str, KeyframeIndex]" = OrderedDict()
+    _lock = threading.Lock()
+    _inflight: Dict[str, threading.Lock] = {}
+
+    @classmethod
+    def get(cls, path: Path, fingerprint: str) -> KeyframeIndex:
+        cached = cls._cached(fingerprint)
+        if cached is not None:
+            return cached
+
+        # Concurrent first plays of the same file wait for a single scan
+        with cls._lock:
+            inflight = cls._inflight.setdefault(fingerprint, threading.Lock())
+        with inflight:
+            try:
+                cached = cls._cached(fingerprint)
+                if cached is not None:
+                    return cached
+
+                index = cls._load(fingerprint)
+                if index is None:
+                    index = cls.build(Path(path))
+                    keyframe_cache.put(cls._key(fingerprint), index.to_bytes())
+                cls._remember(fingerprint, index)
+                return index
+            finally:
+                with cls._lock:
+                    cls._inflight.pop(fingerprint, None)
+
+    @classmethod
+    def peek(cls, fingerprint: str) -> Optional[KeyframeIndex]:
+        """The index if it is in memory or the disk cache; never scans the file"""
+        cached = cls._cached(fingerprint)
+        if cached is None:
+            cached = cls._load(fingerprint)
+            if cached is not None:
+                cls._remember(fingerprint, cached)
+        return cached
+
+    @classmethod
+    async def get_async(cls, path: Path, fingerprint: str) -> KeyframeIndex:
+        return await asyncio.to_thread(cls.get, path, fingerprint)
+
+    @staticmethod
+    def build(path: Path) -> KeyframeIndex:
+        try:
+            result = subprocess_executor.run_sync(
+                [settings.FFPROBE_BINARY, "-v", "error", "-select_streams", "v:0",
+                 "-show_entries", "packet=pts_time,pos,flags", "-of", "csv=p=0", str(path)],
+                timeout=settings.KEYFRAME_INDEX_TIMEOUT
+            )
+        except SubprocessError as e:
+            raise KeyframeIndexError(str(e)) from e
+        index = KeyframeIndex.parse(result.stdout.decode(errors="replace"))
+        if not index:
+            raise KeyframeIndexError(f"No keyframes found in {path}")
+        return index
+
+    @classmethod
+    def _cached(cls, fingerprint: str) -> Optional[KeyframeIndex]:
+        with cls._lock:
+            index = cls._cache.get(fingerprint)
+            if index is not None:
+                cls._cache.move_to_end(fingerprint)
+            return index
+
+    @classmethod
+    def _remember(cls, fingerprint: str, index: KeyframeIndex) -> None:
+        with cls._lock:
+            cls._cache[fingerprint] = index
+            cls._cache.move_to_end(fingerprint)
+            while len(cls._cache) > settings.KEYFRAME_CACHE_SIZE:
+                cls._cache.popitem(last=False)
+
+    @classmethod
+    def _load(cls, fingerprint: str) -> Optional[KeyframeIndex]:
+        path = keyframe_cache.get(cls._key(fingerprint))
+        if path is None:
+            return None
+        try:
+            return KeyframeIndex.from_bytes(path.read_bytes())
+        except (OSError, ValueError) as e:
+            logger.warning(f"Discarding unreadable keyframe index {path}: {str(e)}")
+            return None
+
+    @staticmethod
+    def _key(fingerprint: str) -> str:
+        return f"{fingerprint}.idx"
+
+def _little_endian(values: array) -> array:
+    """The stored layout is little-endian; swapping is its own inverse"""
+    if sys.byteorder == "little":
+        return values
+    swapped = array(values.typecode, values)
+    swapped.byteswap()
+    return swapped
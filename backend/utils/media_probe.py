@@ -0,0 +1,246 @@
+import json
+import asyncio
+import logging
+import threading
+from pathlib import Path
+from collections import OrderedDict
+from typing import Dict, List, Optional
+from sqlalchemy.dialects.mysql import insert
+from sqlalchemy.sql import func
+from backend.config import settings
+from backend.database.session import SessionLocal
+from backend.database.models.manifest import FileManifestEntry
+from backend.database.models.probe import ProbeResult
+from backend.utils.file_scanner import FileScanner
+from backend.utils.subprocess_executor import SubprocessError, subprocess_executor
+
+logger = logging.getLogger(__name__)
+
+class MediaProbeError(Exception):
+    """Raised when ffprobe cannot read a media file"""
+
+class MediaProbe:
+    """
+    Container probe cache.
+
+    Each file is probed once with a single ffprobe call capturing format,
+    streams, chapters and tags as JSON. Results are keyed by content
+    fingerprint, kept in an in-memory LRU and persisted in probe_results,
+    so a file is only probed again when its contents change.
+    """
+
+    _cache: "OrderedDict[str, Dict]" = OrderedDict()
+    _lock = threading.Lock()
+    _inflight: Dict[str, threading.Lock] = {}
+
+    @classmethod
+    def get(cls, path: Path, fingerprint: str = None) -> Dict:
+        """Raw ffprobe JSON for path, probing only on a cache miss"""
+        path = Path(path)
+        fingerprint = fingerprint or cls._fingerprint_of(path)
+
+        cached = cls._cached(fingerprint)
+        if cached is not None:
+            return cached
+
+        # Concurrent requests for the same file wait for a single probe
+        with cls._lock:
+            inflight = cls._inflight.setdefault(fingerprint, threading.Lock())
+        with inflight:
+            try:
+                cached = cls._cached(fingerprint)
+                if cached is not None:
+                    return cached
+
+                data = cls._load(fingerprint)
+                if data is None:
+                    data = cls.run_ffprobe(path)
+                    cls._store(fingerprint, path, data)
+                cls._remember(fingerprint, data)
+                return data
+            finally:
+                with cls._lock:
+                    cls._inflight.pop(fingerprint, None)
+
+    @classmethod
+    async def get_async(cls, path: Path, fingerprint: str = None) -> Dict:
+        """get() for async handlers; cache and fingerprint I/O run in a worker thread"""
+        return await asyncio.to_thread(cls.get, path, fingerprint)
+
+    @classmethod
+    def duration(cls, path: Path, fingerprint: str = None) -> float:
+        """Container duration in seconds"""
+        return probe_duration(cls.get(path, fingerprint))
+
+    @classmethod
+    def summary(cls, path: Path, fingerprint: str = None) -> Dict:
+        """Codec, resolution and track details of the container"""
+        return summarize(cls.get(path, fingerprint))
+
+    @staticmethod
+    def run_ffprobe(path: Path) -> Dict:
+        try:
+            result = subprocess_executor.run_sync(
+                [settings.FFPROBE_BINARY, '-v', 'error', '-print_format', 'json',
+                 '-show_format', '-show_streams', '-show_chapters', str(path)],
+                timeout=settings.FFPROBE_TIMEOUT
+            )
+            data = json.loads(result.stdout)
+        except SubprocessError as e:
+            raise MediaProbeError(str(e)) from e
+        except ValueError as e:
+            raise MediaProbeError(str(e)) from e
+
+        if "format" not in data:
+            raise MediaProbeError(f"No container information for {path}")
+        return data
+
+    @classmethod
+    def invalidate(cls, fingerprint: str) -> None:
+        with cls._lock:
+            cls._cache.pop(fingerprint, None)
+
+    @classmethod
+    def _cached(cls, fingerprint: str) -> Optional[Dict]:
+        with cls._lock:
+            data = cls._cache.get(fingerprint)
+            if data is not None:
+                cls._cache.move_to_end(fingerprint)
+            return data
+
+    @classmethod
+    def _remember(cls, fingerprint: str, data: Dict) -> None:
+        with cls._lock:
+            cls._cache[fingerprint] = data
+            cls._cache.move_to_end(fingerprint)
+            while len(cls._cache) > settings.PROBE_CACHE_SIZE:
+                cls._cache.popitem(last=False)
+
+    @staticmethod
+    def _fingerprint_of(path: Path) -> str:
+        """Stored fingerprint when the manifest still matches the file, else a fresh one"""
+        stat = path.stat()
+        db = SessionLocal()
+        try:
+            entry = db.query(FileManifestEntry).filter(FileManifestEntry.path == str(path)).first()
+        finally:
+            db.close()
+        if entry is not None and (entry.device, entry.inode, entry.size, entry.mtime_ns) == (
+            stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns
+        ):
+            return entry.fingerprint
+        return FileScanner.calculate_fingerprint(path, stat.st_size)
+
+    @staticmethod
+    def _load(fingerprint: str) -> Optional[Dict]:
+        db = SessionLocal()
+        try:
+            return db.query(ProbeResult.data).filter(ProbeResult.fingerprint == fingerprint).scalar()
+        finally:
+            db.close()
+
+    @staticmethod
+    def _store(fingerprint: str, path: Path, data: Dict) -> None:
+        stmt = insert(ProbeResult.__table__).values(
+            fingerprint=fingerprint,
+            path=str(path),
+            duration=probe_duration(data),
+            data=data
+        )
+        db = SessionLocal()
+        try:
+            db.execute(stmt.on_duplicate_key_update(
+                path=stmt.inserted.path,
+                duration=stmt.inserted.duration,
+                data=stmt.inserted.data,
+                updated_at=func.now()
+            ))
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.warning(f"Could not persist probe result for {path}: {str(e)}")
+        finally:
+            db.close()
+
+def probe_duration(data: Dict) -> float:
+    """Duration in seconds from the format section, falling back to the longest stream"""
+    try:
+        return float(data["format"]["duration"])
+    except (KeyError, TypeError, ValueError):
+        pass
+    durations = [
+        float(stream["duration"]) for stream in data.get("streams", [])
+        if _is_number(stream.get("duration"))
+    ]
+    return max(durations, default=0.0)
+
+def summarize(data: Dict) -> Dict:
+    """Flatten probe JSON into the fields library metadata and playback use"""
+    streams = data.get("streams", [])
+    video = _streams_of(streams, "video")
+    audio = _streams_of(streams, "audio")
+    subtitles = _streams_of(streams, "subtitle")
+    fmt = data.get("format", {})
+
+    summary = {
+        "duration": probe_duration(data),
+        "container": fmt.get("format_name"),
+        "bit_rate": int(fmt["bit_rate"]) if _is_number(fmt.get("bit_rate")) else None,
+        "video_codec": None,
+        "width": None,
+        "height": None,
+        "resolution": None,
+        "frame_rate": None,
+        "pixel_format": None,
+        "audio_codec": audio[0].get("codec_name") if audio else None,
+        "audio_tracks": [_track(stream) for stream in audio],
+        "subtitle_tracks": [_track(stream) for stream in subtitles],
+        "chapters": len(data.get("chapters", []))
+    }
+    if video:
+        stream = video[0]
+        summary.update({
+            "video_codec": stream.get("codec_name"),
+            "width": stream.get("width"),
+            "height": stream.get("height"),
+            "resolution": f"{stream['height']}p" if stream.get("height") else None,
+            "frame_rate": _frame_rate(stream.get("avg_frame_rate") or stream.get("r_frame_rate")),
+            "pixel_format": stream.get("pix_fmt")
+        })
+    return summary
+
+def _streams_of(streams: List[Dict], codec_type: str) -> List[Dict]:
+    # Cover art is reported as a video stream with the attached_pic disposition
+    return [
+        stream for stream in streams
+        if stream.get("codec_type") == codec_type
+        and not stream.get("disposition", {}).get("attached_pic")
+    ]
+
+def _track(stream: Dict) -> Dict:
+    tags = stream.get("tags", {})
+    return {
+        "index": stream.get("index"),
+        "codec": stream.get("codec_name"),
+        "language": tags.get("language"),
+        "title": tags.get("title"),
+        "channels": stream.get("channels"),
+        "default": bool(stream.get("disposition", {}).get("default"))
+    }
+
+def _frame_rate(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    numerator, _, denominator = value.partition("/")
+    try:
+        rate = float(numerator) / float(denominator or 1)
+    except (ValueError, ZeroDivisionError):
+        return None
+    return round(rate, 3) if rate else None
+
+def _is_number(value) -> bool:
+    try:
+        float(value)
+    except (TypeError, ValueError):
+        return False
+    return True
@@ -1,48 +1,57 @@
 import re
 import unicodedata
 from pathlib import Path
+from functools import lru_cache
+
+# Scene tags and metadata, then stray separators. Applied one after another
+# in this order: removing one can expose a match for a later one.
+CLEANUP_PATTERNS = tuple(re.compile(pattern, re.IGNORECASE) for pattern in (
+    r'\[.*?\]', r'\(.*?\)', r'\b(?:WEB|BD|DVD|RIP|HD|HQ|UHD|HDR|SDR)\b',
+    r'\b(?:x264|x265|HEVC|AVC|AAC|AC3|DTS)\b',
+    r'\b(?:5\.1|7\.1|2\.0|CH|Dual)\b',
+    r'\b(?:REPACK|PROPER|READNFO|NFO)\b',
+    r'[-_.]{2,}', r'^[-_.]+', r'[-_.]+$'
+))
+RESOLUTION_PATTERN = re.compile(r'\b\d{3,4}p\b')
+SYMBOL_PATTERN = re.compile(r'[^\w\s-]')
+YEAR_PATTERN = re.compile(r'(?<!\d)(\d{4})(?!\d)')
+WHITESPACE_PATTERN = re.compile(r'\s+')
+FILESAFE_SYMBOL_PATTERN = re.compile(r'[^\w\s-]')
+FILESAFE_SEPARATOR_PATTERN = re.compile(r'[-\s]+')
 
 class NameBeautifier:
     @staticmethod
+    @lru_cache(maxsize=16384)
     def beautify(filename: str) -> str:
         """
         Clean media filenames by removing unwanted patterns and normalizing
         """
         # Remove file extension
         name = Path(filename).stem
-        
+
         # Remove common scene tags and metadata
-        patterns = [
-            r'\[.*?\]', r'\(.*?\)', r'\b(?:WEB|BD|DVD|RIP|HD|HQ|UHD|HDR|SDR)\b',
-            r'\b(?:x264|x265|HEVC|AVC|AAC|AC3|DTS)\b',
-            r'\b(?:5\.1|7\.1|2\.0|CH|Dual)\b',
-            r'\b(?:REPACK|PROPER|READNFO|NFO)\b',
-            r'[-_.]{2,}', r'^[-_.]+', r'[-_.]+$'
-        ]
-        
-        for pattern in patterns:
-            name = re.sub(pattern, '', name, flags=re.IGNORECASE)
-            
+        for pattern in CLEANUP_PATTERNS:
+            name = pattern.sub('', name)
+
         # Remove resolution patterns
-        name = re.sub(r'\b\d{3,4}p\b', '', name)
-        
+        name = RESOLUTION_PATTERN.sub('', name)
+
         # Normalize special characters
         name = unicodedata.normalize('NFKD', name)
         name = name.encode('ascii', 'ignore').decode()
-        
+
         # Clean remaining special characters
-        name = re.sub(r'[^\w\s-]', '', name)
-        
+        name = SYMBOL_PATTERN.sub('', name)
+
         # Handle year notations
-        name = re.sub(r'(?<!\d)(\d{4})(?!\d)', r'(\1)', name)
-        
+        name = YEAR_PATTERN.sub(r'(\1)', name)
+
         # Final cleanup
-        name = re.sub(r'\s+', ' ', name).strip()
-        return name
+        return WHITESPACE_PATTERN.sub(' ', name).strip()
 
     @staticmethod
     def generate_filesafe_name(name: str) -> str:
         """Generate filesystem-safe version of the name"""
-        safe_name = re.sub(r'[^\w\s-]', '', name).strip().lower()
-        safe_name = re.sub(r'[-\s]+', '-', safe_name)
-        return safe_name[:200]
\ No newline at end of file
+        safe_name = FILESAFE_SYMBOL_PATTERN.sub('', name).strip().lower()
+        safe_name = FILESAFE_SEPARATOR_PATTERN.sub('-', safe_name)
+        return safe_name[:200]
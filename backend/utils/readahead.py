@@ -0,0 +1,103 @@
+import os
+import time
+from backend.config import settings
+
+PAGE_SIZE = 4096
+
+HAS_FADVISE = hasattr(os, "posix_fadvise")
+
+class SequentialReader:
+    """
+    pread wrapper for one sequential stream that steers the page cache.
+
+    - The read range is marked POSIX_FADV_SEQUENTIAL, and a WILLNEED
+      window is kept ahead of the read position. Concurrent streams then
+      turn into large readahead requests instead of interleaved 1 MB reads.
+    - The chunk size follows the client's consumption rate, so fast
+      clients get fewer, larger reads and slow ones do not pin big buffers.
+    - Pages well behind the read position are dropped with DONTNEED on
+      large files, so a few long streams cannot evict the rest of the cache.
+
+    read() does blocking I/O and belongs on a worker thread. The time
+    between two reads is the time the previous chunk took to send, which
+    is how the consumption rate is measured.
+    """
+
+    def __init__(self, fd: int, start: int, end: int, drop_behind: bool = None):
+        self.fd = fd
+        self.end = end
+        self.chunk_size = settings.STREAM_CHUNK_SIZE
+        self.rate = None
+        if drop_behind is None:
+            drop_behind = settings.STREAM_DROP_BEHIND and end + 1 >= settings.STREAM_DROP_BEHIND_MIN_SIZE
+        self.drop_behind = drop_behind
+        self._advised_until = start
+        self._dropped_until = start - start % PAGE_SIZE
+        self._last_read = None
+        self._last_size = 0
+        self._advise(start, end - start + 1, "POSIX_FADV_SEQUENTIAL")
+
+    def read(self, offset: int) -> bytes:
+        """The next chunk at offset, at most up to the end of the range"""
+        self._observe()
+        self._read_ahead(offset)
+        chunk = os.pread(self.fd, min(self.chunk_size, self.end - offset + 1), offset)
+        self._drop_behind(offset)
+        self._last_read = time.monotonic()
+        self._last_size = len(chunk)
+        return chunk
+
+    def _observe(self) -> None:
+        if self._last_read is None or not self._last_size:
+            return
+        elapsed = max(time.monotonic() - self._last_read, 1e-4)
+        rate = self._last_size / elapsed
+        self.rate = rate if self.rate is None else 0.7 * self.rate + 0.3 * rate
+        size = int(self.rate * settings.STREAM_CHUNK_SECONDS)
+        size = min(max(size, settings.STREAM_CHUNK_MIN), settings.STREAM_CHUNK_MAX)
+        self.chunk_size = size - size % PAGE_SIZE or PAGE_SIZE
+
+    def _read_ahead(self, offset: int) -> None:
+        if self.rate is None:
+            window = settings.STREAM_READAHEAD_MIN
+        else:
+            window = int(self.rate * settings.STREAM_READAHEAD_SECONDS)
+            window = min(max(window, settings.STREAM_READAHEAD_MIN), settings.STREAM_READAHEAD_MAX)
+        target = min(offset + window, self.end + 1)
+        # Top the window up in half-window steps rather than on every read
+        if self._advised_until < offset:
+            self._advised_until = offset
+        if target - self._advised_until >= window // 2 or target == self.end + 1:
+            if target > self._advised_until:
+                self._advise(self._advised_until, target - self._advised_until, "POSIX_FADV_WILLNEED")
+                self._advised_until = target
+
+    def _drop_behind(self, offset: int) -> None:
+        if not self.drop_behind:
+            return
+        # Keep a margin for small rewinds and for players re-requesting a range
+        limit = offset - settings.STREAM_DROP_BEHIND_KEEP
+        limit -= limit % PAGE_SIZE
+        if limit - self._dropped_until >= settings.STREAM_CHUNK_MAX:
+            self._advise(self._dropped_until, limit - self._dropped_until, "POSIX_FADV_DONTNEED")
+            self._dropped_until = limit
+
+    def _advise(self, offset: int, length: int, advice: str) -> None:
+        if not HAS_FADVISE or length <= 0:
+            return
+        try:
+            os.posix_fadvise(self.fd, offset, length, getattr(os, advice))
+        except OSError:
+            # Hints only; some filesystems (FUSE, NFS) refuse them
+            pass
+
+def advise_sequential(file_obj, start: int, length: int) -> None:
+    """Hint a range the server will send itself (zero-copy) as sequential"""
+    if not HAS_FADVISE:
+        return
+    try:
+        fd = file_obj.fileno()
+        os.posix_fadvise(fd, start, length, os.POSIX_FADV_SEQUENTIAL)
+        os.posix_fadvise(fd, start, min(length, settings.STREAM_READAHEAD_MIN), os.POSIX_FADV_WILLNEED)
+    except OSError:
+        pass
@@ -0,0 +1,183 @@
+import os
+import logging
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+from sqlalchemy.orm import Session
+from backend.database.models.manifest import FileManifestEntry
+
+logger = logging.getLogger(__name__)
+
+class ScanManifest:
+    """
+    Persisted (path, inode, device, size, mtime, fingerprint, hash) records for
+    one scan root. Lets the scanner skip fingerprinting files whose stat
+    signature has not changed.
+
+    With preload=False entries are fetched on demand, either one path at a
+    time or a batch at a time through prefetch(), so memory stays bounded
+    for incremental updates and streaming scans of large libraries.
+    """
+
+    def __init__(self, db: Session, root: Path, preload: bool = True):
+        self.db = db
+        self.root = Path(root)
+        self.preloaded = preload
+        self._entries: Dict[str, FileManifestEntry] = {}
+        self._prefetched = set()
+        self._seen = set()
+        if preload:
+            entries = self.db.query(FileManifestEntry).filter(
+                FileManifestEntry.path.startswith(self._prefix(self.root), autoescape=True)
+            ).all()
+            self._entries = {e.path: e for e in entries}
+
+    def lookup(self, path: Path, stat: os.stat_result) -> Optional[FileManifestEntry]:
+        """Return the stored entry if the file is unchanged since it was recorded"""
+        key = str(path)
+        self._seen.add(key)
+        entry = self._get(key)
+        if entry is None or not self._matches(entry, stat):
+            return None
+        return entry
+
+    def is_known(self, path: Path) -> bool:
+        return self._get(str(path)) is not None
+
+    def forget(self, path: Path) -> int:
+        """Drop entries for a removed file or everything below a removed directory"""
+        key = str(path)
+        for known in [p for p in self._entries if p == key or p.startswith(self._prefix(path))]:
+            self._entries.pop(known)
+        return self.db.query(FileManifestEntry).filter(
+            (FileManifestEntry.path == key) |
+            FileManifestEntry.path.startswith(self._prefix(path), autoescape=True)
+        ).delete(synchronize_session=False)
+
+    def record(
+        self,
+        path: Path,
+        stat: os.stat_result,
+        fingerprint: str,
+        extension: str = None,
+        file_hash: str = None
+    ) -> FileManifestEntry:
+        """Insert or refresh the manifest entry for a freshly fingerprinted file"""
+        key = str(path)
+        self._seen.add(key)
+        entry = self._get(key)
+        if entry is None:
+            entry = FileManifestEntry(path=key)
+            self.db.add(entry)
+            self._entries[key] = entry
+
+        entry.device = stat.st_dev
+        entry.inode = stat.st_ino
+        entry.size = stat.st_size
+        entry.mtime_ns = stat.st_mtime_ns
+        if file_hash is not None:
+            entry.hash = file_hash
+        elif entry.fingerprint != fingerprint:
+            # Content changed, the old full hash needs re-verification
+            entry.hash = None
+        entry.fingerprint = fingerprint
+        entry.extension = extension
+        return entry
+
+    def pending_verification(self, limit: int = None, reverify: bool = False) -> List[FileManifestEntry]:
+        """Entries without a verified full hash (or all entries when reverify is set)"""
+        if not self.preloaded:
+            query = self.db.query(FileManifestEntry).filter(
+                FileManifestEntry.path.startswith(self._prefix(self.root), autoescape=True)
+            )
+            if not reverify:
+                query = query.filter(FileManifestEntry.hash.is_(None))
+            return query.order_by(FileManifestEntry.id).limit(limit).all()
+        pending = [
+            entry for entry in self._entries.values()
+            if reverify or entry.hash is None
+        ]
+        return pending[:limit] if limit is not None else pending
+
+    def prefetch(self, paths: Iterable[Path]) -> None:
+        """Load the entries for a batch of paths with a single query"""
+        keys = [str(path) for path in paths if str(path) not in self._entries]
+        if not keys:
+            return
+        for entry in self.db.query(FileManifestEntry).filter(FileManifestEntry.path.in_(keys)):
+            self._entries[entry.path] = entry
+        self._prefetched.update(keys)
+
+    def release(self) -> None:
+        """Forget cached entries once a batch has been committed"""
+        self._entries.clear()
+        self._prefetched.clear()
+        self._seen.clear()
+
+    def touch(self, paths: Iterable[Path], scan_token: int) -> None:
+        """Mark a batch of paths as seen by the scan identified by scan_token"""
+        keys = [str(path) for path in paths]
+        if keys:
+            self.db.query(FileManifestEntry).filter(
+                FileManifestEntry.path.in_(keys)
+            ).update({FileManifestEntry.scan_token: scan_token}, synchronize_session=False)
+
+    def stale_paths(self, scan_token: int, extensions: Iterable[str] = None):
+        """Query of recorded paths under the root not seen by the given scan"""
+        query = self.db.query(FileManifestEntry.path).filter(
+            FileManifestEntry.path.startswith(self._prefix(self.root), autoescape=True),
+            (FileManifestEntry.scan_token != scan_token) | (FileManifestEntry.scan_token.is_(None))
+        )
+        if extensions is not None:
+            query = query.filter(FileManifestEntry.extension.in_(list(extensions)))
+        return query
+
+    def sweep(self, scan_token: int, extensions: Iterable[str] = None) -> int:
+        """Delete entries not seen by the given scan"""
+        stale = [path for (path,) in self.stale_paths(scan_token, extensions)]
+        for start in range(0, len(stale), 1000):
+            self.db.query(FileManifestEntry).filter(
+                FileManifestEntry.path.in_(stale[start:start + 1000])
+            ).delete(synchronize_session=False)
+        return len(stale)
+
+    def missing_paths(self) -> List[str]:
+        """Paths recorded previously but not seen during this scan"""
+        if not self.preloaded:
+            return []
+        return [path for path in self._entries if path not in self._seen]
+
+    def prune(self) -> List[str]:
+        """Drop entries for files that disappeared and return their paths"""
+        removed = self.missing_paths()
+        for path in removed:
+            self.db.delete(self._entries.pop(path))
+        return removed
+
+    def save(self) -> None:
+        try:
+            self.db.commit()
+        except Exception as e:
+            self.db.rollback()
+            logger.error(f"Manifest save failed: {str(e)}")
+            raise
+
+    def _get(self, key: str) -> Optional[FileManifestEntry]:
+        entry = self._entries.get(key)
+        if entry is None and not self.preloaded and key not in self._prefetched:
+            entry = self.db.query(FileManifestEntry).filter(FileManifestEntry.path == key).first()
+            if entry is not None:
+                self._entries[key] = entry
+        return entry
+
+    @staticmethod
+    def _prefix(path: Path) -> str:
+        return os.path.join(str(path), '')
+
+    @staticmethod
+    def _matches(entry: FileManifestEntry, stat: os.stat_result) -> bool:
+        return (
+            entry.device == stat.st_dev and
+            entry.inode == stat.st_ino and
+            entry.size == stat.st_size and
+            entry.mtime_ns == stat.st_mtime_ns
+        )
@@ -0,0 +1,193 @@
+import os
+import time
+import logging
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, Tuple
+from backend.config import settings
+
+logger = logging.getLogger(__name__)
+
+NETWORK_FILESYSTEMS = {'nfs', 'nfs4', 'cifs', 'smb3', 'smbfs', '9p', 'fuse.sshfs', 'fuse.rclone', 'afs'}
+
+@dataclass
+class MountInfo:
+    mount_point: str
+    fs_type: str
+
+@dataclass
+class DeviceStats:
+    device: int
+    mount_point: str
+    kind: str
+    workers: int
+    files: int = 0
+    bytes: int = 0
+    failures: int = 0
+    first_submit: float = 0.0
+    last_done: float = 0.0
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def as_dict(self) -> Dict:
+        elapsed = max(self.last_done - self.first_submit, 1e-9) if self.files else 0.0
+        return {
+            "mount_point": self.mount_point,
+            "kind": self.kind,
+            "workers": self.workers,
+            "files": self.files,
+            "bytes": self.bytes,
+            "failures": self.failures,
+            "seconds": round(elapsed, 3),
+            "files_per_sec": round(self.files / elapsed, 2) if elapsed else 0.0,
+            "mb_per_sec": round(self.bytes / elapsed / 1_000_000, 2) if elapsed else 0.0
+        }
+
+class ScanPool:
+    """
+    Fans hashing/probing work out across threads with one executor per
+    underlying block device, so fast disks run wide while spinning disks and
+    network mounts are kept to a few concurrent readers.
+    """
+
+    def __init__(self):
+        self._executors: Dict[int, ThreadPoolExecutor] = {}
+        self._stats: Dict[int, DeviceStats] = {}
+        self._lock = threading.Lock()
+        self._mounts = self._read_mounts()
+
+    def __enter__(self) -> "ScanPool":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.shutdown()
+
+    @property
+    def window(self) -> int:
+        """Number of in-flight tasks worth queueing to keep every device busy"""
+        workers = sum(stats.workers for stats in self._stats.values())
+        return max(workers, settings.SCAN_SSD_WORKERS) * 4
+
+    def submit(self, device: int, fn: Callable, *args, nbytes: int = 0) -> Future:
+        """Run fn(*args) on the executor that owns the given st_dev"""
+        executor, stats = self._executor_for(device)
+        with stats.lock:
+            if not stats.first_submit:
+                stats.first_submit = time.monotonic()
+
+        def run():
+            try:
+                return fn(*args)
+            except Exception:
+                with stats.lock:
+                    stats.failures += 1
+                raise
+            finally:
+                with stats.lock:
+                    stats.files += 1
+                    stats.bytes += nbytes
+                    stats.last_done = time.monotonic()
+
+        return executor.submit(run)
+
+    def map_ordered(
+        self,
+        fn: Callable,
+        items: Iterable[Tuple[int, int, tuple]]
+    ) -> Iterator[Tuple[tuple, Future]]:
+        """
+        Submit fn for (device, nbytes, args) items with a bounded in-flight
+        window and yield (args, future) in submission order.
+        """
+        pending = deque()
+        for device, nbytes, args in items:
+            pending.append((args, self.submit(device, fn, *args, nbytes=nbytes)))
+            while len(pending) >= self.window:
+                args_done, future = pending.popleft()
+                future.exception()
+                yield args_done, future
+        while pending:
+            args_done, future = pending.popleft()
+            future.exception()
+            yield args_done, future
+
+    @classmethod
+    def device_kind(cls, device: int) -> str:
+        """Classify a st_dev as "ssd", "hdd" or "network" """
+        mount = cls._read_mounts().get(device, MountInfo("?", "unknown"))
+        return cls._classify(device, mount)
+
+    def report(self) -> Dict[str, Dict]:
+        """Per-device throughput counters"""
+        return {
+            f"{os.major(dev)}:{os.minor(dev)}": stats.as_dict()
+            for dev, stats in self._stats.items()
+        }
+
+    def shutdown(self) -> None:
+        for executor in self._executors.values():
+            executor.shutdown(wait=True)
+        for device, stats in self.report().items():
+            if stats["files"]:
+                logger.info(
+                    f"Scan throughput on {stats['mount_point']} ({device}, {stats['kind']}): "
+                    f"{stats['files_per_sec']} files/s, {stats['mb_per_sec']} MB/s"
+                )
+
+    def _executor_for(self, device: int) -> Tuple[ThreadPoolExecutor, DeviceStats]:
+        with self._lock:
+            executor = self._executors.get(device)
+            if executor is None:
+                mount = self._mounts.get(device, MountInfo("?", "unknown"))
+                kind = self._classify(device, mount)
+                workers = self._workers_for(kind, mount)
+                executor = ThreadPoolExecutor(
+                    max_workers=workers,
+                    thread_name_prefix=f"scan-{os.major(device)}-{os.minor(device)}"
+                )
+                self._executors[device] = executor
+                self._stats[device] = DeviceStats(device, mount.mount_point, kind, workers)
+            return executor, self._stats[device]
+
+    @staticmethod
+    def _workers_for(kind: str, mount: MountInfo) -> int:
+        override = settings.SCAN_DEVICE_WORKERS.get(mount.mount_point)
+        if override:
+            return override
+        return {
+            "network": settings.SCAN_NETWORK_WORKERS,
+            "hdd": settings.SCAN_HDD_WORKERS
+        }.get(kind, settings.SCAN_SSD_WORKERS)
+
+    @staticmethod
+    def _classify(device: int, mount: MountInfo) -> str:
+        if mount.fs_type in NETWORK_FILESYSTEMS:
+            return "network"
+
+        block = Path(f"/sys/dev/block/{os.major(device)}:{os.minor(device)}")
+        for queue in (block / "queue", block / ".." / "queue"):
+            try:
+                return "hdd" if (queue / "rotational").read_text().strip() == "1" else "ssd"
+            except OSError:
+                continue
+        return "ssd"
+
+    @staticmethod
+    def _read_mounts() -> Dict[int, MountInfo]:
+        """Map st_dev values to mount points using /proc/self/mountinfo"""
+        mounts = {}
+        try:
+            with open("/proc/self/mountinfo") as f:
+                for line in f:
+                    pre, _, post = line.partition(" - ")
+                    fields = pre.split()
+                    major, minor = map(int, fields[2].split(":"))
+                    mounts[os.makedev(major, minor)] = MountInfo(
+                        mount_point=fields[4].replace("\\040", " "),
+                        fs_type=post.split()[0]
+                    )
+        except (OSError, ValueError, IndexError) as e:
+            logger.debug(f"Mount table unavailable: {str(e)}")
+        return mounts
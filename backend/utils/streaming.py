@@ -0,0 +1,287 @@
+import os
+import stat
+import typing
+import secrets
+import asyncio
+from email.utils import formatdate
+from mimetypes import guess_type
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool, run_until_first_complete
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+from backend.config import settings
+from backend.utils.exceptions import StreamTerminatedException
+from backend.utils.http_range import ByteRange
+from backend.utils.readahead import SequentialReader, advise_sequential
+
+ZEROCOPY_EXTENSION = "http.response.zerocopysend"
+PATHSEND_EXTENSION = "http.response.pathsend"
+
+# A body segment is either literal bytes (multipart framing) or a file range
+Segment = typing.Union[bytes, ByteRange]
+
+class Throttle:
+    """
+    Per-response send hooks, e.g. a bandwidth scheduler and byte counters.
+
+    started() runs once the headers are out and finished() however the
+    response ends. pace() is awaited with the size of every body send
+    before it goes out and may raise StreamTerminatedException, which
+    ends the body where it is. Unless paced is set, a send may cover a
+    whole range or file, so the server can copy it without chunking.
+    """
+
+    paced = False
+
+    def started(self) -> None:
+        pass
+
+    async def pace(self, amount: int) -> None:
+        pass
+
+    def finished(self) -> None:
+        pass
+
+class FileRangeResponse(Response):
+    """
+    Serves a file, or byte ranges of it, letting the server do the copy.
+
+    - Servers advertising the ASGI zero-copy send extension get the open
+      file with offset and count, and push it with os.sendfile.
+    - Servers advertising path send get the path when the whole file is
+      requested.
+    - Otherwise ranges are read with os.pread on a worker thread, one
+      kernel-to-user copy per chunk and nothing on the event loop, with
+      page cache hints from SequentialReader.
+
+    No ranges means a 200 with the whole file, one range a 206 with
+    Content-Range, several a 206 multipart/byteranges body. With a paced
+    throttle, zero-copy sends go out in STREAM_CHUNK_SIZE pieces and path
+    send is skipped, so every chunk passes through it.
+    """
+
+    def __init__(
+        self,
+        path: typing.Union[str, "os.PathLike[str]"],
+        ranges: typing.List[ByteRange] = None,
+        headers: dict = None,
+        media_type: str = None,
+        stat_result: os.stat_result = None,
+        method: str = None,
+        background: BackgroundTask = None,
+        throttle: Throttle = None
+    ) -> None:
+        self.path = os.fspath(path)
+        self.throttle = throttle
+        self.stat_result = stat_result or os.stat(self.path)
+        if not stat.S_ISREG(self.stat_result.st_mode):
+            raise RuntimeError(f"File at path {self.path} is not a file.")
+
+        size = self.stat_result.st_size
+        content_type = media_type or guess_type(self.path)[0] or "application/octet-stream"
+        self.send_header_only = method is not None and method.upper() == "HEAD"
+        self.background = background
+        self.status_code = 206 if ranges else 200
+        self.media_type = content_type
+
+        if not ranges:
+            self.segments: typing.List[Segment] = [(0, size - 1)] if size else []
+        elif len(ranges) == 1:
+            self.segments = list(ranges)
+        else:
+            boundary = secrets.token_hex(16)
+            self.media_type = f"multipart/byteranges; boundary={boundary}"
+            self.segments = _multipart_segments(ranges, boundary, content_type, size)
+
+        self.init_headers(headers)
+        self.headers.setdefault("content-length", str(self.content_length))
+        self.headers.setdefault("accept-ranges", "bytes")
+        self.headers.setdefault("last-modified", formatdate(self.stat_result.st_mtime, usegmt=True))
+        if ranges and len(ranges) == 1:
+            start, end = ranges[0]
+            self.headers.setdefault("content-range", f"bytes {start}-{end}/{size}")
+
+    @property
+    def content_length(self) -> int:
+        return sum(
+            len(segment) if isinstance(segment, bytes) else segment[1] - segment[0] + 1
+            for segment in self.segments
+        )
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send({
+            "type": "http.response.start",
+            "status": self.status_code,
+            "headers": self.raw_headers
+        })
+
+        extensions = scope.get("extensions") or {}
+        throttle = self.throttle or Throttle()
+        throttle.started()
+        try:
+            if self.send_header_only or not self.segments:
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+            elif ZEROCOPY_EXTENSION in extensions:
+                await self._send_zerocopy(send, throttle)
+            elif PATHSEND_EXTENSION in extensions and self._is_whole_file() and not throttle.paced:
+                await throttle.pace(self.content_length)
+                await send({"type": PATHSEND_EXTENSION, "path": self.path})
+            else:
+                # Stop reading as soon as the client goes away
+                await run_until_first_complete(
+                    (self._listen_for_disconnect, {"receive": receive}),
+                    (self._send_chunks, {"send": send, "throttle": throttle})
+                )
+        except StreamTerminatedException:
+            # The declared length can no longer be met; returning without
+            # the final body message makes the server close the connection
+            return
+        finally:
+            throttle.finished()
+
+        if self.background is not None:
+            await self.background()
+
+    def _is_whole_file(self) -> bool:
+        return self.status_code == 200
+
+    async def _send_zerocopy(self, send: Send, throttle: Throttle) -> None:
+        with open(self.path, "rb") as file:
+            for segment in self.segments:
+                if isinstance(segment, bytes):
+                    await send({"type": "http.response.body", "body": segment, "more_body": True})
+                    continue
+                start, end = segment
+                advise_sequential(file, start, end - start + 1)
+                step = settings.STREAM_CHUNK_SIZE if throttle.paced else end - start + 1
+                for offset in range(start, end + 1, step):
+                    count = min(step, end - offset + 1)
+                    await throttle.pace(count)
+                    await send({
+                        "type": ZEROCOPY_EXTENSION,
+                        "file": file,
+                        "offset": offset,
+                        "count": count,
+                        "more_body": True
+                    })
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+    async def _send_chunks(self, send: Send, throttle: Throttle) -> None:
+        fd = await run_in_threadpool(os.open, self.path, os.O_RDONLY)
+        try:
+            for segment in self.segments:
+                if isinstance(segment, bytes):
+                    await send({"type": "http.response.body", "body": segment, "more_body": True})
+                    continue
+                offset, end = segment
+                # Read-ahead hints and a chunk size that tracks the client
+                reader = SequentialReader(fd, offset, end)
+                while offset <= end:
+                    chunk = await run_in_threadpool(reader.read, offset)
+                    if not chunk:
+                        # File shrank underneath us; the client sees a short read
+                        break
+                    offset += len(chunk)
+                    await throttle.pace(len(chunk))
+                    await send({"type": "http.response.body", "body": chunk, "more_body": True})
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+        finally:
+            os.close(fd)
+
+    @staticmethod
+    async def _listen_for_disconnect(receive: Receive) -> None:
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                break
+
+def _multipart_segments(
+    ranges: typing.List[ByteRange],
+    boundary: str,
+    content_type: str,
+    size: int
+) -> typing.List[Segment]:
+    segments: typing.List[Segment] = []
+    for index, (start, end) in enumerate(ranges):
+        lead = b"\r\n" if index else b""
+        segments.append(lead + (
+            f"--{boundary}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Range: bytes {start}-{end}/{size}\r\n\r\n"
+        ).encode("latin-1"))
+        segments.append((start, end))
+    segments.append(f"\r\n--{boundary}--\r\n".encode("latin-1"))
+    return segments
+
+class GrowingFileResponse(Response):
+    """
+    Streams a file that another process is still writing, such as an
+    encoder's output, following it until is_complete() reports the writer
+    has finished. on_close runs however the response ends, including
+    client disconnects.
+    """
+
+    poll_interval = 0.25
+
+    def __init__(
+        self,
+        path: typing.Union[str, "os.PathLike[str]"],
+        is_complete: typing.Callable[[], bool],
+        on_close: typing.Callable[[], None] = None,
+        headers: dict = None,
+        media_type: str = None,
+        throttle: Throttle = None
+    ) -> None:
+        self.path = os.fspath(path)
+        self.is_complete = is_complete
+        self.on_close = on_close
+        self.throttle = throttle
+        self.status_code = 200
+        self.media_type = media_type or guess_type(self.path)[0] or "application/octet-stream"
+        self.background = None
+        self.init_headers(headers)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        throttle = self.throttle or Throttle()
+        try:
+            await send({
+                "type": "http.response.start",
+                "status": self.status_code,
+                "headers": self.raw_headers
+            })
+            throttle.started()
+            try:
+                await run_until_first_complete(
+                    (FileRangeResponse._listen_for_disconnect, {"receive": receive}),
+                    (self._follow, {"send": send, "throttle": throttle})
+                )
+            finally:
+                throttle.finished()
+        finally:
+            if self.on_close is not None:
+                self.on_close()
+
+    async def _follow(self, send: Send, throttle: Throttle) -> None:
+        chunk_size = settings.STREAM_CHUNK_SIZE
+        fd = await run_in_threadpool(os.open, self.path, os.O_RDONLY)
+        try:
+            offset = 0
+            while True:
+                # Sample completion before reading so the final bytes are not missed
+                complete = self.is_complete()
+                chunk = await run_in_threadpool(os.pread, fd, chunk_size, offset)
+                if chunk:
+                    offset += len(chunk)
+                    try:
+                        await throttle.pace(len(chunk))
+                    except StreamTerminatedException:
+                        # Chunked body: end it where it is
+                        break
+                    await send({"type": "http.response.body", "body": chunk, "more_body": True})
+                elif complete:
+                    break
+                else:
+                    await asyncio.sleep(self.poll_interval)
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+        finally:
+            os.close(fd)
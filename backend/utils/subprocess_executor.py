@@ -0,0 +1,202 @@
+import os
+import signal
+import asyncio
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+from backend.config import settings
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class SubprocessResult:
+    args: List[str]
+    returncode: int
+    stdout: bytes
+    stderr: bytes
+    duration: float
+
+class SubprocessError(Exception):
+    """Raised when a child process exits with a non-zero status"""
+
+    def __init__(self, message: str, args: Sequence[str] = (), returncode: int = None, stderr: bytes = b""):
+        super().__init__(message)
+        self.cmd = list(args)
+        self.returncode = returncode
+        self.stderr = stderr
+
+class SubprocessTimeout(SubprocessError):
+    """Raised when a child process is killed for exceeding its timeout"""
+
+class SubprocessExecutor:
+    """
+    Shared asyncio runner for ffmpeg/ffprobe children.
+
+    All children run on one private event loop thread under a global
+    concurrency cap, so async handlers await them without blocking the
+    server loop and worker threads use run_sync. A child that exceeds its
+    timeout, or whose caller is cancelled, has its whole process group
+    killed.
+    """
+
+    def __init__(self, max_concurrency: int = None, name: str = "subprocess-executor"):
+        self.max_concurrency = max_concurrency or settings.SUBPROCESS_MAX_CONCURRENCY
+        self.name = name
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "waiting": 0,
+            "running": 0,
+            "max_waiting": 0,
+            "completed": 0,
+            "failed": 0,
+            "timed_out": 0,
+            "killed": 0
+        }
+
+    async def run(
+        self,
+        args: Sequence[str],
+        timeout: float = None,
+        input: bytes = None,
+        check: bool = True
+    ) -> SubprocessResult:
+        """Run a child from async code without blocking the calling loop"""
+        future = asyncio.run_coroutine_threadsafe(
+            self._run(args, timeout, input, check), self._ensure_loop()
+        )
+        try:
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            # Propagates into _run, which kills the child
+            future.cancel()
+            raise
+
+    def run_sync(
+        self,
+        args: Sequence[str],
+        timeout: float = None,
+        input: bytes = None,
+        check: bool = True
+    ) -> SubprocessResult:
+        """Run a child from a worker thread, blocking only that thread"""
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            pass
+        else:
+            raise RuntimeError("run_sync would block the event loop, await run() instead")
+
+        future = asyncio.run_coroutine_threadsafe(
+            self._run(args, timeout, input, check), self._ensure_loop()
+        )
+        return future.result()
+
+    def stats(self) -> Dict:
+        with self._stats_lock:
+            return dict(self._stats, max_concurrency=self.max_concurrency)
+
+    def shutdown(self) -> None:
+        with self._start_lock:
+            if self._loop is None:
+                return
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=5)
+            self._loop = None
+            self._thread = None
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._start_lock:
+            if self._loop is None:
+                ready = threading.Event()
+                self._thread = threading.Thread(
+                    target=self._serve, args=(ready,), name=self.name, daemon=True
+                )
+                self._thread.start()
+                ready.wait()
+            return self._loop
+
+    def _serve(self, ready: threading.Event) -> None:
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._loop = loop
+        ready.set()
+        try:
+            loop.run_forever()
+        finally:
+            loop.close()
+
+    async def _run(
+        self,
+        args: Sequence[str],
+        timeout: Optional[float],
+        input: Optional[bytes],
+        check: bool
+    ) -> SubprocessResult:
+        args = [str(arg) for arg in args]
+        timeout = settings.SUBPROCESS_TIMEOUT if timeout is None else timeout
+        # A zero timeout is for long-lived children (encoders) owned by a caller
+        timeout = timeout if timeout > 0 else None
+
+        self._update(waiting=1)
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self._update(waiting=-1)
+
+        started = time.monotonic()
+        self._update(running=1)
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *args,
+                stdin=asyncio.subprocess.PIPE if input is not None else asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                start_new_session=True
+            )
+            try:
+                stdout, stderr = await asyncio.wait_for(process.communicate(input), timeout)
+            except asyncio.TimeoutError:
+                await self._kill(process)
+                self._update(timed_out=1)
+                raise SubprocessTimeout(f"{args[0]} timed out after {timeout}s", args)
+            except asyncio.CancelledError:
+                await self._kill(process)
+                raise
+        except OSError as e:
+            self._update(failed=1)
+            raise SubprocessError(f"Cannot run {args[0]}: {str(e)}", args) from e
+        finally:
+            self._update(running=-1)
+            self._semaphore.release()
+
+        result = SubprocessResult(args, process.returncode, stdout, stderr, time.monotonic() - started)
+        if check and process.returncode != 0:
+            self._update(failed=1)
+            message = stderr.decode(errors="replace").strip() or f"{args[0]} exited with {process.returncode}"
+            raise SubprocessError(message, args, process.returncode, stderr)
+        self._update(completed=1)
+        return result
+
+    async def _kill(self, process: asyncio.subprocess.Process) -> None:
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        await process.wait()
+        self._update(killed=1)
+        logger.warning(f"Killed subprocess {process.pid}")
+
+    def _update(self, **deltas: int) -> None:
+        with self._stats_lock:
+            for key, delta in deltas.items():
+                self._stats[key] += delta
+            self._stats["max_waiting"] = max(self._stats["max_waiting"], self._stats["waiting"])
+
+subprocess_executor = SubprocessExecutor()
@@ -1,17 +1,36 @@
 import re
+import codecs
 import logging
 import subprocess
 import chardet
 from pathlib import Path
-from datetime import datetime, timedelta
-from typing import List, Dict, Tuple, Optional
-from pysrt import SubRipFile, SubRipItem, SubRipTime, open as open_srt
-from webvtt import WebVTT, Caption, MalformedFileError
-from ffmpeg import probe
-from ffmpeg import Error as FFmpegError
+from typing import Iterator, List, Dict, Tuple, Optional
+from backend.utils.media_probe import MediaProbe, MediaProbeError
 
 logger = logging.getLogger(__name__)
 
+# Longest first: the UTF-32 LE mark starts with the UTF-16 LE one
+_BOMS = (
+    (codecs.BOM_UTF32_LE, "utf-32"),
+    (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16")
+)
+_CHARDET_SAMPLE = 64 * 1024  # legacy encodings only; UTF-8 is validated, not guessed
+
+# "[hh:]mm:ss,mmm --> [hh:]mm:ss,mmm [settings]", with "." or "," before the milliseconds
+_TIMING = re.compile(
+    rb"^[ \t]*(?:(\d+):)?(\d{1,2}):(\d{1,2})[,.](\d{1,3})[ \t]*-->"
+    rb"[ \t]*(?:(\d+):)?(\d{1,2}):(\d{1,2})[,.](\d{1,3})([^\n]*)$",
+    re.M
+)
+_TAGS = re.compile(rb"<[^>]+>")
+# The fraction is a decimal: ",5" is 500 ms, ",05" is 50 ms
+_FRACTION_SCALE = (0, 100, 10, 1)
+
+Cue = Tuple[bytes, int, int, bytes, bytes]  # identifier, start ms, end ms, settings, text
+
 class SubtitleParserError(Exception):
     """Base exception for subtitle parsing errors"""
 
@@ -32,75 +51,149 @@ class SubtitleParser:
         Returns list of subtitle entries with start/end times in milliseconds
         """
         try:
-            # Detect encoding if not specified
-            if not encoding:
-                with open(path, 'rb') as f:
-                    raw_data = f.read(1024)
-                    encoding = chardet.detect(raw_data)['encoding'] or 'utf-8'
+            data = SubtitleParser._load(path, encoding)
 
             if path.suffix.lower() == '.srt':
-                return SubtitleParser._parse_srt(path, encoding)
+                return SubtitleParser._parse_srt(data)
             elif path.suffix.lower() == '.vtt':
-                return SubtitleParser._parse_vtt(path, encoding)
+                return SubtitleParser._parse_vtt(data)
             else:
                 raise InvalidSubtitleError(f"Unsupported format: {path.suffix}")
                 
-        except (UnicodeDecodeError, MalformedFileError) as e:
+        except (UnicodeDecodeError, LookupError) as e:
             logger.error(f"Subtitle decoding failed: {str(e)}")
             raise InvalidSubtitleError("Encoding detection failed") from e
+        except InvalidSubtitleError:
+            raise
         except Exception as e:
             logger.error(f"Subtitle parsing failed: {str(e)}")
             raise InvalidSubtitleError("Invalid subtitle file") from e
 
     @staticmethod
-    def _parse_srt(path: Path, encoding: str) -> List[Dict]:
+    def _load(path: Path, encoding: str = None) -> bytes:
+        """
+        File contents as UTF-8 with LF line endings. A byte order mark
+        decides the encoding, then UTF-8 is tried, and only files that are
+        not valid UTF-8 fall back to chardet over a larger sample.
+        """
+        raw = path.read_bytes()
+        if not encoding:
+            for bom, codec in _BOMS:
+                if raw.startswith(bom):
+                    encoding = codec
+                    break
+        if encoding and codecs.lookup(encoding).name == "utf-8-sig":
+            raw = raw[len(codecs.BOM_UTF8):] if raw.startswith(codecs.BOM_UTF8) else raw
+            encoding = "utf-8"
+
+        if not encoding or codecs.lookup(encoding).name == "utf-8":
+            try:
+                raw.decode("utf-8")
+                data = raw
+            except UnicodeDecodeError:
+                if encoding:
+                    raise
+                detected = chardet.detect(raw[:_CHARDET_SAMPLE])["encoding"] or "cp1252"
+                data = raw.decode(detected, errors="replace").encode("utf-8")
+        else:
+            data = raw.decode(encoding).encode("utf-8")
+
+        if b"\r" in data:
+            data = data.replace(b"\r\n", b"\n").replace(b"\r", b"\n")
+        return data
+
+    @staticmethod
+    def _cues(data: bytes) -> Iterator[Cue]:
+        """
+        Single pass over SRT or WebVTT bytes. A cue is its timing line, its
+        identifier (SRT index or WebVTT id) and the text up to the next
+        blank line. The identifier is the line before the timing line when
+        that line starts a block or is all digits, so a file that leaves
+        out the blank line loses no text unless the line is an SRT index.
+        Blocks without a timing line (header, NOTE, STYLE) are skipped by
+        the search.
+        """
+        timing = _TIMING.search
+        m = timing(data)
+        identifier = SubtitleParser._identifier(data, m.start()) if m is not None else b""
+        while m is not None:
+            h1, m1, s1, f1, h2, m2, s2, f2, settings = m.groups()
+            start = ((int(h1 or 0) * 60 + int(m1)) * 60 + int(s1)) * 1000 + int(f1) * _FRACTION_SCALE[len(f1)]
+            end = ((int(h2 or 0) * 60 + int(m2)) * 60 + int(s2)) * 1000 + int(f2) * _FRACTION_SCALE[len(f2)]
+
+            following = timing(data, m.end())
+            if following is None:
+                limit = len(data)
+                following_identifier = b""
+            else:
+                limit = following.start()
+                following_identifier = SubtitleParser._identifier(data, limit)
+            text_end = data.find(b"\n\n", m.end(), limit)
+            if text_end < 0:
+                # No blank line: stop at the newline before the next cue's index or timing line
+                text_end = limit - len(following_identifier) - 2 if following_identifier else limit - 1
+            yield identifier, start, end, settings, data[m.end() + 1:max(text_end, m.end() + 1)].rstrip(b"\n")
+            m, identifier = following, following_identifier
+
+    @staticmethod
+    def _identifier(data: bytes, line: int) -> bytes:
+        """The line before offset line when it starts a block or is an SRT index, otherwise empty"""
+        if not line:
+            return b""
+        begin = data.rfind(b"\n", 0, line - 1) + 1
+        candidate = data[begin:line - 1]
+        if begin < 2 or data[begin - 2:begin] == b"\n\n" or candidate.strip().isdigit():
+            return candidate
+        return b""
+
+    @staticmethod
+    def _parse_srt(data: bytes) -> List[Dict]:
         """Parse SRT file with advanced validation"""
-        subs = open_srt(path, encoding=encoding)
         parsed = []
+        clean = SubtitleParser._clean_text
         
-        for sub in subs:
-            if not SubtitleParser._validate_srt_timing(sub):
-                logger.warning(f"Invalid timing in subtitle line {sub.index}")
+        for number, (identifier, start, end, settings, text) in enumerate(SubtitleParser._cues(data), start=1):
+            identifier = identifier.strip()
+            index = int(identifier) if identifier.isdigit() else number
+            if start >= end:
+                logger.warning(f"Invalid timing in subtitle line {index}")
                 continue
-                
+
+            position = settings.strip().decode("utf-8") if settings else ""
             parsed.append({
-                "index": sub.index,
-                "start": sub.start.ordinal,
-                "end": sub.end.ordinal,
-                "text": SubtitleParser._clean_text(sub.text),
-                "position": sub.position,
-                "coordinates": sub.position
+                "index": index,
+                "start": start,
+                "end": end,
+                "text": clean(text),
+                "position": position,
+                "coordinates": position
             })
             
         return parsed
 
     @staticmethod
-    def _parse_vtt(path: Path, encoding: str) -> List[Dict]:
+    def _parse_vtt(data: bytes) -> List[Dict]:
         """Parse WebVTT file with cue validation"""
-        try:
-            vtt = WebVTT().read(path, encoding=encoding)
-            parsed = []
-            
-            for i, caption in enumerate(vtt.captions, start=1):
-                start_ms = SubtitleParser._vtt_time_to_ms(caption.start)
-                end_ms = SubtitleParser._vtt_time_to_ms(caption.end)
-                
-                if start_ms >= end_ms:
-                    logger.warning(f"Invalid timing in caption {i}")
-                    continue
-                    
-                parsed.append({
-                    "index": i,
-                    "start": start_ms,
-                    "end": end_ms,
-                    "text": SubtitleParser._clean_text(caption.text),
-                    "styles": caption.identifier,
-                    "position": caption.position
-                })
-                
-            return parsed
-        except MalformedFileError as e:
-            raise InvalidSubtitleError("Malformed WebVTT file") from e
+        if not data.lstrip().startswith(b"WEBVTT"):
+            raise InvalidSubtitleError("Malformed WebVTT file")
+        parsed = []
+        clean = SubtitleParser._clean_text
+
+        for i, (identifier, start, end, settings, text) in enumerate(SubtitleParser._cues(data), start=1):
+            if start >= end:
+                logger.warning(f"Invalid timing in caption {i}")
+                continue
+
+            parsed.append({
+                "index": i,
+                "start": start,
+                "end": end,
+                "text": clean(text),
+                "styles": identifier.strip().decode("utf-8"),
+                "position": settings.strip().decode("utf-8") if settings else ""
+            })
+
+        return parsed
 
     @staticmethod
     def shift_subtitles(path: Path, offset_seconds: float, output_path: Path = None) -> Path:
@@ -125,28 +218,28 @@ class SubtitleParser:
 
     @staticmethod
     def _shift_srt(original_path: Path, offset_ms: int, output_path: Path) -> Path:
-        subs = open_srt(original_path)
-        for sub in subs:
-            sub.start += offset_ms
-            sub.end += offset_ms
+        blocks = []
+        cues = SubtitleParser._cues(SubtitleParser._load(original_path))
+        for i, (_, start, end, settings, text) in enumerate(cues, start=1):
+            start = SubtitleParser._ms_to_srt_time(max(start + offset_ms, 0))
+            end = SubtitleParser._ms_to_srt_time(max(end + offset_ms, 0))
+            blocks.append(f"{i}\n{start} --> {end}{settings.decode('utf-8')}\n{text.decode('utf-8')}\n")
             
         output_path = output_path or original_path.with_stem(f"{original_path.stem}_shifted")
-        subs.save(output_path, encoding='utf-8')
+        output_path.write_text("\n".join(blocks), encoding='utf-8')
         return output_path
 
     @staticmethod
     def _shift_vtt(original_path: Path, offset_ms: int, output_path: Path) -> Path:
-        vtt = WebVTT().read(original_path)
-        for caption in vtt.captions:
-            caption.start = SubtitleParser._ms_to_vtt_time(
-                SubtitleParser._vtt_time_to_ms(caption.start) + offset_ms
-            )
-            caption.end = SubtitleParser._ms_to_vtt_time(
-                SubtitleParser._vtt_time_to_ms(caption.end) + offset_ms
-            )
+        blocks = ["WEBVTT\n"]
+        for identifier, start, end, settings, text in SubtitleParser._cues(SubtitleParser._load(original_path)):
+            start = SubtitleParser._ms_to_vtt_time(max(start + offset_ms, 0))
+            end = SubtitleParser._ms_to_vtt_time(max(end + offset_ms, 0))
+            header = f"{identifier.decode('utf-8')}\n" if identifier.strip() else ""
+            blocks.append(f"{header}{start} --> {end}{settings.decode('utf-8')}\n{text.decode('utf-8')}\n")
             
         output_path = output_path or original_path.with_stem(f"{original_path.stem}_shifted")
-        vtt.save(output_path)
+        output_path.write_text("\n".join(blocks), encoding='utf-8')
         return output_path
 
     @staticmethod
@@ -156,8 +249,9 @@ class SubtitleParser:
         tolerance: allowed relative difference (5% default)
         """
         try:
-            media_info = probe(media_path)
-            media_duration = float(media_info['format']['duration']) * 1000  # to ms
+            media_duration = MediaProbe.duration(media_path) * 1000  # to ms
+            if not media_duration:
+                raise SubtitleSyncError("Media duration unknown")
             
             sub_duration = SubtitleParser.calculate_subtitle_duration(subtitle_path)
             relative_diff = abs(media_duration - sub_duration) / media_duration
@@ -168,7 +262,7 @@ class SubtitleParser:
                 
             return True
             
-        except FFmpegError as e:
+        except MediaProbeError as e:
             logger.error(f"FFprobe error: {str(e)}")
             raise SubtitleSyncError("Media duration detection failed") from e
         except Exception as e:
@@ -214,59 +308,35 @@ class SubtitleParser:
 
     @staticmethod
     def _write_srt(subs: List[Dict], output_path: Path, encoding: str):
-        srt_file = SubRipFile()
-        for i, sub in enumerate(subs, start=1):
-            srt_file.append(SubRipItem(
-                index=i,
-                start=SubRipTime(milliseconds=sub['start']),
-                end=SubRipTime(milliseconds=sub['end']),
-                text=sub['text']
-            ))
-        srt_file.save(output_path, encoding=encoding)
+        blocks = [
+            f"{i}\n{SubtitleParser._ms_to_srt_time(sub['start'])} --> "
+            f"{SubtitleParser._ms_to_srt_time(sub['end'])}\n{sub['text']}\n"
+            for i, sub in enumerate(subs, start=1)
+        ]
+        output_path.write_text("\n".join(blocks), encoding=encoding)
 
     @staticmethod
     def _write_vtt(subs: List[Dict], output_path: Path, encoding: str):
-        vtt = WebVTT()
-        for sub in subs:
-            caption = Caption(
-                SubtitleParser._ms_to_vtt_time(sub['start']),
-                SubtitleParser._ms_to_vtt_time(sub['end']),
-                sub['text']
-            )
-            vtt.captions.append(caption)
-        vtt.save(output_path)
+        blocks = ["WEBVTT\n"] + [
+            f"{SubtitleParser._ms_to_vtt_time(sub['start'])} --> "
+            f"{SubtitleParser._ms_to_vtt_time(sub['end'])}\n{sub['text']}\n"
+            for sub in subs
+        ]
+        output_path.write_text("\n".join(blocks), encoding=encoding)
 
     @staticmethod
-    def _validate_srt_timing(sub: SubRipItem) -> bool:
-        """Validate SRT entry timing consistency"""
-        return sub.start.ordinal < sub.end.ordinal
-
-    @staticmethod
-    def _clean_text(text: str) -> str:
+    def _clean_text(text: bytes) -> str:
         """Clean subtitle text from formatting and artifacts"""
-        # Remove HTML tags
-        text = re.sub(r'<[^>]+>', '', text)
-        # Remove duplicated newlines
-        text = re.sub(r'\n{2,}', '\n', text)
-        # Trim whitespace
-        return text.strip()
+        # Remove HTML tags and WebVTT cue spans, then trim whitespace. Cue
+        # text never holds a blank line, so there are no newlines to collapse
+        if b"<" in text:
+            text = _TAGS.sub(b"", text)
+        return text.strip().decode("utf-8")
 
     @staticmethod
-    def _vtt_time_to_ms(time_str: str) -> int:
-        """Convert VTT timestamp to milliseconds"""
-        if '.' in time_str:
-            time_format = "%H:%M:%S.%f"
-        else:
-            time_format = "%H:%M:%S"
-            
-        dt = datetime.strptime(time_str, time_format)
-        delta = timedelta(
-            hours=dt.hour,
-            minutes=dt.minute,
-            seconds=dt.second,
-            microseconds=dt.microsecond
-        )
-        return int(delta.total_seconds() * 1000)
+    def _ms_to_srt_time(milliseconds: int) -> str:
+        """Convert milliseconds to SRT timestamp format"""
+        return SubtitleParser._ms_to_vtt_time(milliseconds).replace(".", ",")
 
     @staticmethod
     def _ms_to_vtt_time(milliseconds: int) -> str:
@@ -274,4 +344,4 @@ class SubtitleParser:
         seconds, ms = divmod(milliseconds, 1000)
         minutes, seconds = divmod(seconds, 60)
         hours, minutes = divmod(minutes, 60)
-        return f"{hours:02}:{minutes:02}:{seconds:02}.{ms:03}"
\ No newline at end of file
+        return f"{hours:02}:{minutes:02}:{seconds:02}.{ms:03}"
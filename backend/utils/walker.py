@@ -0,0 +1,116 @@
+import os
+import logging
+from pathlib import Path
+from dataclasses import dataclass
+from typing import Callable, Iterator, NamedTuple, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+class WalkEntry(NamedTuple):
+    path: Path
+    stat: os.stat_result
+
+@dataclass
+class DirectoryTotals:
+    """Direct (non-recursive) totals of one directory's files"""
+    path: str
+    size: int = 0
+    file_count: int = 0
+    matched_count: int = 0
+    newest_mtime_ns: int = 0
+
+class DirectoryWalker:
+    """
+    Single-pass os.scandir tree walker.
+
+    Visits each directory once, stats only files whose extension is wanted,
+    never re-enters a directory already seen through a symlink (so loops
+    terminate) and counts every hardlinked inode once.
+    Totals cover the files that were statted (every regular file when no
+    extension filter is set), counting hardlinks once.
+
+    When on_directory is given every file is statted and the callback gets
+    the DirectoryTotals of each directory once its entries have been visited.
+    """
+
+    def __init__(
+        self,
+        root: Path,
+        extensions: Set[str] = None,
+        follow_symlinks: bool = True,
+        on_directory: Callable[[DirectoryTotals], None] = None
+    ):
+        self.root = Path(root)
+        self.extensions = extensions
+        self.follow_symlinks = follow_symlinks
+        self.on_directory = on_directory
+        self.total_size = 0
+        self.file_count = 0
+        self.dir_count = 0
+        self._links: Set[Tuple[int, int]] = set()
+
+    def __iter__(self) -> Iterator[WalkEntry]:
+        try:
+            root_stat = os.stat(self.root)
+        except OSError as e:
+            logger.error(f"Cannot walk {self.root}: {str(e)}")
+            return
+
+        visited = {(root_stat.st_dev, root_stat.st_ino)}
+        stack = [str(self.root)]
+        while stack:
+            current = stack.pop()
+            self.dir_count += 1
+            try:
+                with os.scandir(current) as it:
+                    entries = list(it)
+            except OSError as e:
+                logger.warning(f"Skipping unreadable directory {current}: {str(e)}")
+                continue
+
+            totals = DirectoryTotals(current)
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=self.follow_symlinks):
+                        st = entry.stat(follow_symlinks=True)
+                        key = (st.st_dev, st.st_ino)
+                        if key in visited:
+                            logger.debug(f"Skipping already visited directory {entry.path}")
+                            continue
+                        visited.add(key)
+                        stack.append(entry.path)
+                    elif entry.is_file(follow_symlinks=self.follow_symlinks):
+                        wanted = self._wants(entry.name)
+                        if not wanted and self.extensions is not None and self.on_directory is None:
+                            continue
+
+                        st = entry.stat(follow_symlinks=True)
+                        if self._first_link(st):
+                            self.file_count += 1
+                            self.total_size += st.st_size
+                        totals.size += st.st_size
+                        totals.file_count += 1
+                        totals.newest_mtime_ns = max(totals.newest_mtime_ns, st.st_mtime_ns)
+                        if wanted:
+                            totals.matched_count += 1
+                            yield WalkEntry(Path(entry.path), st)
+                except OSError as e:
+                    logger.warning(f"Skipping {entry.path}: {str(e)}")
+
+            if self.on_directory is not None:
+                self.on_directory(totals)
+
+    def _wants(self, name: str) -> bool:
+        if self.extensions is None:
+            return True
+        _, dot, ext = name.rpartition('.')
+        return bool(dot) and ext.lower() in self.extensions
+
+    def _first_link(self, st: os.stat_result) -> bool:
+        if st.st_nlink < 2:
+            return True
+        key = (st.st_dev, st.st_ino)
+        if key in self._links:
+            return False
+        self._links.add(key)
+        return True